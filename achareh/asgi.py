@@ -2,6 +2,9 @@
 ASGI config for achareh project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Ticket message streams (/api/tickets/<pk>/stream/) hold one idle coroutine
+per client, so serve the project through this module, e.g.
+``uvicorn achareh.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
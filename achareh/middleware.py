@@ -0,0 +1,110 @@
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+_IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+# Requests no URL pattern matched share one entry, so 404 scans can't grow
+# the stats without bound.
+UNRESOLVED = "<unresolved>"
+
+
+def query_shape(sql):
+    # Same statement with a different number of IN (...) params is the same shape.
+    return _IN_LIST.sub("IN (...)", sql)
+
+
+class QueryStats:
+    """
+    Rolling per-view aggregates over the last ``window`` requests.
+    """
+
+    def __init__(self, window=200):
+        self.window = window
+        self.lock = threading.Lock()
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+
+    def record(self, view, queries, db_ms, total_ms, repeated):
+        with self.lock:
+            self.samples[view].append((queries, db_ms, total_ms, repeated))
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+
+    def snapshot(self):
+        with self.lock:
+            samples = {view: list(rows) for view, rows in self.samples.items()}
+
+        result = {}
+        for view, rows in samples.items():
+            queries = [row[0] for row in rows]
+            total_ms = sorted(row[2] for row in rows)
+            result[view] = {
+                "requests": len(rows),
+                "avg_queries": round(sum(queries) / len(rows), 2),
+                "max_queries": max(queries),
+                "avg_db_ms": round(sum(row[1] for row in rows) / len(rows), 3),
+                "avg_total_ms": round(sum(total_ms) / len(rows), 3),
+                "p95_total_ms": round(total_ms[max(0, int(len(total_ms) * 0.95) - 1)], 3),
+                "n_plus_one_requests": sum(1 for row in rows if row[3]),
+            }
+        return result
+
+
+stats = QueryStats()
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Count queries and DB time per request, flag repeated query shapes (N+1)
+    and report them in ``Server-Timing``. Off unless
+    ``settings.QUERY_INSTRUMENTATION`` is true; when off, Django drops the
+    middleware from the chain at startup.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "QUERY_INSTRUMENTATION", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, "QUERY_INSTRUMENTATION_REPEAT_THRESHOLD", 3)
+
+    def __call__(self, request):
+        shapes = Counter()
+        timing = {"queries": 0, "db": 0.0}
+
+        def wrapper(execute, sql, params, many, context):
+            start = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timing["db"] += time.perf_counter() - start
+                timing["queries"] += 1
+                shapes[query_shape(sql)] += 1
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = timing["db"] * 1000
+
+        repeated = sum(1 for count in shapes.values() if count >= self.repeat_threshold)
+        header = [
+            f'db;dur={db_ms:.2f};desc="{timing["queries"]} queries"',
+            f"total;dur={total_ms:.2f}",
+        ]
+        if repeated:
+            header.append(f'nplusone;desc="{repeated} repeated query shapes"')
+        response["Server-Timing"] = ", ".join(header)
+
+        match = getattr(request, "resolver_match", None)
+        view = (match.view_name or match.route) if match else UNRESOLVED
+        stats.record(view, timing["queries"], db_ms, total_ms, bool(repeated))
+        return response
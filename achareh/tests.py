@@ -0,0 +1,80 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from rest_framework.test import APIClient
+
+from achareh.middleware import query_shape, stats
+from user.models import Role
+
+
+User = get_user_model()
+
+
+class QueryInstrumentationTests(TestCase):
+    def setUp(self):
+        stats.reset()
+        admin_role, _ = Role.objects.get_or_create(name=Role.Names.ADMIN)
+        self.admin = User.objects.create_superuser(username="admin", password="pass12345")
+        self.admin.roles.add(admin_role)
+        self.user = User.objects.create_user(username="user", password="pass12345")
+
+    def test_disabled_by_default(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        res = client.get("/api/ads/")
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("Server-Timing", res)
+        self.assertEqual(stats.snapshot(), {})
+
+    @override_settings(QUERY_INSTRUMENTATION=True, QUERY_INSTRUMENTATION_REPEAT_THRESHOLD=2)
+    def test_server_timing_and_per_view_aggregates(self):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        for i in range(3):
+            User.objects.create_user(username=f"extra{i}", password="pass12345")
+        for _ in range(2):
+            res = client.get("/api/ads/")
+            self.assertEqual(res.status_code, 200)
+        self.assertRegex(res["Server-Timing"], r'^db;dur=[\d.]+;desc="\d+ queries", total;dur=[\d.]+')
+
+        # The users list looks up each user's roles separately.
+        res = client.get("/api/users/")
+        self.assertEqual(res.status_code, 200)
+        self.assertIn("nplusone", res["Server-Timing"])
+
+        res = client.get("/api/_debug/queries/")
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.data["enabled"])
+        ads = res.data["views"]["ad.views.AdListCreateAPIView"]
+        self.assertEqual(ads["requests"], 2)
+        self.assertEqual(ads["n_plus_one_requests"], 0)
+        self.assertEqual(res.data["views"]["user-list"]["n_plus_one_requests"], 1)
+
+        res = client.delete("/api/_debug/queries/")
+        self.assertEqual(res.status_code, 204)
+        # Only the DELETE itself is recorded after the reset
+        self.assertEqual(list(stats.snapshot()), ["debug-queries"])
+
+    @override_settings(QUERY_INSTRUMENTATION=True)
+    def test_unresolved_paths_share_one_entry(self):
+        client = APIClient()
+        for path in ["/wp-login.php", "/.env", "/api/nothing-here/"]:
+            self.assertEqual(client.get(path).status_code, 404)
+        self.assertEqual(stats.snapshot()["<unresolved>"]["requests"], 3)
+        self.assertEqual(list(stats.snapshot()), ["<unresolved>"])
+
+    def test_stats_endpoint_is_admin_only(self):
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        self.assertEqual(client.get("/api/_debug/queries/").status_code, 403)
+
+        client.force_authenticate(user=self.admin)
+        res = client.get("/api/_debug/queries/")
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(res.data["enabled"])
+
+    def test_in_lists_share_a_shape(self):
+        self.assertEqual(
+            query_shape('SELECT 1 FROM t WHERE id IN (%s, %s)'),
+            query_shape('SELECT 1 FROM t WHERE id IN (%s)'),
+        )
@@ -22,6 +22,8 @@ from drf_spectacular.views import (
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from .views import QueryStatsAPIView
+
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -37,4 +39,5 @@ urlpatterns = [
     ),
     path("api/auth/login/", TokenObtainPairView.as_view(), name="jwt-login"),
     path("api/auth/refresh/", TokenRefreshView.as_view(), name="jwt-refresh"),
+    path("api/_debug/queries/", QueryStatsAPIView.as_view(), name="debug-queries"),
 ]
@@ -0,0 +1,27 @@
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from user.permissions import IsAdminUser
+
+from .middleware import stats
+
+
+class QueryStatsAPIView(APIView):
+    """
+    Per-view query aggregates collected by QueryInstrumentationMiddleware.
+    DELETE resets them.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response({
+            "enabled": settings.QUERY_INSTRUMENTATION,
+            "window": stats.window,
+            "views": stats.snapshot(),
+        })
+
+    def delete(self, request):
+        stats.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,7 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Ad, AdRequest
+from .models import Ad, AdRequest, AdStatusHistory, Category
 
 
 @admin.register(Ad)
@@ -14,6 +14,12 @@ class AdAdmin(admin.ModelAdmin):
 
 
 
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ("id", "name", "parent")
+    search_fields = ("name",)
+
+
 @admin.register(AdRequest)
 class AdRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'ad', 'performer', 'status', 'created_at')
@@ -26,3 +32,10 @@ class AdRequestAdmin(admin.ModelAdmin):
                 roles__name="performer"
             ).distinct()
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(AdStatusHistory)
+class AdStatusHistoryAdmin(admin.ModelAdmin):
+    list_display = ("id", "ad", "from_status", "to_status", "actor", "changed_at")
+    list_filter = ("to_status", "changed_at")
+    search_fields = ("ad__title", "actor__username")
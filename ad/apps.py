@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class AdConfig(AppConfig):
     name = 'ad'
+
+    def ready(self):
+        import ad.signals
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .models import Ad, PerformerBooking
+
+# Ads have a start time only, so every job is booked for this long.
+BOOKING_DURATION = timedelta(hours=2)
+CONFLICT_ERROR = "پیمانکار در این زمان آگهی دیگری دارد."
+
+
+def booking_window(start):
+    return start, start + BOOKING_DURATION
+
+
+def overlapping(performer_id, start, end):
+    """
+    Bookings of the performer overlapping ``[start, end)``. No booking is
+    longer than BOOKING_DURATION, so only those starting after
+    ``start - BOOKING_DURATION`` can overlap: a bounded range on the
+    (performer, start, end) index.
+    """
+    return PerformerBooking.objects.filter(
+        performer_id=performer_id,
+        start__gt=start - BOOKING_DURATION,
+        start__lt=end,
+        end__gt=start,
+    )
+
+
+def _lock_performers(performer_ids):
+    # Serializes bookings per performer where rows can be locked; SQLite
+    # transactions are serialized already.
+    list(get_user_model().objects.select_for_update().filter(pk__in=performer_ids).values_list("pk", flat=True))
+
+
+def book_assigned(moved):
+    """
+    Book the performer of every newly assigned ad that has an execution
+    time. Must run in the assignment's transaction: a conflict raises
+    ValidationError and rolls the assignment back.
+    """
+    ads = [ad for ad, _ in moved if ad.execution_time is not None]
+    if not ads:
+        return
+    _lock_performers({ad.performer_id for ad in ads})
+    bookings = []
+    for ad in ads:
+        start, end = booking_window(ad.execution_time)
+        clashes = any(
+            booking.performer_id == ad.performer_id and booking.start < end and booking.end > start
+            for booking in bookings
+        )
+        if clashes or overlapping(ad.performer_id, start, end).exclude(ad_id=ad.pk).exists():
+            raise ValidationError(CONFLICT_ERROR)
+        bookings.append(PerformerBooking(performer_id=ad.performer_id, ad_id=ad.pk, start=start, end=end))
+    PerformerBooking.objects.bulk_create(bookings)
+
+
+def release_bookings(moved):
+    PerformerBooking.objects.filter(ad_id__in=[ad.pk for ad, _ in moved]).delete()
+
+
+def reschedule_booking(ad):
+    """
+    Move the booking of an assigned ad whose execution time changed; raises
+    ValidationError on a conflict.
+    """
+    if ad.performer_id is None or ad.status not in (Ad.Status.ASSIGNED, Ad.Status.DONE_REPORTED):
+        return
+    PerformerBooking.objects.filter(ad_id=ad.pk).delete()
+    book_assigned([(ad, ad.status)])
+
+
+@transaction.atomic
+def rebuild_bookings():
+    """
+    Recreate the bookings of assigned and finished ads, for data loaded
+    outside the normal write paths (imports, seeding). Overlaps already in
+    the data are kept as they are.
+    """
+    booked = Ad.objects.filter(
+        performer__isnull=False,
+        execution_time__isnull=False,
+        status__in=(Ad.Status.ASSIGNED, Ad.Status.DONE_REPORTED, Ad.Status.DONE),
+    ).order_by().values_list("id", "performer_id", "execution_time")
+    PerformerBooking.objects.all().delete()
+    PerformerBooking.objects.bulk_create([
+        PerformerBooking(ad_id=ad_id, performer_id=performer_id, start=start, end=start + BOOKING_DURATION)
+        for ad_id, performer_id, start in booked.iterator()
+    ], batch_size=1000)
+
+
+def free_slots(performer_id, start, end):
+    """
+    ``(start, end)`` gaps of at least BOOKING_DURATION in the performer's
+    bookings within ``[start, end)``. Only the bookings overlapping the
+    range are read, as (start, end) pairs in index order.
+    """
+    busy = overlapping(performer_id, start, end).order_by("start").values_list("start", "end")
+    slots = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start - cursor >= BOOKING_DURATION:
+            slots.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if end - cursor >= BOOKING_DURATION:
+        slots.append((cursor, end))
+    return slots
@@ -0,0 +1,56 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+OPEN_ADS_VERSION_KEY = "ad:open:version"
+# Bounds staleness for data the version doesn't track, e.g. a renamed creator.
+OPEN_ADS_PAGE_TIMEOUT = 300
+
+# Hit/miss counts of this process only, read by bench_open_ads_cache
+stats = {"hits": 0, "misses": 0}
+
+
+def get_open_ads_version():
+    version = cache.get(OPEN_ADS_VERSION_KEY)
+    if version is None:
+        cache.add(OPEN_ADS_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(OPEN_ADS_VERSION_KEY)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(OPEN_ADS_VERSION_KEY)
+    except ValueError:
+        # Key evicted: a fresh, never-used value orphans the old pages.
+        cache.add(OPEN_ADS_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def bump_open_ads_version():
+    """
+    Invalidate every cached open-ads page once the current transaction commits,
+    so a concurrent reader can't cache pre-commit rows under the new version.
+    """
+    transaction.on_commit(_bump)
+
+
+def open_ads_page_key(request):
+    # The page's next link is absolute, so scheme and host are part of the key.
+    params = "&".join(f"{name}={request.query_params.get(name, '')}" for name in ("cursor", "page_size"))
+    return f"ad:open:v{get_open_ads_version()}:{request.scheme}://{request.get_host()}:{params}"
+
+
+def get_open_ads_page(request):
+    """
+    Return ``(key, data)``. The key is fixed before the database is read, so
+    a page stored under it is never older than its version.
+    """
+    key = open_ads_page_key(request)
+    data = cache.get(key)
+    stats["hits" if data is not None else "misses"] += 1
+    return key, data
+
+
+def set_open_ads_page(key, data):
+    cache.set(key, data, OPEN_ADS_PAGE_TIMEOUT)
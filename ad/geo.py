@@ -0,0 +1,148 @@
+import heapq
+import math
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Ads are bucketed in a fixed grid of CELL_DEGREES x CELL_DEGREES cells,
+# numbered row-major from (-90, -180); a cell is about 11 km high.
+CELL_DEGREES = 0.1
+ROWS = round(180 / CELL_DEGREES)
+COLUMNS = round(360 / CELL_DEGREES)
+
+# nearby_ads searches growing circles, starting with FIRST_RING_KM.
+FIRST_RING_KM = 2
+RING_GROWTH = 4
+MAX_LISTED_CELLS = 1000
+
+
+def _row(lat):
+    return min(max(int((lat + 90) / CELL_DEGREES), 0), ROWS - 1)
+
+
+def _column(lon):
+    return int(math.floor((lon + 180) / CELL_DEGREES)) % COLUMNS
+
+
+def geo_cell(lat, lon):
+    if lat is None or lon is None:
+        return None
+    return _row(lat) * COLUMNS + _column(lon)
+
+
+def cell_ranges(lat, lon, radius_km):
+    """
+    ``(first, last)`` cell number ranges covering every point within
+    ``radius_km`` of ``(lat, lon)``: one range per grid row, merged where
+    rows are fully covered.
+    """
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+    # The circle is widest in longitude on its edge farthest from the equator.
+    widest = max(abs(south), abs(north))
+    if widest >= 90 - CELL_DEGREES:
+        dlon = 180.0
+    else:
+        dlon = min(math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(widest)))), 180.0)
+
+    if dlon >= 180:
+        spans = [(0, COLUMNS - 1)]
+    else:
+        west = int(math.floor((lon - dlon + 180) / CELL_DEGREES))
+        east = int(math.floor((lon + dlon + 180) / CELL_DEGREES))
+        if east - west >= COLUMNS - 1:
+            spans = [(0, COLUMNS - 1)]
+        elif west < 0:
+            spans = [(0, east), (west + COLUMNS, COLUMNS - 1)]
+        elif east >= COLUMNS:
+            spans = [(0, east - COLUMNS), (west, COLUMNS - 1)]
+        else:
+            spans = [(west, east)]
+
+    ranges = []
+    for row in range(_row(south), _row(north) + 1):
+        for first, last in spans:
+            first, last = row * COLUMNS + first, row * COLUMNS + last
+            if ranges and ranges[-1][1] + 1 == first:
+                ranges[-1] = (ranges[-1][0], last)
+            else:
+                ranges.append((first, last))
+    return ranges
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distances from ``(lat, lon)`` to each point of the two columns."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    cos_lat = math.cos(lat)
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    return [
+        2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(
+            sin((radians(other_lat) - lat) / 2) ** 2
+            + cos_lat * cos(radians(other_lat)) * sin((radians(other_lon) - lon) / 2) ** 2
+        )))
+        for other_lat, other_lon in zip(lats, lons)
+    ]
+
+
+def cells_filter(ranges):
+    """
+    Listing the cells lets planners seek (status, geo_cell) once per cell
+    and apply the latitude band in the index; SQLite without statistics
+    ignores OR-ed ranges. Huge areas (near the poles) fall back to ranges.
+    """
+    if sum(last - first + 1 for first, last in ranges) <= MAX_LISTED_CELLS:
+        return Q(geo_cell__in=[cell for first, last in ranges for cell in range(first, last + 1)])
+    return reduce(or_, (Q(geo_cell__range=cell_range) for cell_range in ranges))
+
+
+def _nearest(queryset, lat, lon, radius_km, limit):
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cells = cells_filter(cell_ranges(lat, lon, radius_km))
+    # Only indexed columns are read, so this is an index-only scan.
+    candidates = list(
+        queryset.filter(cells, latitude__range=(lat - dlat, lat + dlat))
+        .order_by().values_list("id", "latitude", "longitude")
+    )
+    if not candidates:
+        return []
+    ids, lats, lons = zip(*candidates)
+    return heapq.nsmallest(
+        limit,
+        ((distance, ad_id) for ad_id, distance in zip(ids, haversine_km(lat, lon, lats, lons)) if distance <= radius_km),
+    )
+
+
+def nearby_open_ads(queryset, lat, lon, radius_km, limit):
+    """
+    Up to ``limit`` open ads of ``queryset`` within ``radius_km``, nearest
+    first, each with a ``distance_km`` attribute.
+
+    The cell ranges and latitude band narrow the candidates in SQL and exact
+    distances are computed over their coordinates only. The search starts
+    at FIRST_RING_KM and widens until ``limit`` ads are found, so dense
+    areas never read the whole radius; full rows are loaded for the winners.
+    """
+    open_status = queryset.model.Status.OPEN
+    reach = min(FIRST_RING_KM, radius_km)
+    while True:
+        nearest = _nearest(queryset.filter(status=open_status), lat, lon, reach, limit)
+        # Everything within reach was seen, so these are the nearest overall.
+        if len(nearest) >= limit or reach >= radius_km:
+            break
+        reach = min(reach * RING_GROWTH, radius_km)
+
+    # By primary key alone: with the status filter, planners may walk the
+    # status index instead.
+    ads = queryset.order_by().in_bulk([ad_id for _, ad_id in nearest])
+    results = []
+    for distance, ad_id in nearest:
+        ad = ads.get(ad_id)
+        if ad is None or ad.status != open_status:
+            # Deleted or assigned between the two reads
+            continue
+        ad.distance_km = round(distance, 3)
+        results.append(ad)
+    return results
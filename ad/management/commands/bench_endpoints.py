@@ -0,0 +1,269 @@
+import json
+import math
+import re
+import statistics
+import time
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from urllib.parse import quote
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext, setup_test_environment, teardown_test_environment
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from ad.models import Ad, AdRequest
+from comment.models import Comment
+from tickets.models import Ticket
+from user.models import Role
+
+from .seed_marketplace import SEED_PASSWORD, WORDS
+
+User = get_user_model()
+
+URL_MODULES = ["ad.urls", "user.urls", "comment.urls", "tickets.urls"]
+
+# (method, pattern as written in urls.py, actor, query string, payload)
+ROUTES = [
+    ("GET", "ads/", "owner", "", None),
+    ("POST", "ads/", "owner", "", lambda ctx: {"title": "t", "description": "d", "category": ctx["category"]}),
+    ("POST", "ads/bulk/", "owner", "", lambda ctx: [
+        {"title": f"t{i}", "description": "d", "category": ctx["category"]} for i in range(20)
+    ]),
+    ("POST", "ads/bulk/cancel/", "owner", "", lambda ctx: {"ids": ctx["owner_ads"]}),
+    ("GET", "ads/open/", "performer", "", None),
+    ("GET", "ads/open/nearby/", "performer", "lat=35.69&lon=51.39&radius_km=50", None),
+    ("GET", "ads/search/", "performer", "q=" + quote(WORDS[0]), None),
+    ("GET", "ads/facets/", "owner", "", None),
+    ("GET", "ads/performers/<int:performer_id>/free-slots/", "owner", "from={slots_from}&to={slots_to}", None),
+    ("GET", "ads/<int:pk>/", "owner", "", None),
+    ("PATCH", "ads/<int:pk>/", "owner", "", lambda ctx: {"title": "changed"}),
+    ("DELETE", "ads/<int:pk>/", "owner", "", None),
+    ("GET", "ads/<int:pk>/requests/", "owner", "", None),
+    ("POST", "ads/<int:pk>/requests/", "applicant", "", lambda ctx: {}),
+    ("POST", "ads/<int:pk>/requests/<int:request_pk>/choose/", "owner", "", None),
+    ("POST", "ads/<int:pk>/report-done/", "assigned_performer", "", None),
+    ("POST", "ads/<int:pk>/confirm-done/", "reported_owner", "", None),
+    ("GET", "ads/requests/", "performer", "", None),
+    ("POST", "users/register/", None, "", lambda ctx: {
+        "username": "bench_new_user", "email": "bench_new_user@example.com",
+        "password": "A-strong-pass-123", "phone_number": "09350000000",
+    }),
+    ("POST", "users/login/", None, "", lambda ctx: {"identifier": ctx["owner_username"], "password": SEED_PASSWORD}),
+    ("GET", "users/me/", "owner", "", None),
+    ("GET", "users/profile/performer/<int:user_id>/", "owner", "", None),
+    ("GET", "users/profile/performer/<int:user_id>/reviews/", "owner", "", None),
+    ("GET", "users/profile/customer/<int:user_id>/", "owner", "", None),
+    ("GET", "users/profile/customer/<int:user_id>/ads/", "owner", "", None),
+    ("GET", "users/profile/customer/<int:user_id>/comments/", "owner", "", None),
+    ("GET", "users/", "admin", "", None),
+    ("GET", "users/<int:pk>/", "admin", "", None),
+    ("DELETE", "users/<int:pk>/", "admin", "", None),
+    ("GET", "users/filter/<int:base_rating>/<int:base_comments>/", "owner", "", None),
+    ("GET", "comments/", "owner", "ad={done_ad}", None),
+    ("POST", "comments/", "done_owner", "", lambda ctx: {
+        "content": "ok", "rating": 5, "ad": ctx["uncommented_ad"], "performer": ctx["uncommented_performer"],
+    }),
+    ("GET", "comments/<int:pk>/", "owner", "", None),
+    ("GET", "performers/ratings/", "owner", "", None),
+    ("GET", "tickets/", "ticket_owner", "", None),
+    ("POST", "tickets/", "ticket_owner", "", lambda ctx: {"title": "help", "ad": None}),
+    ("GET", "tickets/<int:pk>/", "ticket_owner", "", None),
+    ("GET", "tickets/<int:pk>/messages/", "ticket_owner", "", None),
+    ("POST", "tickets/<int:pk>/stream-token/", "ticket_owner", "", None),
+    ("GET", "tickets/support/", "support", "", None),
+    ("GET", "tickets/support/queue/", "support", "", None),
+    ("POST", "tickets/<int:ticket_id>/reply/", "support", "", lambda ctx: {"body": "on it"}),
+]
+
+# Like the database, the cache is a throwaway one, so clearing it between
+# sizes never touches the cache shared by the running workers.
+BENCH_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"}}
+
+# URL kwargs per pattern prefix, first match wins; the same kwarg name means
+# different ids per app.
+PATH_KWARGS = {
+    "ads/": {"pk": "open_ad", "request_pk": "pending_request", "performer_id": "performer_user_id"},
+    "users/profile/customer/": {"user_id": "owner_id"},
+    "users/": {"pk": "owner_id", "user_id": "performer_user_id", "base_rating": "zero", "base_comments": "zero"},
+    "comments/": {"pk": "comment"},
+    "performers/": {},
+    "tickets/": {"pk": "ticket", "ticket_id": "ticket"},
+}
+# Routes whose ad must be in a specific state
+AD_OVERRIDES = {
+    "ads/<int:pk>/report-done/": "assigned_ad",
+    "ads/<int:pk>/confirm-done/": "reported_ad",
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every route in ad/user/comment/tickets urls against freshly seeded test "
+        "databases of several sizes, and write latency percentiles and query counts as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", type=int, nargs="+", default=[100, 1000],
+            help="Dataset sizes, as number of users; ads are 5x and tickets 0.5x that.",
+        )
+        parser.add_argument("--requests", type=int, default=20, help="Requests per route and size.")
+        parser.add_argument("--output", default="bench_report.json")
+
+    def handle(self, *args, **options):
+        self.warn_uncovered_routes()
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "django": django.get_version(),
+            "database": connection.vendor,
+            "requests_per_route": options["requests"],
+            "sizes": [],
+        }
+        setup_test_environment()
+        # A throwaway test database, so real data is never touched.
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            for size in options["sizes"]:
+                self.stdout.write(f"Benchmarking with {size} users...")
+                report["sizes"].append(self.run_size(size, options["requests"]))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        with open(options["output"], "w", encoding="utf-8") as fp:
+            json.dump(report, fp, indent=2, ensure_ascii=False)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def warn_uncovered_routes(self):
+        covered = {pattern for _, pattern, *_ in ROUTES}
+        for module in URL_MODULES:
+            for url in import_module(module).urlpatterns:
+                if str(url.pattern) not in covered:
+                    self.stderr.write(f"Not benchmarked: {module} {url.pattern}")
+
+    @override_settings(CACHES=BENCH_CACHES)
+    def run_size(self, size, requests):
+        # Each dataset lives in one transaction that is rolled back afterwards,
+        # so the next size starts from an empty database.
+        with transaction.atomic():
+            call_command(
+                "seed_marketplace", users=size, ads=size * 5, tickets=max(size // 2, 1),
+                prefix="bench", stdout=StringIO(),
+            )
+            cache.clear()
+            ctx = self.build_context()
+            routes = {}
+            for method, pattern, actor, query, payload in ROUTES:
+                routes[f"{method} /api/{pattern}"] = self.run_route(
+                    ctx, method, pattern, actor, query, payload, requests
+                )
+            result = {
+                "users": size,
+                "ads": Ad.objects.count(),
+                "tickets": Ticket.objects.count(),
+                "routes": routes,
+            }
+            transaction.set_rollback(True)
+        return result
+
+    def build_context(self):
+        open_ad = Ad.objects.filter(status=Ad.Status.OPEN, requests__status=AdRequest.Status.PENDING).first()
+        pending = open_ad.requests.filter(status=AdRequest.Status.PENDING).first()
+        assigned_ad = Ad.objects.filter(status=Ad.Status.ASSIGNED, performer__isnull=False).first()
+        reported_ad = Ad.objects.filter(status=Ad.Status.DONE_REPORTED).first()
+        done_ad = Ad.objects.filter(status=Ad.Status.DONE, comments__isnull=False).first()
+        uncommented = Ad.objects.filter(status=Ad.Status.DONE, performer__isnull=False, comments__isnull=True).first()
+        if uncommented is None:
+            # Every done ad got a comment when seeding; free one up for the create route.
+            uncommented = Ad.objects.filter(status=Ad.Status.DONE, comments__isnull=False).exclude(pk=done_ad.pk).first()
+            Comment.objects.filter(ad=uncommented).delete()
+        ticket = Ticket.objects.first()
+        admin = User.objects.create_superuser("bench_admin", "bench_admin@example.com", SEED_PASSWORD)
+
+        return {
+            "actors": {
+                "owner": open_ad.creator_id,
+                "performer": pending.performer_id,
+                "applicant": User.objects.filter(roles__name=Role.Names.PERFORMER)
+                .exclude(requests_made__ad=open_ad).values_list("id", flat=True).first(),
+                "assigned_performer": assigned_ad.performer_id,
+                "reported_owner": reported_ad.creator_id,
+                "done_owner": uncommented.creator_id,
+                "ticket_owner": ticket.user_id,
+                "support": User.objects.filter(roles__name=Role.Names.SUPPORT).values_list("id", flat=True).first(),
+                "admin": admin.id,
+            },
+            "owner_username": open_ad.creator.username,
+            "owner_id": open_ad.creator_id,
+            "owner_ads": list(Ad.objects.filter(creator_id=open_ad.creator_id).values_list("id", flat=True)[:20]),
+            "category": open_ad.category_id,
+            "open_ad": open_ad.id,
+            "pending_request": pending.id,
+            "assigned_ad": assigned_ad.id,
+            "reported_ad": reported_ad.id,
+            "done_ad": done_ad.id,
+            "uncommented_ad": uncommented.id,
+            "uncommented_performer": uncommented.performer_id,
+            "performer_user_id": assigned_ad.performer_id,
+            "slots_from": quote(timezone.now().isoformat()),
+            "slots_to": quote((timezone.now() + timedelta(days=7)).isoformat()),
+            "comment": Comment.objects.values_list("id", flat=True).first(),
+            "ticket": ticket.id,
+            "zero": 0,
+        }
+
+    def build_url(self, ctx, pattern, query):
+        kwargs = next(values for prefix, values in PATH_KWARGS.items() if pattern.startswith(prefix))
+        override = AD_OVERRIDES.get(pattern)
+
+        def fill(match):
+            name = match.group(1)
+            key = override if override and name == "pk" else kwargs[name]
+            return str(ctx[key])
+
+        url = "/api/" + re.sub(r"<int:(\w+)>", fill, pattern)
+        return f"{url}?{query.format(**ctx)}" if query else url
+
+    def run_route(self, ctx, method, pattern, actor, query, payload, requests):
+        client = APIClient(raise_request_exception=False)
+        url = self.build_url(ctx, pattern, query)
+        data = payload(ctx) if payload else None
+        timings, query_counts, statuses = [], [], set()
+
+        for _ in range(requests):
+            # A fresh user object per request, as authentication would give
+            user = User.objects.get(pk=ctx["actors"][actor]) if actor else None
+            client.force_authenticate(user=user)
+            # Every request is rolled back so state-changing routes can repeat.
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    start = time.perf_counter()
+                    response = getattr(client, method.lower())(url, data, format="json")
+                    timings.append((time.perf_counter() - start) * 1000)
+                transaction.set_rollback(True)
+            query_counts.append(len(captured.captured_queries))
+            statuses.add(response.status_code)
+
+        return {
+            "status": sorted(statuses),
+            "mean_ms": round(statistics.mean(timings), 3),
+            "p50_ms": round(percentile(timings, 0.50), 3),
+            "p90_ms": round(percentile(timings, 0.90), 3),
+            "p99_ms": round(percentile(timings, 0.99), 3),
+            "max_ms": round(max(timings), 3),
+            "queries_min": min(query_counts),
+            "queries_max": max(query_counts),
+        }
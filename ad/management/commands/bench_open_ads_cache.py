@@ -0,0 +1,85 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from ad import cache as ad_cache
+from ad.views import OpenAdListAPIView
+from user.models import Role
+
+User = get_user_model()
+
+# The benchmark clears its cache between requests; a private one leaves the
+# shared cache (cached users, profiles and pages of every worker) alone.
+BENCH_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "bench"}}
+
+
+class Command(BaseCommand):
+    help = "Compare open-ads feed latency with a cold and a warm response cache."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200)
+        parser.add_argument("--page-size", type=int, default=20)
+        parser.add_argument("--user", help="Username to request as (defaults to the first performer).")
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = (
+                User.objects.filter(roles__name=Role.Names.PERFORMER).first()
+                or User.objects.filter(is_superuser=True).first()
+            )
+        if user is None:
+            raise CommandError("No performer user found; pass --user.")
+        return user
+
+    def run(self, user, page_size, requests, warm):
+        view = OpenAdListAPIView.as_view()
+        factory = APIRequestFactory()
+        timings, queries = [], 0
+        for _ in range(requests):
+            if not warm:
+                cache.clear()
+            request = factory.get("/api/ads/open/", {"page_size": page_size})
+            # A fresh user per request, as authentication would give
+            force_authenticate(request, user=User.objects.get(pk=user.pk))
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append((time.perf_counter() - start) * 1000)
+            queries += len(ctx.captured_queries)
+        return timings, queries / requests
+
+    def report(self, label, timings, queries):
+        timings = sorted(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(
+            f"{label:<6} mean={statistics.mean(timings):.2f}ms "
+            f"p50={statistics.median(timings):.2f}ms p95={p95:.2f}ms queries/request={queries:.1f}"
+        )
+
+    # Pages are cached per host, so the factory's host must be allowed.
+    @override_settings(CACHES=BENCH_CACHES, ALLOWED_HOSTS=["testserver"])
+    def handle(self, *args, **options):
+        user = self.get_user(options["user"])
+        requests = max(options["requests"], 1)
+        page_size = options["page_size"]
+
+        cold, cold_queries = self.run(user, page_size, requests, warm=False)
+        cache.clear()
+        ad_cache.stats.update(hits=0, misses=0)
+        warm, warm_queries = self.run(user, page_size, requests, warm=True)
+
+        lookups = ad_cache.stats["hits"] + ad_cache.stats["misses"]
+        self.report("cold", cold, cold_queries)
+        self.report("warm", warm, warm_queries)
+        self.stdout.write(f"hit rate={ad_cache.stats['hits'] / lookups:.1%}")
+        self.stdout.write(f"speedup (mean)={statistics.mean(cold) / statistics.mean(warm):.1f}x")
@@ -0,0 +1,222 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from ad.bookings import rebuild_bookings
+from ad.models import Ad, AdRequest, Category
+from ad.ranking import rebuild_performer_stats
+from ad.search import index_ads
+from ad.services import rebuild_open_ads_counts
+from comment.models import Comment
+from comment.services import rebuild_comment_counts, rebuild_performer_ratings
+from tickets.models import Ticket, TicketMessage
+from tickets.utils import rebuild_queue_priority
+from user.models import Profile, Role
+
+User = get_user_model()
+
+SEED_PASSWORD = "pass12345"
+
+WORDS = [
+    "تعمیر", "یخچال", "لوله‌کشی", "نقاشی", "ساختمان", "کولر", "نظافت", "منزل",
+    "برق", "کاری", "اسباب‌کشی", "باغبانی", "کابینت", "کاشی", "پکیج", "فوری",
+    "سرویس", "نصب", "شستشو", "فرش", "آبگرمکن", "درب", "پنجره", "قفل",
+]
+CATEGORIES = [
+    ("خدمات منزل", None), ("نظافت", "خدمات منزل"), ("لوله‌کشی", "خدمات منزل"),
+    ("تعمیرات", None), ("لوازم خانگی", "تعمیرات"), ("برق‌کاری", "تعمیرات"),
+    ("ساختمان", None), ("نقاشی", "ساختمان"), ("اسباب‌کشی", None),
+]
+
+# Ads are scattered around these city centres (lat, lon).
+CITIES = [(35.6892, 51.3890), (36.2605, 59.6168), (32.6546, 51.6680), (29.5918, 52.5837), (38.0962, 46.2738)]
+CITY_SPREAD_DEGREES = 0.3
+# Execution times fall on whole hours within this many days of now.
+SCHEDULE_DAYS = 30
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic marketplace (users, ads, requests, comments, tickets) with bulk inserts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument("--performer-ratio", type=float, default=0.3)
+        parser.add_argument("--support-users", type=int, default=5)
+        parser.add_argument("--ads", type=int, default=5000)
+        parser.add_argument("--requests-per-ad", type=int, default=3)
+        parser.add_argument("--tickets", type=int, default=500)
+        parser.add_argument("--messages-per-ticket", type=int, default=5)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, for reproducible datasets.")
+        parser.add_argument("--prefix", default="seed", help="Username prefix for generated users.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+
+        with transaction.atomic():
+            roles = {name: Role.objects.get_or_create(name=name)[0] for name in Role.Names.values}
+            categories = self.create_categories()
+            customers, performers, support = self.create_users(options, roles)
+            ads = self.create_ads(options["ads"], customers, performers, categories)
+            requests = self.create_requests(ads, performers, options["requests_per_ad"])
+            comments = self.create_comments(ads)
+            tickets, messages = self.create_tickets(
+                options["tickets"], options["messages_per_ticket"], customers + performers, support, ads
+            )
+
+            # Derived tables normally maintained by signals and services
+            rebuild_open_ads_counts()
+            rebuild_performer_ratings()
+            rebuild_comment_counts()
+            rebuild_performer_stats()
+            rebuild_bookings()
+            rebuild_queue_priority()
+            for start in range(0, len(ads), self.batch_size):
+                index_ads(ads[start:start + self.batch_size])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(customers) + len(performers) + len(support)} users, {len(ads)} ads, "
+            f"{len(requests)} requests, {len(comments)} comments, "
+            f"{len(tickets)} tickets, {len(messages)} ticket messages."
+        ))
+
+    def words(self, count):
+        return " ".join(self.rng.choice(WORDS) for _ in range(count))
+
+    def create_categories(self):
+        categories = {}
+        for name, parent in CATEGORIES:
+            categories[name], _ = Category.objects.get_or_create(
+                name=name, defaults={"parent": categories.get(parent)}
+            )
+        return list(categories.values())
+
+    def create_users(self, options, roles):
+        prefix = options["prefix"]
+        offset = User.objects.filter(username__startswith=prefix).count()
+        # Hashing once keeps seeding fast; every seeded user shares SEED_PASSWORD.
+        password = make_password(SEED_PASSWORD)
+        total = options["users"] + options["support_users"]
+
+        users = [
+            User(
+                username=f"{prefix}{offset + i}",
+                email=f"{prefix}{offset + i}@example.com",
+                phone_number=f"0912{offset + i:07d}",
+                password=password,
+            )
+            for i in range(total)
+        ]
+        # bulk_create skips User.save(), which fills the login key columns.
+        for user in users:
+            user.set_login_keys()
+        users = User.objects.bulk_create(users, batch_size=self.batch_size)
+        Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=self.batch_size)
+
+        support = users[options["users"]:]
+        regular = users[:options["users"]]
+        performer_count = int(len(regular) * options["performer_ratio"])
+        performers, customers = regular[:performer_count], regular[performer_count:]
+
+        links = [(user, roles[Role.Names.CUSTOMER]) for user in regular]
+        links += [(user, roles[Role.Names.PERFORMER]) for user in performers]
+        links += [(user, roles[Role.Names.SUPPORT]) for user in support]
+        User.roles.through.objects.bulk_create(
+            [User.roles.through(user_id=user.id, role_id=role.id) for user, role in links],
+            batch_size=self.batch_size,
+        )
+        return customers or performers, performers, support
+
+    def create_ads(self, count, customers, performers, categories):
+        statuses = list(Ad.Status.values)
+        now = timezone.now().replace(minute=0, second=0, microsecond=0)
+        hours = SCHEDULE_DAYS * 24
+        ads = []
+        for i in range(count):
+            status = statuses[i % len(statuses)]
+            has_performer = performers and status in (Ad.Status.ASSIGNED, Ad.Status.DONE_REPORTED, Ad.Status.DONE)
+            ads.append(Ad(
+                title=self.words(3),
+                description=self.words(25),
+                category=self.rng.choice(categories),
+                status=status,
+                creator=self.rng.choice(customers),
+                performer=self.rng.choice(performers) if has_performer else None,
+                execution_location=self.words(2),
+                execution_time=now + timedelta(hours=self.rng.randint(-hours, hours)),
+                **self.coordinates(),
+            ))
+            # bulk_create skips Ad.save(), which fills the geo cell.
+            ads[-1].set_geo_cell()
+        return Ad.objects.bulk_create(ads, batch_size=self.batch_size)
+
+    def coordinates(self):
+        # One ad in ten has no location.
+        if self.rng.random() < 0.1:
+            return {}
+        lat, lon = self.rng.choice(CITIES)
+        return {
+            "latitude": lat + self.rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES),
+            "longitude": lon + self.rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES),
+        }
+
+    def create_requests(self, ads, performers, per_ad):
+        requests = []
+        for ad in ads:
+            applicants = self.rng.sample(performers, min(per_ad, len(performers)))
+            if ad.performer_id is not None:
+                applicants = [ad.performer] + [p for p in applicants if p.id != ad.performer_id][:per_ad - 1]
+            for performer in applicants:
+                if ad.status == Ad.Status.OPEN:
+                    status = AdRequest.Status.PENDING
+                elif performer.id == ad.performer_id:
+                    status = AdRequest.Status.APPROVED
+                else:
+                    status = AdRequest.Status.REJECTED
+                requests.append(AdRequest(ad=ad, performer=performer, status=status))
+        return AdRequest.objects.bulk_create(requests, batch_size=self.batch_size)
+
+    def create_comments(self, ads):
+        comments = [
+            Comment(
+                ad=ad,
+                user=ad.creator,
+                performer=ad.performer,
+                rating=self.rng.randint(1, 5),
+                content=self.words(8),
+            )
+            for ad in ads
+            if ad.status == Ad.Status.DONE and ad.performer_id is not None
+        ]
+        return Comment.objects.bulk_create(comments, batch_size=self.batch_size)
+
+    def create_tickets(self, count, per_ticket, users, support, ads):
+        tickets = Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    title=self.words(3),
+                    user=self.rng.choice(users),
+                    ad=self.rng.choice(ads) if ads and self.rng.random() < 0.7 else None,
+                    status=self.rng.choice(Ticket.Status.values),
+                )
+                for _ in range(count)
+            ],
+            batch_size=self.batch_size,
+        )
+        messages = []
+        for ticket in tickets:
+            agent = self.rng.choice(support) if support else ticket.user
+            for i in range(per_ticket):
+                messages.append(TicketMessage(
+                    ticket=ticket,
+                    sender=ticket.user if i % 2 == 0 else agent,
+                    body=self.words(15),
+                ))
+        TicketMessage.objects.bulk_create(messages, batch_size=self.batch_size)
+        return tickets, messages
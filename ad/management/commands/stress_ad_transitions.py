@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.db.models import Count, F, Q
+from django.http import Http404
+from rest_framework.exceptions import APIException
+
+from ad.models import Ad, AdRequest, Category
+from ad.services import bulk_create_ads, choose_ad_request, confirm_ad_done, report_ad_done
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Race many threads over the choose / report-done / confirm-done transitions of the same ads, "
+        "check that no ad is ever assigned twice and report transitions per second."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--ads", type=int, default=20)
+        parser.add_argument("--performers", type=int, default=8, help="Competing requests per ad.")
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--duplicates", type=int, default=4,
+            help="Concurrent attempts per ad for the report-done and confirm-done phases.",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--keep", action="store_true", help="Keep the generated rows.")
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options["seed"])
+        self.threads = max(options["threads"], 1)
+        prefix = f"stress_{uuid.uuid4().hex[:8]}_"
+        creator = User.objects.create_user(username=f"{prefix}creator", password=None)
+        performers = [
+            User.objects.create_user(username=f"{prefix}performer{i}", password=None)
+            for i in range(max(options["performers"], 2))
+        ]
+        category, _ = Category.objects.get_or_create(name="stress")
+        try:
+            ads = bulk_create_ads(
+                items=[{"title": f"stress {i}", "description": "d", "category": category} for i in range(options["ads"])],
+                user=creator,
+            )
+            requests = AdRequest.objects.bulk_create(
+                [AdRequest(ad=ad, performer=performer) for ad in ads for performer in performers]
+            )
+            self.run_phases(ads, requests, creator, options["duplicates"])
+        finally:
+            if not options["keep"]:
+                User.objects.filter(username__startswith=prefix).delete()
+
+    def run_phases(self, ads, requests, creator, duplicates):
+        ad_ids = [ad.id for ad in ads]
+        chosen = self.run_phase("choose", [
+            (choose_ad_request, {"ad_id": req.ad_id, "request_id": req.id, "user": creator}) for req in requests
+        ])
+
+        performer_of = dict(Ad.objects.filter(pk__in=ad_ids).values_list("id", "performer_id"))
+        performers = {pk: User(pk=pk) for pk in set(performer_of.values()) if pk is not None}
+        reported = self.run_phase("report", [
+            (report_ad_done, {"ad_id": ad_id, "user": performers[performer_of[ad_id]]})
+            for ad_id in ad_ids if performer_of[ad_id] is not None for _ in range(duplicates)
+        ])
+        confirmed = self.run_phase("confirm", [
+            (confirm_ad_done, {"ad_id": ad_id, "user": creator}) for ad_id in ad_ids for _ in range(duplicates)
+        ])
+
+        # Exactly one winner per ad and transition, and the approved request matches the assignment.
+        double = Ad.objects.filter(pk__in=ad_ids).annotate(
+            approved=Count("requests", filter=Q(requests__status=AdRequest.Status.APPROVED))
+        ).exclude(approved=1).count()
+        double += AdRequest.objects.filter(ad_id__in=ad_ids, status=AdRequest.Status.APPROVED).exclude(
+            performer_id=F("ad__performer_id")
+        ).count()
+        self.stdout.write(f"double assignments: {double}")
+        if double or not (chosen == reported == confirmed == len(ads)):
+            raise CommandError(
+                f"Expected one winner per ad ({len(ads)}); got choose={chosen}, report={reported}, "
+                f"confirm={confirmed}, double assignments={double}."
+            )
+
+    def run_phase(self, label, tasks):
+        self.rng.shuffle(tasks)
+        outcomes = Counter()
+        lock = threading.Lock()
+
+        def worker(chunk):
+            local = Counter()
+            try:
+                for func, kwargs in chunk:
+                    while True:
+                        try:
+                            func(**kwargs)
+                            local["won"] += 1
+                        except (APIException, Http404):
+                            local["lost"] += 1
+                        except OperationalError as exc:
+                            # SQLite reports writer contention as "locked"; retry like a client would.
+                            if "locked" not in str(exc):
+                                raise
+                            local["retries"] += 1
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(local)
+
+        threads = [
+            threading.Thread(target=worker, args=(tasks[i::self.threads],)) for i in range(self.threads)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{label:<8} attempts={len(tasks)} won={outcomes['won']} lost={outcomes['lost']} "
+            f"lock_retries={outcomes['retries']} elapsed={elapsed * 1000:.1f}ms "
+            f"transitions/sec={outcomes['won'] / elapsed:.1f} attempts/sec={len(tasks) / elapsed:.1f}"
+        )
+        return outcomes["won"]
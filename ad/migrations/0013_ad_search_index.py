@@ -0,0 +1,65 @@
+# Generated by Django 6.0 on 2026-10-18 10:52
+
+import re
+
+from django.db import migrations
+
+# Frozen copies of ad.search's table name and normalization, so later
+# changes to that module can't change what this migration does.
+FTS_TABLE = 'ad_ad_fts'
+BATCH_SIZE = 1000
+
+PERSIAN_TRANSLATION = str.maketrans({
+    '\u064a': '\u06cc',  # Arabic yeh -> Persian yeh
+    '\u0649': '\u06cc',  # alef maksura -> Persian yeh
+    '\u0643': '\u06a9',  # Arabic kaf -> Persian kaf
+    '\u0629': '\u0647',  # teh marbuta -> heh
+    '\u200c': None,      # ZWNJ
+    '\u0640': None,      # tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+DIACRITICS = re.compile('[\u064b-\u065f\u0670]')
+
+
+def normalize_text(text):
+    if not text:
+        return ''
+    return DIACRITICS.sub('', text.translate(PERSIAN_TRANSLATION)).lower()
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Ad = apps.get_model('ad', 'Ad')
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+    rows = Ad.objects.values_list('id', 'title', 'description').iterator(chunk_size=BATCH_SIZE)
+    with schema_editor.connection.cursor() as cursor:
+        batch = []
+        for ad_id, title, description in rows:
+            batch.append((ad_id, normalize_text(title), normalize_text(description)))
+            if len(batch) == BATCH_SIZE:
+                cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)", batch)
+                batch = []
+        if batch:
+            cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)", batch)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0012_ad_status_date_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
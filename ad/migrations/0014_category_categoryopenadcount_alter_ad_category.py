@@ -0,0 +1,93 @@
+# Generated by Django 6.0 on 2026-10-18 11:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def forwards_categories(apps, schema_editor):
+    Ad = apps.get_model('ad', 'Ad')
+    Category = apps.get_model('ad', 'Category')
+    CategoryOpenAdCount = apps.get_model('ad', 'CategoryOpenAdCount')
+
+    categories = {}
+    open_counts = {}
+    for ad in Ad.objects.only('id', 'category_name', 'status').iterator():
+        # Collapse whitespace/case variants of the free-form name into one category.
+        name = ' '.join((ad.category_name or '').split()) or 'سایر'
+        key = name.lower()
+        if key not in categories:
+            categories[key] = Category.objects.create(name=name)
+        category = categories[key]
+        Ad.objects.filter(pk=ad.pk).update(category_ref=category)
+        if ad.status == 'open':
+            open_counts[category.pk] = open_counts.get(category.pk, 0) + 1
+
+    CategoryOpenAdCount.objects.bulk_create([
+        CategoryOpenAdCount(category=category, count=open_counts.get(category.pk, 0))
+        for category in categories.values()
+    ])
+
+
+def backwards_categories(apps, schema_editor):
+    Ad = apps.get_model('ad', 'Ad')
+    for ad in Ad.objects.select_related('category_ref').iterator():
+        Ad.objects.filter(pk=ad.pk).update(category_name=ad.category_ref.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0013_ad_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='نام')),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='children', to='ad.category', verbose_name='دسته‌بندی والد')),
+            ],
+            options={
+                'verbose_name': 'دسته‌بندی',
+                'verbose_name_plural': 'دسته‌بندی‌ها',
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryOpenAdCount',
+            fields=[
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='open_ads_counter', serialize=False, to='ad.category', verbose_name='دسته‌بندی')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی‌های باز')),
+            ],
+            options={
+                'verbose_name': 'شمارنده آگهی‌های باز',
+                'verbose_name_plural': 'شمارنده‌های آگهی‌های باز',
+            },
+        ),
+        migrations.RenameField(
+            model_name='ad',
+            old_name='category',
+            new_name='category_name',
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='ad.category'),
+        ),
+        migrations.RunPython(forwards_categories, backwards_categories),
+        migrations.RemoveField(
+            model_name='ad',
+            name='category_name',
+        ),
+        migrations.RenameField(
+            model_name='ad',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='ad',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='ads', to='ad.category', verbose_name='دسته‌بندی'),
+        ),
+    ]
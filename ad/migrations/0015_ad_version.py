@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 10:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0014_category_categoryopenadcount_alter_ad_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='نسخه'),
+        ),
+    ]
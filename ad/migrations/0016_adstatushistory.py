@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-10-18 10:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0015_ad_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdStatusHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(choices=[('open', 'باز'), ('assigned', 'تخصیص شده'), ('done_reported', 'اعلام پایان کار'), ('done', 'انجام شده'), ('cancelled', 'لغو شده')], max_length=20, verbose_name='وضعیت قبلی')),
+                ('to_status', models.CharField(choices=[('open', 'باز'), ('assigned', 'تخصیص شده'), ('done_reported', 'اعلام پایان کار'), ('done', 'انجام شده'), ('cancelled', 'لغو شده')], max_length=20, verbose_name='وضعیت جدید')),
+                ('changed_at', models.DateTimeField(auto_now_add=True, verbose_name='زمان تغییر')),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='تغییردهنده')),
+                ('ad', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_history', to='ad.ad', verbose_name='آگهی')),
+            ],
+            options={
+                'verbose_name': 'تاریخچه وضعیت آگهی',
+                'verbose_name_plural': 'تاریخچه وضعیت آگهی\u200cها',
+                'ordering': ['changed_at', 'id'],
+                'indexes': [models.Index(fields=['ad', 'changed_at'], name='ad_status_history_ad_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 6.0 on 2026-10-18 11:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def fill_performer_stats(apps, schema_editor):
+    Ad = apps.get_model('ad', 'Ad')
+    PerformerStats = apps.get_model('ad', 'PerformerStats')
+    PerformerCategoryStats = apps.get_model('ad', 'PerformerCategoryStats')
+    AdStatusHistory = apps.get_model('ad', 'AdStatusHistory')
+
+    performed = Ad.objects.filter(performer__isnull=False).order_by()
+    last_done = dict(
+        AdStatusHistory.objects.filter(to_status='done', ad__performer__isnull=False).order_by()
+        .values_list('ad__performer_id').annotate(last=Max('changed_at'))
+    )
+    PerformerStats.objects.bulk_create([
+        PerformerStats(
+            performer_id=row['performer_id'],
+            assigned_count=row['assigned'],
+            done_count=row['done'],
+            last_done_at=last_done.get(row['performer_id']),
+        )
+        for row in performed.values('performer_id').annotate(
+            assigned=Count('id'), done=Count('id', filter=Q(status='done'))
+        )
+    ])
+    PerformerCategoryStats.objects.bulk_create([
+        PerformerCategoryStats(performer_id=row['performer_id'], category_id=row['category_id'], done_count=row['done'])
+        for row in performed.filter(status='done').values('performer_id', 'category_id').annotate(done=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0016_adstatushistory'),
+        ('user', '0009_user_login_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformerStats',
+            fields=[
+                ('performer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='performer_stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='پیمانکار')),
+                ('assigned_count', models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی\u200cهای تخصیص\u200cیافته')),
+                ('done_count', models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی\u200cهای انجام\u200cشده')),
+                ('last_done_at', models.DateTimeField(blank=True, null=True, verbose_name='آخرین انجام کار')),
+            ],
+            options={
+                'verbose_name': 'آمار پیمانکار',
+                'verbose_name_plural': 'آمار پیمانکاران',
+            },
+        ),
+        migrations.CreateModel(
+            name='PerformerCategoryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('done_count', models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی\u200cهای انجام\u200cشده')),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ad.category', verbose_name='دسته\u200cبندی')),
+                ('performer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_stats', to=settings.AUTH_USER_MODEL, verbose_name='پیمانکار')),
+            ],
+            options={
+                'verbose_name': 'آمار پیمانکار در دسته\u200cبندی',
+                'verbose_name_plural': 'آمار پیمانکاران در دسته\u200cبندی\u200cها',
+                'constraints': [models.UniqueConstraint(fields=('performer', 'category'), name='unique_performer_category_stats')],
+            },
+        ),
+        migrations.RunPython(fill_performer_stats, migrations.RunPython.noop),
+    ]
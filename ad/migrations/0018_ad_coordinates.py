@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 11:41
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0017_performer_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ad',
+            name='geo_cell',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True, verbose_name='خانه جغرافیایی'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-90), django.core.validators.MaxValueValidator(90)], verbose_name='عرض جغرافیایی'),
+        ),
+        migrations.AddField(
+            model_name='ad',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True, validators=[django.core.validators.MinValueValidator(-180), django.core.validators.MaxValueValidator(180)], verbose_name='طول جغرافیایی'),
+        ),
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['status', 'geo_cell', 'latitude', 'longitude'], name='ad_status_geo_cell_idx'),
+        ),
+    ]
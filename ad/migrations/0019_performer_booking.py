@@ -0,0 +1,52 @@
+# Generated by Django 6.0 on 2026-10-18 11:45
+
+from datetime import timedelta
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+# ad.bookings.BOOKING_DURATION at the time of this migration
+BOOKING_DURATION = timedelta(hours=2)
+
+
+def fill_bookings(apps, schema_editor):
+    Ad = apps.get_model('ad', 'Ad')
+    PerformerBooking = apps.get_model('ad', 'PerformerBooking')
+
+    booked = Ad.objects.filter(
+        performer__isnull=False, execution_time__isnull=False, status__in=('assigned', 'done_reported', 'done')
+    ).order_by().values_list('id', 'performer_id', 'execution_time')
+    PerformerBooking.objects.bulk_create([
+        PerformerBooking(ad_id=ad_id, performer_id=performer_id, start=start, end=start + BOOKING_DURATION)
+        for ad_id, performer_id, start in booked.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0018_ad_coordinates'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformerBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField(verbose_name='شروع')),
+                ('end', models.DateTimeField(verbose_name='پایان')),
+                ('ad', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='booking', to='ad.ad', verbose_name='آگهی')),
+                ('performer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL, verbose_name='پیمانکار')),
+            ],
+            options={
+                'verbose_name': 'رزرو پیمانکار',
+                'verbose_name_plural': 'رزروهای پیمانکاران',
+                'ordering': ['start'],
+                'indexes': [models.Index(fields=['performer', 'start', 'end'], name='performer_booking_range_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(('end__gt', models.F('start'))), name='performer_booking_end_after_start')],
+            },
+        ),
+        migrations.RunPython(fill_bookings, migrations.RunPython.noop),
+    ]
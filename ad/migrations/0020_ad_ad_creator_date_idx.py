@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 11:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0019_performer_booking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ad',
+            index=models.Index(fields=['creator', '-date_added', '-id'], name='ad_creator_date_idx'),
+        ),
+    ]
@@ -1,5 +1,50 @@
-from django.db import models
 from django.conf import settings
+from django.core.validators import MaxValueValidator, MinValueValidator
+from django.db import models
+
+from .geo import geo_cell
+
+
+class Category(models.Model):
+    name = models.CharField(max_length=255, unique=True, verbose_name='نام')
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.PROTECT,
+        related_name='children',
+        null=True,
+        blank=True,
+        verbose_name='دسته‌بندی والد'
+    )
+
+    class Meta:
+        ordering = ['name']
+        verbose_name = 'دسته‌بندی'
+        verbose_name_plural = 'دسته‌بندی‌ها'
+
+    def __str__(self):
+        return self.name
+
+
+class CategoryOpenAdCount(models.Model):
+    """
+    Number of open ads per category, kept in step with Ad status changes
+    so facet counts never need a GROUP BY over the ad table.
+    """
+    category = models.OneToOneField(
+        Category,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='open_ads_counter',
+        verbose_name='دسته‌بندی'
+    )
+    count = models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی‌های باز')
+
+    class Meta:
+        verbose_name = 'شمارنده آگهی‌های باز'
+        verbose_name_plural = 'شمارنده‌های آگهی‌های باز'
+
+    def __str__(self):
+        return f'{self.category.name}: {self.count}'
 
 
 class Ad(models.Model):
@@ -12,7 +57,12 @@ class Ad(models.Model):
 
     title = models.CharField(max_length=255, verbose_name='عنوان')
     description = models.TextField(verbose_name='توضیحات')
-    category = models.CharField(max_length=255, verbose_name='دسته‌بندی')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.PROTECT,
+        related_name='ads',
+        verbose_name='دسته‌بندی'
+    )
     status = models.CharField(
         max_length=20,
         choices=Status.choices,
@@ -39,15 +89,42 @@ class Ad(models.Model):
 
     execution_time = models.DateTimeField(null=True, blank=True, verbose_name='زمان اجرا')
     execution_location = models.CharField(max_length=500, null=True, blank=True, verbose_name='محل اجرا')
+    latitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-90), MaxValueValidator(90)], verbose_name='عرض جغرافیایی'
+    )
+    longitude = models.FloatField(
+        null=True, blank=True, validators=[MinValueValidator(-180), MaxValueValidator(180)], verbose_name='طول جغرافیایی'
+    )
+    # Grid cell of (latitude, longitude), for radius searches; see ad.geo
+    geo_cell = models.PositiveIntegerField(null=True, blank=True, editable=False, verbose_name='خانه جغرافیایی')
+    # Bumped by every status transition; see services._transition
+    version = models.PositiveIntegerField(default=0, editable=False, verbose_name='نسخه')
 
     class Meta:
         ordering = ['-date_added']
+        indexes = [
+            models.Index(fields=['status', '-date_added', '-id'], name='ad_status_date_idx'),
+            # A customer's ads, newest first; see user.pagination
+            models.Index(fields=['creator', '-date_added', '-id'], name='ad_creator_date_idx'),
+            # Covers the nearby search's candidate scan; see ad.geo
+            models.Index(fields=['status', 'geo_cell', 'latitude', 'longitude'], name='ad_status_geo_cell_idx'),
+        ]
         verbose_name = 'آگهی'
         verbose_name_plural = 'آگهی‌ها'
 
     def __str__(self):
         return f'{self.title} - {self.get_status_display()}'
 
+    def set_geo_cell(self):
+        self.geo_cell = geo_cell(self.latitude, self.longitude)
+
+    def save(self, *args, **kwargs):
+        self.set_geo_cell()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geo_cell'}
+        super().save(*args, **kwargs)
+
 
 class AdRequest(models.Model):
     class Status(models.TextChoices):
@@ -68,4 +145,112 @@ class AdRequest(models.Model):
         verbose_name = 'درخواست'
         verbose_name_plural = 'درخواست‌ها'
     def __str__(self):
-           return f'درخواست {self.id} برای آگهی {self.ad.title} توسط {self.performer.username} - {self.get_status_display()}' 
\ No newline at end of file
+           return f'درخواست {self.id} برای آگهی {self.ad.title} توسط {self.performer.username} - {self.get_status_display()}' 
+
+class AdStatusHistory(models.Model):
+    """
+    One row per status transition. An ad enters 'open' at its date_added,
+    so creation is not recorded.
+    """
+    ad = models.ForeignKey(Ad, on_delete=models.CASCADE, related_name='status_history', verbose_name='آگهی')
+    from_status = models.CharField(max_length=20, choices=Ad.Status.choices, verbose_name='وضعیت قبلی')
+    to_status = models.CharField(max_length=20, choices=Ad.Status.choices, verbose_name='وضعیت جدید')
+    actor = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        null=True,
+        blank=True,
+        verbose_name='تغییردهنده'
+    )
+    changed_at = models.DateTimeField(auto_now_add=True, verbose_name='زمان تغییر')
+
+    class Meta:
+        ordering = ['changed_at', 'id']
+        indexes = [
+            models.Index(fields=['ad', 'changed_at'], name='ad_status_history_ad_idx'),
+        ]
+        verbose_name = 'تاریخچه وضعیت آگهی'
+        verbose_name_plural = 'تاریخچه وضعیت آگهی‌ها'
+
+    def __str__(self):
+        return f'{self.ad_id}: {self.from_status} -> {self.to_status}'
+
+
+class PerformerStats(models.Model):
+    """
+    Per-performer features for ranking applicants (see ad.ranking), kept in
+    step with the assign and confirm_done transitions.
+    """
+    performer = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='performer_stats',
+        verbose_name='پیمانکار'
+    )
+    assigned_count = models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی‌های تخصیص‌یافته')
+    done_count = models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی‌های انجام‌شده')
+    last_done_at = models.DateTimeField(null=True, blank=True, verbose_name='آخرین انجام کار')
+
+    class Meta:
+        verbose_name = 'آمار پیمانکار'
+        verbose_name_plural = 'آمار پیمانکاران'
+
+    def __str__(self):
+        return f'{self.performer_id}: {self.done_count}/{self.assigned_count}'
+
+
+class PerformerCategoryStats(models.Model):
+    """
+    Completed ads per performer and category; only pairs with at least one
+    completed ad have a row.
+    """
+    performer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='category_stats',
+        verbose_name='پیمانکار'
+    )
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name='+', verbose_name='دسته‌بندی')
+    done_count = models.PositiveIntegerField(default=0, verbose_name='تعداد آگهی‌های انجام‌شده')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['performer', 'category'], name='unique_performer_category_stats')
+        ]
+        verbose_name = 'آمار پیمانکار در دسته‌بندی'
+        verbose_name_plural = 'آمار پیمانکاران در دسته‌بندی‌ها'
+
+    def __str__(self):
+        return f'{self.performer_id} / {self.category_id}: {self.done_count}'
+
+
+class PerformerBooking(models.Model):
+    """
+    The time an assigned performer is busy with an ad, so overlap checks
+    and free slots are range scans over one performer's bookings.
+    """
+    performer = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='bookings',
+        verbose_name='پیمانکار'
+    )
+    ad = models.OneToOneField(Ad, on_delete=models.CASCADE, related_name='booking', verbose_name='آگهی')
+    start = models.DateTimeField(verbose_name='شروع')
+    end = models.DateTimeField(verbose_name='پایان')
+
+    class Meta:
+        ordering = ['start']
+        indexes = [
+            models.Index(fields=['performer', 'start', 'end'], name='performer_booking_range_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end__gt=models.F('start')), name='performer_booking_end_after_start'),
+        ]
+        verbose_name = 'رزرو پیمانکار'
+        verbose_name_plural = 'رزروهای پیمانکاران'
+
+    def __str__(self):
+        return f'{self.performer_id}: {self.start} - {self.end}'
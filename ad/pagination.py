@@ -0,0 +1,140 @@
+import json
+from base64 import b64decode, b64encode
+from datetime import date, datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Seek-based pagination over a fixed ordering.
+
+    The cursor carries the ordering values of the last row of the page, so the
+    next page is a range scan from that point instead of an OFFSET. The last
+    ordering field must be unique (usually ``id``) to break ties.
+    """
+
+    ordering = ("-id",)
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.url = None
+        return self.get_page(queryset, self.decode_cursor(request, queryset.model))
+
+    def first_page(self, queryset, request, url):
+        """
+        The first page of ``queryset`` for embedding in another response;
+        get_next_link() then continues at ``url``, the list endpoint.
+        """
+        self.request = request
+        self.url = url
+        return self.get_page(queryset)
+
+    def get_page(self, queryset, position=None):
+        self.next_position = None
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        results = list(queryset[: self.page_size + 1])
+        if len(results) > self.page_size:
+            results = results[: self.page_size]
+            self.next_position = [self.get_row_value(results[-1], name) for name, _ in self.get_fields()]
+        return results
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_fields(self):
+        return [(field.lstrip("-"), field.startswith("-")) for field in self.ordering]
+
+    def get_seek_filter(self, position):
+        # (a, b, c) < (x, y, z)  =>  a <= x AND (a < x OR (a = x AND (b < y OR ...)))
+        # The leading bound keeps the filter sargable on the first index column.
+        fields = self.get_fields()
+        condition = None
+        for (name, descending), value in reversed(list(zip(fields, position))):
+            strict = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+            condition = strict if condition is None else strict | (Q(**{name: value}) & condition)
+
+        name, descending = fields[0]
+        return Q(**{f"{name}__{'lte' if descending else 'gte'}": position[0]}) & condition
+
+    def get_row_value(self, obj, name):
+        for attr in name.split("__"):
+            obj = getattr(obj, attr)
+        return obj
+
+    def get_model_field(self, model, name):
+        *path, last = name.split("__")
+        try:
+            for attr in path:
+                model = model._meta.get_field(attr).related_model
+            return model._meta.get_field(last)
+        except (AttributeError, FieldDoesNotExist):
+            # Annotations are not model fields; their JSON value is used as is.
+            return None
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in position]
+        return b64encode(json.dumps(values).encode("ascii")).decode("ascii")
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        fields = self.get_fields()
+        try:
+            values = json.loads(b64decode(encoded.encode("ascii")).decode("ascii"))
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            position = []
+            for (name, _), value in zip(fields, values):
+                field = self.get_model_field(model, name)
+                position.append(field.to_python(value) if field is not None and value is not None else value)
+        except (TypeError, ValueError, UnicodeError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri(self.url)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+
+class OpenAdFeedPagination(KeysetPagination):
+    ordering = ("-date_added", "-id")
@@ -0,0 +1,140 @@
+import math
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FilteredRelation, Max, Q
+from django.utils import timezone
+
+from .models import Ad, AdStatusHistory, PerformerCategoryStats, PerformerStats
+
+# Share of each feature in an applicant's score; the features are in [0, 1].
+WEIGHTS = {
+    "rating": 0.35,
+    "category_experience": 0.25,
+    "completion_rate": 0.25,
+    "recency": 0.15,
+}
+# A performer without comments is rated as if they had PRIOR_WEIGHT
+# comments of PRIOR_RATING, so one 5-star comment doesn't top the list.
+PRIOR_RATING = 3.5
+PRIOR_WEIGHT = 3
+# Days after which the recency of the last completed ad halves
+RECENCY_HALF_LIFE_DAYS = 30
+
+
+def _increment(model, lookup, values, **deltas):
+    # Must run inside the transaction of the transition being counted.
+    changes = {**values, **{name: F(name) + delta for name, delta in deltas.items()}}
+    if model.objects.filter(**lookup).update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **values, **deltas)
+    except IntegrityError:
+        # Another transaction created the row first; add on top of it.
+        model.objects.filter(**lookup).update(**changes)
+
+
+def record_assignments(moved):
+    for performer_id, count in Counter(ad.performer_id for ad, _ in moved).items():
+        _increment(PerformerStats, {"performer_id": performer_id}, {}, assigned_count=count)
+
+
+def record_completions(moved):
+    now = timezone.now()
+    for performer_id, count in Counter(ad.performer_id for ad, _ in moved).items():
+        _increment(PerformerStats, {"performer_id": performer_id}, {"last_done_at": now}, done_count=count)
+    for (performer_id, category_id), count in Counter((ad.performer_id, ad.category_id) for ad, _ in moved).items():
+        _increment(PerformerCategoryStats, {"performer_id": performer_id, "category_id": category_id}, {}, done_count=count)
+
+
+@transaction.atomic
+def rebuild_performer_stats():
+    """
+    Recompute the ranking features from the ad table, for data loaded
+    outside the normal write paths (imports, seeding).
+    """
+    performed = Ad.objects.filter(performer__isnull=False).order_by()
+    totals = performed.values("performer_id").annotate(
+        assigned=Count("id"), done=Count("id", filter=Q(status=Ad.Status.DONE))
+    )
+    last_done = dict(
+        AdStatusHistory.objects.filter(to_status=Ad.Status.DONE, ad__performer__isnull=False).order_by()
+        .values_list("ad__performer_id").annotate(last=Max("changed_at"))
+    )
+    per_category = (
+        performed.filter(status=Ad.Status.DONE).values("performer_id", "category_id").annotate(done=Count("id"))
+    )
+
+    PerformerStats.objects.all().delete()
+    PerformerCategoryStats.objects.all().delete()
+    PerformerStats.objects.bulk_create([
+        PerformerStats(
+            performer_id=row["performer_id"],
+            assigned_count=row["assigned"],
+            done_count=row["done"],
+            last_done_at=last_done.get(row["performer_id"]),
+        )
+        for row in totals
+    ], batch_size=1000)
+    PerformerCategoryStats.objects.bulk_create([
+        PerformerCategoryStats(performer_id=row["performer_id"], category_id=row["category_id"], done_count=row["done"])
+        for row in per_category
+    ], batch_size=1000)
+
+
+def with_ranking_features(requests, category_id):
+    """
+    ``requests`` annotated with their performer's features, read through
+    LEFT JOINs in the same query.
+    """
+    return requests.annotate(
+        in_category=FilteredRelation(
+            "performer__category_stats", condition=Q(performer__category_stats__category_id=category_id)
+        ),
+        rating_sum=F("performer__rating__rating_sum"),
+        rating_count=F("performer__rating__rating_count"),
+        assigned_count=F("performer__performer_stats__assigned_count"),
+        done_count=F("performer__performer_stats__done_count"),
+        last_done_at=F("performer__performer_stats__last_done_at"),
+        category_done_count=F("in_category__done_count"),
+    )
+
+
+def score_features(rows, now=None):
+    """
+    Scores for rows carrying the with_ranking_features annotations. Each
+    feature is computed as a column over all rows, so category experience
+    is scaled against the most experienced applicant.
+    """
+    now = now or timezone.now()
+    rating = [
+        ((row.rating_sum or 0) + PRIOR_RATING * PRIOR_WEIGHT) / ((row.rating_count or 0) + PRIOR_WEIGHT) / 5
+        for row in rows
+    ]
+    experience = [math.log1p(row.category_done_count or 0) for row in rows]
+    most = max(experience, default=0) or 1
+    experience = [value / most for value in experience]
+    # Laplace smoothing: no history counts as a 50% completion rate.
+    completion = [((row.done_count or 0) + 1) / ((row.assigned_count or 0) + 2) for row in rows]
+    recency = [
+        0.5 ** ((now - row.last_done_at).total_seconds() / 86400 / RECENCY_HALF_LIFE_DAYS) if row.last_done_at else 0.0
+        for row in rows
+    ]
+    return [
+        WEIGHTS["rating"] * r + WEIGHTS["category_experience"] * e
+        + WEIGHTS["completion_rate"] * c + WEIGHTS["recency"] * t
+        for r, e, c, t in zip(rating, experience, completion, recency)
+    ]
+
+
+def rank_requests(ad, requests):
+    """
+    ``requests`` for ``ad`` as a list, best applicant first, each with a
+    ``score`` attribute. Costs one query.
+    """
+    rows = list(with_ranking_features(requests, ad.category_id))
+    for row, score in zip(rows, score_features(rows)):
+        row.score = round(score, 4)
+    rows.sort(key=lambda row: (-row.score, row.created_at, row.id))
+    return rows
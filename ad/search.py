@@ -0,0 +1,112 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from .models import Ad
+
+FTS_TABLE = "ad_ad_fts"
+
+# Title matches weigh more than description matches in the bm25 rank.
+TITLE_WEIGHT = 2.0
+DESCRIPTION_WEIGHT = 1.0
+
+_PERSIAN_TRANSLATION = str.maketrans({
+    "\u064a": "\u06cc",  # Arabic yeh -> Persian yeh
+    "\u0649": "\u06cc",  # alef maksura -> Persian yeh
+    "\u0643": "\u06a9",  # Arabic kaf -> Persian kaf
+    "\u0629": "\u0647",  # teh marbuta -> heh
+    "\u200c": None,      # ZWNJ, so "می‌خواهم" and "میخواهم" index the same
+    "\u0640": None,      # tatweel
+    **{chr(0x06F0 + i): str(i) for i in range(10)},  # Persian digits
+    **{chr(0x0660 + i): str(i) for i in range(10)},  # Arabic-Indic digits
+})
+_DIACRITICS = re.compile("[\u064b-\u065f\u0670]")
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize_text(text):
+    if not text:
+        return ""
+    return _DIACRITICS.sub("", text.translate(_PERSIAN_TRANSLATION)).lower()
+
+
+def build_match_query(query):
+    # Every term is quoted so user input can't inject FTS operators,
+    # and prefix-matched so partial words still hit.
+    terms = _TOKEN.findall(normalize_text(query))
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def is_supported():
+    return connection.vendor == "sqlite"
+
+
+def index_ad(ad):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [ad.pk])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+            [ad.pk, normalize_text(ad.title), normalize_text(ad.description)],
+        )
+
+
+def index_ads(ads):
+    if not is_supported():
+        return
+    rows = [(ad.pk, normalize_text(ad.title), normalize_text(ad.description)) for ad in ads]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+            rows,
+        )
+
+
+def unindex_ad(ad_id):
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [ad_id])
+
+
+def search_ad_ids(query, *, status=Ad.Status.OPEN, limit=20):
+    """
+    Return ids of ads matching ``query``, best match first.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    if not is_supported():
+        # No inverted index on this backend; fall back to a plain scan.
+        qs = Ad.objects.filter(status=status)
+        for term in _TOKEN.findall(normalize_text(query)):
+            qs = qs.filter(Q(title__icontains=term) | Q(description__icontains=term))
+        return list(qs.values_list("id", flat=True)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT {FTS_TABLE}.rowid
+            FROM {FTS_TABLE}
+            JOIN ad_ad ON ad_ad.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s AND ad_ad.status = %s
+            ORDER BY bm25({FTS_TABLE}, %s, %s), {FTS_TABLE}.rowid DESC
+            LIMIT %s
+            """,
+            [match, status, TITLE_WEIGHT, DESCRIPTION_WEIGHT, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_ads(query, *, status=Ad.Status.OPEN, limit=20, queryset=None):
+    ids = search_ad_ids(query, status=status, limit=limit)
+    if queryset is None:
+        queryset = Ad.objects.select_related("category")
+    ads = queryset.in_bulk(ids)
+    return [ads[ad_id] for ad_id in ids if ad_id in ads]
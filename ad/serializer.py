@@ -3,20 +3,26 @@ from .models import Ad, AdRequest
 from rest_framework import serializers
 
 
-class AdCreateSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Ad
-        fields = ["title", "description", "category"]
+def validate_coordinates(attrs, instance=None):
+    # A point needs both coordinates; PATCH may send one of them.
+    latitude = attrs.get("latitude", getattr(instance, "latitude", None))
+    longitude = attrs.get("longitude", getattr(instance, "longitude", None))
+    if (latitude is None) != (longitude is None):
+        raise serializers.ValidationError("عرض و طول جغرافیایی باید با هم ارسال شوند.")
+    return attrs
 
-class AdReadSerializer(serializers.ModelSerializer):
-    creator = serializers.StringRelatedField()
-    performer = serializers.StringRelatedField()
 
+class AdCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Ad
-        fields = "__all__"
+        fields = ["title", "description", "category", "latitude", "longitude"]
+
+    def validate(self, attrs):
+        return validate_coordinates(attrs)
 
 
+class AdBulkCancelSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100)
 
 
 class AdUpdateSerializer(serializers.ModelSerializer):
@@ -33,17 +39,35 @@ class AdUpdateSerializer(serializers.ModelSerializer):
             "category",
             "execution_time",
             "execution_location",
+            "latitude",
+            "longitude",
         ]
         read_only_fields = ["status", "performer", "creator", "date_added"]
 
+    def validate(self, attrs):
+        return validate_coordinates(attrs, self.instance)
+
+    def update(self, instance, validated_data):
+        # Write only the edited columns, so a concurrent status transition is not overwritten.
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
 
 class AdReadSerializer(serializers.ModelSerializer):
     creator = serializers.StringRelatedField()
     performer = serializers.StringRelatedField()
+    category_name = serializers.CharField(source="category.name", read_only=True)
 
     class Meta:
         model = Ad
-        fields = "__all__"
+        # Internal columns: the nearby search cell and the transition counter
+        exclude = ["geo_cell", "version"]
+
+
+class AdNearbySerializer(AdReadSerializer):
+    distance_km = serializers.FloatField(read_only=True)
 
 
 class AdRequestCreateSerializer(serializers.ModelSerializer):
@@ -80,6 +104,27 @@ class AdRequestReadSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+class AdRequestRankedSerializer(AdRequestReadSerializer):
+    score = serializers.FloatField(read_only=True)
+
+    class Meta(AdRequestReadSerializer.Meta):
+        fields = AdRequestReadSerializer.Meta.fields + ["score"]
+        read_only_fields = fields
+
+
 class AdRatingSerializer(serializers.Serializer):
     rating = serializers.IntegerField(min_value=1, max_value=5)
     content = serializers.CharField(required=False, allow_blank=True)
+
+
+class FreeSlotSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+
+class CategoryFacetSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    parent_id = serializers.IntegerField(allow_null=True)
+    open_ads = serializers.IntegerField()
+    open_ads_total = serializers.IntegerField()
@@ -1,40 +1,307 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import reduce
+from operator import or_
+
 from django.db import transaction
+from django.db.models import Count, F, Q
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
-from .models import Ad, AdRequest
+from outbox.services import publish, publish_many
+from user.cache import invalidate_performer_profiles
+
+from .bookings import book_assigned, release_bookings, reschedule_booking
+from .cache import bump_open_ads_version
+from .models import Ad, AdRequest, AdStatusHistory, Category, CategoryOpenAdCount
+from .ranking import record_assignments, record_completions
+from .search import index_ads
+
+
+def adjust_open_ads_count(category_id, delta):
+    # Must run inside the transaction that changes the ad's status/category.
+    updated = CategoryOpenAdCount.objects.filter(category_id=category_id).update(count=F("count") + delta)
+    if not updated:
+        CategoryOpenAdCount.objects.create(category_id=category_id, count=max(delta, 0))
 
 
 @transaction.atomic
-def choose_ad_request(*, ad_id: int, request_id: int, user):
-    # Lock the Ad row to prevent concurrent choose operations
-    ad = Ad.objects.select_for_update().get(pk=ad_id)
+def rebuild_open_ads_counts():
+    """
+    Recompute every category counter from the ad table, for data loaded
+    outside the normal write paths (imports, seeding).
+    """
+    counts = dict(
+        Ad.objects.filter(status=Ad.Status.OPEN).order_by()
+        .values_list("category_id").annotate(total=Count("id"))
+    )
+    CategoryOpenAdCount.objects.all().delete()
+    CategoryOpenAdCount.objects.bulk_create([
+        CategoryOpenAdCount(category_id=category_id, count=counts.get(category_id, 0))
+        for category_id in Category.objects.values_list("id", flat=True)
+    ])
+    bump_open_ads_version()
+
+
+@transaction.atomic
+def create_ad(*, serializer, user):
+    # The post_save signals update the category counter in this transaction.
+    return serializer.save(creator=user)
+
+
+@transaction.atomic
+def update_ad(*, serializer):
+    old_category_id = serializer.instance.category_id
+    old_execution_time = serializer.instance.execution_time
+    ad = serializer.save()
+    if ad.execution_time != old_execution_time:
+        reschedule_booking(ad)
+    if ad.status == Ad.Status.OPEN:
+        if ad.category_id != old_category_id:
+            adjust_open_ads_count(old_category_id, -1)
+            adjust_open_ads_count(ad.category_id, 1)
+        bump_open_ads_version()
+    return ad
+
+
+def _refresh_performer_profiles(moved):
+    invalidate_performer_profiles({ad.performer_id for ad, _ in moved if ad.performer_id is not None})
+
 
-    if ad.creator_id != user.id:
-        raise PermissionDenied("فقط صاحب آگهی می‌تواند پیمانکار را انتخاب کند.")
+def _leave_open(moved):
+    counts = Counter(ad.category_id for ad, source in moved if source == Ad.Status.OPEN)
+    for category_id, count in counts.items():
+        adjust_open_ads_count(category_id, -count)
+    if counts:
+        bump_open_ads_version()
 
-    if ad.status != Ad.Status.OPEN:
-        raise ValidationError("این آگهی در وضعیت باز نیست.")
 
-    if ad.performer_id is not None:
-        raise ValidationError("برای این آگهی قبلاً انجام‌دهنده انتخاب شده است.")
+@dataclass(frozen=True)
+class Transition:
+    sources: tuple
+    target: str
+    # Ad field holding the only user allowed to make the transition
+    actor: str
+    actor_error: str
+    state_error: str
+    # Extra filters for the guarded UPDATE
+    guard: dict = field(default_factory=dict)
+    # Called with [(ad, source_status), ...] after the UPDATE
+    effects: tuple = ()
+    # Ads already in the target status are skipped instead of rejected
+    idempotent: bool = False
 
-    # Lock the request row as well
-    req = (
-        AdRequest.objects.select_for_update()
-        .select_related("performer", "ad")
-        .get(pk=request_id, ad_id=ad.id)
+
+TRANSITIONS = {
+    "assign": Transition(
+        sources=(Ad.Status.OPEN,),
+        target=Ad.Status.ASSIGNED,
+        actor="creator",
+        actor_error="فقط صاحب آگهی می‌تواند پیمانکار را انتخاب کند.",
+        state_error="این آگهی در وضعیت باز نیست.",
+        guard={"performer__isnull": True},
+        effects=(_leave_open, record_assignments, book_assigned),
+    ),
+    "report_done": Transition(
+        sources=(Ad.Status.ASSIGNED,),
+        target=Ad.Status.DONE_REPORTED,
+        actor="performer",
+        actor_error="فقط انجام‌دهنده می‌تواند پایان کار را اعلام کند.",
+        state_error="این آگهی در وضعیت تخصیص شده نیست.",
+    ),
+    "confirm_done": Transition(
+        sources=(Ad.Status.DONE_REPORTED,),
+        target=Ad.Status.DONE,
+        actor="creator",
+        actor_error="فقط صاحب آگهی می‌تواند پایان کار را تایید کند.",
+        state_error="این آگهی در وضعیت اعلام پایان کار نیست.",
+        effects=(record_completions, _refresh_performer_profiles),
+    ),
+    "cancel": Transition(
+        sources=(Ad.Status.OPEN, Ad.Status.ASSIGNED, Ad.Status.DONE_REPORTED),
+        target=Ad.Status.CANCELLED,
+        actor="creator",
+        actor_error="تنها مالک آگهی می‌تواند آن را لغو کند.",
+        state_error="آگهی‌ای که انجام شده است را نمی‌توان لغو کرد.",
+        effects=(_leave_open, release_bookings),
+        idempotent=True,
+    ),
+}
+
+
+class StatusHistoryBuffer:
+    """
+    Collects AdStatusHistory rows and writes them with bulk_create once
+    ``batch_size`` rows are pending, and on flush().
+    """
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.rows = []
+
+    def add(self, ad, from_status, to_status, actor):
+        self.rows.append(AdStatusHistory(
+            ad_id=ad.pk, from_status=from_status, to_status=to_status, actor_id=getattr(actor, "pk", None)
+        ))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            AdStatusHistory.objects.bulk_create(self.rows, batch_size=self.batch_size)
+            self.rows = []
+
+
+def check_actor(ad, name, actor):
+    transition = TRANSITIONS[name]
+    if getattr(ad, f"{transition.actor}_id") != actor.id:
+        raise PermissionDenied(transition.actor_error)
+
+
+def apply_transitions(ads, name, *, actor, history=None, **changes):
+    """
+    Apply one transition to many ads with one guarded UPDATE per source
+    status; each row must still have the status and version it was read
+    with. Returns ``(moved_ads, failures)`` where failures maps ad id to
+    ``(exception_class, message)`` for ads the rules reject or whose row
+    changed concurrently.
+    """
+    transition = TRANSITIONS[name]
+    failures = {}
+    by_source = defaultdict(list)
+    for ad in ads:
+        if getattr(ad, f"{transition.actor}_id") != actor.id:
+            failures[ad.pk] = (PermissionDenied, transition.actor_error)
+        elif transition.idempotent and ad.status == transition.target:
+            continue
+        elif ad.status not in transition.sources:
+            failures[ad.pk] = (ValidationError, transition.state_error)
+        else:
+            by_source[ad.status].append(ad)
+
+    moved = []
+    for source, group in by_source.items():
+        rows = reduce(or_, (Q(pk=ad.pk, version=ad.version) for ad in group))
+        updated = Ad.objects.filter(rows, status=source, **transition.guard).update(
+            status=transition.target, version=F("version") + 1, **changes
+        )
+        if updated == len(group):
+            matched = {ad.pk for ad in group}
+        elif len(group) == 1:
+            matched = set()
+        else:
+            # Rows this UPDATE moved are one version past the one read; the
+            # rest lost a race.
+            matched = set(
+                Ad.objects.filter(
+                    reduce(or_, (Q(pk=ad.pk, version=ad.version + 1) for ad in group)), status=transition.target
+                ).values_list("pk", flat=True)
+            )
+        for ad in group:
+            if ad.pk not in matched:
+                failures[ad.pk] = (
+                    ValidationError,
+                    transition.state_error if len(ads) == 1 else "وضعیت این آگهی هم‌زمان تغییر کرد. دوباره تلاش کنید.",
+                )
+                continue
+            ad.status = transition.target
+            ad.version += 1
+            for attr, value in changes.items():
+                setattr(ad, attr, value)
+            moved.append((ad, source))
+
+    buffer = history or StatusHistoryBuffer()
+    for ad, source in moved:
+        buffer.add(ad, source, transition.target, actor)
+    if history is None:
+        buffer.flush()
+
+    for effect in transition.effects:
+        effect(moved)
+    publish_many(
+        (f"ad.{name}", {"ad_id": ad.pk, "from_status": source, "to_status": ad.status, "actor_id": actor.pk})
+        for ad, source in moved
     )
+    return [ad for ad, _ in moved], failures
+
+
+def apply_transition(ad, name, *, actor, history=None, **changes):
+    _, failures = apply_transitions([ad], name, actor=actor, history=history, **changes)
+    if failures:
+        exception_class, message = failures[ad.pk]
+        raise exception_class(message)
+    return ad
+
+
+@transaction.atomic
+def cancel_ad(*, ad_id: int, user):
+    return apply_transition(get_object_or_404(Ad, pk=ad_id), "cancel", actor=user)
+
+
+@transaction.atomic
+def bulk_create_ads(*, items, user):
+    # bulk_create skips save() and post_save, so the geo cell, counters and
+    # search index are done here.
+    ads = [Ad(creator=user, **data) for data in items]
+    for ad in ads:
+        ad.set_geo_cell()
+    ads = Ad.objects.bulk_create(ads)
+
+    open_counts = Counter(ad.category_id for ad in ads if ad.status == Ad.Status.OPEN)
+    for category_id, count in open_counts.items():
+        adjust_open_ads_count(category_id, count)
+    if open_counts:
+        bump_open_ads_version()
+
+    index_ads(ads)
+    return ads
+
+
+@transaction.atomic
+def bulk_cancel_ads(*, ad_ids, user):
+    """
+    Apply the cancel rules to every id and cancel the allowed ones with one
+    guarded UPDATE per current status. Returns ``(cancelled_ids, errors)``.
+    """
+    ad_ids = list(dict.fromkeys(ad_ids))
+    ads = Ad.objects.only("id", "creator_id", "performer_id", "status", "category_id", "version").in_bulk(ad_ids)
+
+    moved, failures = apply_transitions([ads[ad_id] for ad_id in ad_ids if ad_id in ads], "cancel", actor=user)
+
+    moved_ids = {ad.id for ad in moved}
+    cancelled, errors = [], []
+    for ad_id in ad_ids:
+        if ad_id not in ads:
+            errors.append({"id": ad_id, "detail": "آگهی یافت نشد."})
+        elif ad_id in failures:
+            errors.append({"id": ad_id, "detail": failures[ad_id][1]})
+        elif ad_id in moved_ids or ads[ad_id].status == Ad.Status.CANCELLED:
+            # Already cancelled ads are reported as cancelled, without a new transition.
+            cancelled.append(ad_id)
+    return cancelled, errors
+
+
+@transaction.atomic
+def choose_ad_request(*, ad_id: int, request_id: int, user):
+    ad = get_object_or_404(Ad, pk=ad_id)
+    check_actor(ad, "assign", user)
+
+    req = get_object_or_404(AdRequest.objects.select_related("performer"), pk=request_id, ad_id=ad.id)
 
     if req.status != AdRequest.Status.PENDING:
         raise ValidationError("این درخواست قابل انتخاب نیست.")
 
-    req.status = AdRequest.Status.APPROVED
-    req.save(update_fields=["status"])
+    # Only one concurrent choose can match status=open and performer IS NULL.
+    apply_transition(ad, "assign", actor=user, performer_id=req.performer_id)
 
-    ad.performer = req.performer
-    ad.status = Ad.Status.ASSIGNED
-    ad.save(update_fields=["performer", "status"])
+    # Raising here rolls the assignment back with the transaction.
+    if not AdRequest.objects.filter(pk=req.id, status=AdRequest.Status.PENDING).update(
+        status=AdRequest.Status.APPROVED
+    ):
+        raise ValidationError("این درخواست قابل انتخاب نیست.")
+    req.status = AdRequest.Status.APPROVED
+    req.ad = ad
+    publish("ad_request.approved", {"request_id": req.id, "ad_id": ad.id, "performer_id": req.performer_id})
 
     AdRequest.objects.filter(ad=ad).exclude(id=req.id).update(
         status=AdRequest.Status.REJECTED
@@ -45,29 +312,9 @@ def choose_ad_request(*, ad_id: int, request_id: int, user):
 
 @transaction.atomic
 def report_ad_done(*, ad_id: int, user):
-    ad = Ad.objects.select_for_update().get(pk=ad_id)
-
-    if ad.performer_id != user.id:
-        raise PermissionDenied("فقط انجام‌دهنده می‌تواند پایان کار را اعلام کند.")
-
-    if ad.status != Ad.Status.ASSIGNED:
-        raise ValidationError("این آگهی در وضعیت تخصیص شده نیست.")
-
-    ad.status = Ad.Status.DONE_REPORTED
-    ad.save(update_fields=["status"])
-    return ad
+    return apply_transition(get_object_or_404(Ad, pk=ad_id), "report_done", actor=user)
 
 
 @transaction.atomic
 def confirm_ad_done(*, ad_id: int, user):
-    ad = Ad.objects.select_for_update().get(pk=ad_id)
-
-    if ad.creator_id != user.id:
-        raise PermissionDenied("فقط صاحب آگهی می‌تواند پایان کار را تایید کند.")
-
-    if ad.status != Ad.Status.DONE_REPORTED:
-        raise ValidationError("این آگهی در وضعیت اعلام پایان کار نیست.")
-
-    ad.status = Ad.Status.DONE
-    ad.save(update_fields=["status"])
-    return ad
+    return apply_transition(get_object_or_404(Ad, pk=ad_id), "confirm_done", actor=user)
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Ad, Category, CategoryOpenAdCount
+from .cache import bump_open_ads_version
+from .search import index_ad, unindex_ad
+from .services import adjust_open_ads_count
+
+SEARCHABLE_FIELDS = {"title", "description"}
+
+
+@receiver(post_save, sender=Ad)
+def sync_ad_search_index(sender, instance, update_fields=None, **kwargs):
+    # Status-only saves don't touch indexed text.
+    if update_fields is not None and not SEARCHABLE_FIELDS & set(update_fields):
+        return
+    index_ad(instance)
+
+
+@receiver(post_save, sender=Ad)
+def count_new_open_ad(sender, instance, created, **kwargs):
+    # Atomic with the INSERT only when the save runs in a transaction, as
+    # services.create_ad and the admin do.
+    if created and instance.status == Ad.Status.OPEN:
+        adjust_open_ads_count(instance.category_id, 1)
+        bump_open_ads_version()
+
+
+@receiver(post_delete, sender=Ad)
+def remove_ad_from_search_index(sender, instance, **kwargs):
+    unindex_ad(instance.pk)
+
+
+@receiver(post_delete, sender=Ad)
+def uncount_deleted_open_ad(sender, instance, **kwargs):
+    if instance.status == Ad.Status.OPEN:
+        adjust_open_ads_count(instance.category_id, -1)
+        bump_open_ads_version()
+
+
+@receiver(post_save, sender=Category)
+def create_category_counter(sender, instance, created, **kwargs):
+    if created:
+        CategoryOpenAdCount.objects.get_or_create(category=instance)
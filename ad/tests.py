@@ -1,10 +1,34 @@
+import random
+from datetime import timedelta
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from unittest.mock import patch
 
 from rest_framework.test import APIClient
 
-from ad.models import Ad, AdRequest  # adjust import if your app name differs
+from ad.models import (  # adjust import if your app name differs
+    Ad, AdRequest, AdStatusHistory, Category, CategoryOpenAdCount, PerformerBooking, PerformerCategoryStats,
+    PerformerStats,
+)
+from ad.bookings import BOOKING_DURATION, free_slots
+from ad.geo import cell_ranges, geo_cell, haversine_km
+from ad.pagination import OpenAdFeedPagination
+from ad.ranking import rebuild_performer_stats
+from ad.serializer import AdRequestReadSerializer
+from ad.services import StatusHistoryBuffer, apply_transitions
+from ad.utils import select_for_serializer, time_in_status
+from comment.models import Comment, PerformerRating
+from outbox.models import OutboxEvent
+from tickets.models import TicketMessage
+from user.models import Profile, Role
 
 
 User = get_user_model()
@@ -13,6 +37,7 @@ User = get_user_model()
 class AdsRequestsFlowTests(TestCase):
     def setUp(self):
         self.client = APIClient()
+        cache.clear()
 
         self.creator = User.objects.create_user(
             username="creator", password="pass12345"
@@ -27,11 +52,13 @@ class AdsRequestsFlowTests(TestCase):
             username="other", password="pass12345"
         )
 
+        self.category = Category.objects.create(name="cat")
+
         # Create one OPEN ad by creator
         self.ad = Ad.objects.create(
             title="Test Ad",
             description="desc",
-            category="cat",
+            category=self.category,
             creator=self.creator,
             status=Ad.Status.OPEN,
         )
@@ -60,7 +87,7 @@ class AdsRequestsFlowTests(TestCase):
     def test_creator_can_create_ad(self):
         self.auth_as(self.creator)
     
-        payload = {"title": "A", "description": "B", "category": "C"}
+        payload = {"title": "A", "description": "B", "category": self.category.id}
         res = self.client.post(self.ads_base, payload, format="json")
         self.assertEqual(res.status_code, 201)
     
@@ -79,9 +106,57 @@ class AdsRequestsFlowTests(TestCase):
         self.assertEqual(res.status_code, 200)
 
         # at least includes the ad we created
-        ids = [item["id"] for item in res.data]
+        ids = [item["id"] for item in res.data["results"]]
         self.assertIn(self.ad.id, ids)
 
+    @patch("ad.views.is_performer", return_value=True)
+    def test_open_ads_feed_follows_cursor_without_gaps(self, mock_is_perf):
+        # Same timestamp for every ad so the id tie-breaker is exercised
+        Ad.objects.bulk_create([
+            Ad(title=f"Ad {i}", description="desc", category=self.category, creator=self.creator)
+            for i in range(7)
+        ])
+        Ad.objects.update(date_added=self.ad.date_added)
+        Ad.objects.create(
+            title="Closed", description="desc", category=self.category,
+            creator=self.creator, status=Ad.Status.DONE,
+        )
+        self.auth_as(self.performer1)
+
+        seen = []
+        url = f"{self.open_ads_url}?page_size=3"
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(res.data["results"]), 3)
+            seen.extend(item["id"] for item in res.data["results"])
+            url = res.data["next"]
+
+        expected = list(
+            Ad.objects.filter(status=Ad.Status.OPEN).order_by("-date_added", "-id").values_list("id", flat=True)
+        )
+        self.assertEqual(seen, expected)
+
+    @patch("ad.views.is_performer", return_value=True)
+    def test_open_ads_feed_rejects_invalid_cursor(self, mock_is_perf):
+        self.auth_as(self.performer1)
+
+        res = self.client.get(f"{self.open_ads_url}?cursor=not-a-cursor")
+        self.assertEqual(res.status_code, 404)
+
+    def test_open_ads_feed_seek_uses_status_date_index(self):
+        pagination = OpenAdFeedPagination()
+        position = [self.ad.date_added, self.ad.id]
+        qs = (
+            Ad.objects.filter(status=Ad.Status.OPEN)
+            .filter(pagination.get_seek_filter(position))
+            .order_by(*pagination.ordering)
+        )
+
+        plan = qs.explain()
+        self.assertIn("ad_status_date_idx", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
     @patch("ad.views.is_performer", return_value=False)
     def test_non_performer_cannot_list_open_ads(self, mock_is_perf):
         self.auth_as(self.other_user)
@@ -221,3 +296,664 @@ class AdsRequestsFlowTests(TestCase):
 
         res = self.client.patch(url, {"done_reported": True}, format="json")
         self.assertEqual(res.status_code, 403)
+
+
+class AdSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.search_url = "/api/ads/search/"
+
+    def make_ad(self, title, description="desc", **kwargs):
+        return Ad.objects.create(
+            title=title, description=description, category=self.category, creator=self.creator, **kwargs
+        )
+
+    def search(self, q):
+        self.client.force_authenticate(user=self.performer)
+        with patch("ad.views.is_performer", return_value=True):
+            res = self.client.get(self.search_url, {"q": q})
+        self.assertEqual(res.status_code, 200)
+        return [item["id"] for item in res.data]
+
+    def test_arabic_letters_match_persian_text(self):
+        ad = self.make_ad("تعمیر یخچال", "کولر و لوله‌کشی")
+
+        self.assertEqual(self.search("يخچال"), [ad.id])
+        self.assertEqual(self.search("كولر"), [ad.id])
+
+    def test_zwnj_and_digits_are_normalized(self):
+        ad = self.make_ad("نصب ۲ کولر", "لوله‌کشی ساختمان")
+
+        self.assertEqual(self.search("لولهکشی"), [ad.id])
+        self.assertEqual(self.search("2 کولر"), [ad.id])
+        self.assertEqual(self.search("٢"), [ad.id])
+
+    def test_title_matches_rank_first_and_only_open_ads_returned(self):
+        in_description = self.make_ad("نظافت", "رنگ کاری")
+        in_title = self.make_ad("رنگ کاری", "نقاشی")
+        self.make_ad("رنگ", "done", status=Ad.Status.DONE)
+
+        self.assertEqual(self.search("رنگ"), [in_title.id, in_description.id])
+
+    def test_index_follows_updates_and_deletes(self):
+        ad = self.make_ad("کابینت")
+        ad.title = "کمد"
+        ad.save()
+        self.assertEqual(self.search("کابینت"), [])
+        self.assertEqual(self.search("کمد"), [ad.id])
+
+        ad.delete()
+        self.assertEqual(self.search("کمد"), [])
+
+    def test_missing_query_is_rejected(self):
+        self.client.force_authenticate(user=self.performer)
+        with patch("ad.views.is_performer", return_value=True):
+            res = self.client.get(self.search_url)
+        self.assertEqual(res.status_code, 400)
+
+
+class CategoryFacetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.home = Category.objects.create(name="home")
+        self.plumbing = Category.objects.create(name="plumbing", parent=self.home)
+        self.client.force_authenticate(user=self.creator)
+
+    def create_ad(self, category):
+        res = self.client.post(
+            "/api/ads/", {"title": "t", "description": "d", "category": category.id}, format="json"
+        )
+        self.assertEqual(res.status_code, 201)
+        return Ad.objects.latest("id")
+
+    def open_count(self, category):
+        return CategoryOpenAdCount.objects.get(category=category).count
+
+    def test_counter_follows_create_move_choose_and_cancel(self):
+        ad = self.create_ad(self.plumbing)
+        other = self.create_ad(self.plumbing)
+        self.assertEqual(self.open_count(self.plumbing), 2)
+
+        res = self.client.patch(f"/api/ads/{other.id}/", {"category": self.home.id}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.open_count(self.plumbing), 1)
+        self.assertEqual(self.open_count(self.home), 1)
+
+        req = AdRequest.objects.create(ad=ad, performer=self.performer)
+        res = self.client.post(f"/api/ads/{ad.id}/requests/{req.id}/choose/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(self.open_count(self.plumbing), 0)
+
+        # Cancelling an assigned ad must not touch the open counter again
+        res = self.client.delete(f"/api/ads/{ad.id}/")
+        self.assertEqual(res.status_code, 204)
+        self.assertEqual(self.open_count(self.plumbing), 0)
+
+        res = self.client.delete(f"/api/ads/{other.id}/")
+        self.assertEqual(res.status_code, 204)
+        self.assertEqual(self.open_count(self.home), 0)
+
+    def test_failed_counter_update_rolls_back_the_new_ad(self):
+        with patch("ad.signals.adjust_open_ads_count", side_effect=RuntimeError("counter down")):
+            with self.assertRaises(RuntimeError):
+                self.client.post("/api/ads/", {"title": "t", "description": "d", "category": self.home.id}, format="json")
+        self.assertFalse(Ad.objects.exists())
+        self.assertEqual(self.open_count(self.home), 0)
+
+    def test_facets_read_counters_and_roll_up_children(self):
+        self.create_ad(self.plumbing)
+        self.create_ad(self.plumbing)
+        self.create_ad(self.home)
+
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/ads/facets/")
+        self.assertEqual(res.status_code, 200)
+
+        facets = {item["name"]: item for item in res.data}
+        self.assertEqual(facets["plumbing"]["open_ads"], 2)
+        self.assertEqual(facets["plumbing"]["open_ads_total"], 2)
+        self.assertEqual(facets["home"]["open_ads"], 1)
+        self.assertEqual(facets["home"]["open_ads_total"], 3)
+
+
+class AdReadQueryCountTests(TestCase):
+    sizes = (10, 100, 1000)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.category = Category.objects.create(name="cat")
+
+    def grow_to(self, size):
+        cache.clear()
+        missing = size - Ad.objects.count()
+        ads = Ad.objects.bulk_create([
+            Ad(title="t", description="d" * 500, category=self.category,
+               creator=self.creator, performer=self.performer)
+            for _ in range(missing)
+        ])
+        AdRequest.objects.bulk_create([AdRequest(ad=ad, performer=self.performer) for ad in ads])
+
+    def assert_constant_queries(self, user, url, expected, page_size=None):
+        for size in self.sizes:
+            self.grow_to(size)
+            self.client.force_authenticate(user=User.objects.get(pk=user.pk))
+            with self.subTest(size=size), self.assertNumQueries(expected):
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+            rows = res.data["results"] if page_size else res.data
+            self.assertEqual(len(rows), min(size, page_size or size))
+
+    def test_ad_list_is_constant(self):
+        # roles + ads
+        self.assert_constant_queries(self.creator, "/api/ads/", 2)
+
+    def test_open_ads_page_is_constant(self):
+        # roles + ads
+        self.assert_constant_queries(self.performer, "/api/ads/open/?page_size=100", 2, page_size=100)
+
+    def test_performer_request_list_is_constant(self):
+        # roles + requests
+        self.assert_constant_queries(self.performer, "/api/ads/requests/", 2)
+
+    def test_request_list_defers_ad_description(self):
+        self.grow_to(1)
+        qs = select_for_serializer(AdRequest.objects.all(), AdRequestReadSerializer)
+
+        sql = str(qs.query)
+        self.assertIn('"ad_ad"."title"', sql)
+        self.assertNotIn('"ad_ad"."description"', sql)
+        self.assertNotIn('"user_user"."password"', sql)
+
+
+class OpenAdCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.category = Category.objects.create(name="cat")
+        self.ad = Ad.objects.create(title="t", description="d", category=self.category, creator=self.creator)
+
+    def open_ids(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.performer.pk))
+        res = self.client.get("/api/ads/open/")
+        self.assertEqual(res.status_code, 200)
+        return [item["id"] for item in res.data["results"]]
+
+    def test_repeated_reads_skip_the_ad_query(self):
+        self.open_ids()
+        self.client.force_authenticate(user=User.objects.get(pk=self.performer.pk))
+        # Only the role lookup remains
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/ads/open/")
+        self.assertEqual(res.data["results"][0]["id"], self.ad.id)
+
+    @override_settings(ALLOWED_HOSTS=["a.example.com", "b.example.com"])
+    def test_pages_are_cached_per_host(self):
+        for i in range(2):
+            Ad.objects.create(title=f"t{i}", description="d", category=self.category, creator=self.creator)
+        self.client.force_authenticate(user=self.performer)
+        first = self.client.get("/api/ads/open/?page_size=1", HTTP_HOST="a.example.com")
+        second = self.client.get("/api/ads/open/?page_size=1", HTTP_HOST="b.example.com")
+        self.assertTrue(first.data["next"].startswith("http://a.example.com/"))
+        self.assertTrue(second.data["next"].startswith("http://b.example.com/"))
+
+    def test_create_and_cancel_invalidate_cached_pages(self):
+        self.assertEqual(self.open_ids(), [self.ad.id])
+
+        self.client.force_authenticate(user=self.creator)
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                "/api/ads/", {"title": "n", "description": "d", "category": self.category.id}, format="json"
+            )
+        new_id = Ad.objects.get(title="n").id
+        self.assertEqual(self.open_ids(), [new_id, self.ad.id])
+
+        self.client.force_authenticate(user=self.creator)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/api/ads/{new_id}/")
+        self.assertEqual(self.open_ids(), [self.ad.id])
+
+    def test_choosing_a_request_invalidates_cached_pages(self):
+        self.assertEqual(self.open_ids(), [self.ad.id])
+        req = AdRequest.objects.create(ad=self.ad, performer=self.performer)
+
+        self.client.force_authenticate(user=self.creator)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f"/api/ads/{self.ad.id}/requests/{req.id}/choose/")
+        self.assertEqual(self.open_ids(), [])
+
+
+class AdBulkTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.other = User.objects.create_user(username="other", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.client.force_authenticate(user=self.creator)
+
+    def open_count(self):
+        return CategoryOpenAdCount.objects.get(category=self.category).count
+
+    def test_bulk_create_inserts_valid_items_and_reports_invalid_ones(self):
+        payload = [
+            {"title": "a", "description": "d", "category": self.category.id},
+            {"title": "", "description": "d", "category": self.category.id},
+            {"title": "c", "description": "d", "category": self.category.id},
+        ]
+        res = self.client.post("/api/ads/bulk/", payload, format="json")
+
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([ad["title"] for ad in res.data["created"]], ["a", "c"])
+        self.assertEqual([error["index"] for error in res.data["errors"]], [1])
+        self.assertEqual(Ad.objects.filter(creator=self.creator).count(), 2)
+        self.assertEqual(self.open_count(), 2)
+
+    def test_bulk_cancel_applies_destroy_rules_per_item(self):
+        mine = Ad.objects.create(title="a", description="d", category=self.category, creator=self.creator)
+        done = Ad.objects.create(
+            title="b", description="d", category=self.category, creator=self.creator, status=Ad.Status.DONE
+        )
+        theirs = Ad.objects.create(title="c", description="d", category=self.category, creator=self.other)
+
+        res = self.client.post(
+            "/api/ads/bulk/cancel/", {"ids": [mine.id, done.id, theirs.id, 999999]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["cancelled"], [mine.id])
+        self.assertEqual([error["id"] for error in res.data["errors"]], [done.id, theirs.id, 999999])
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.status, Ad.Status.CANCELLED)
+        self.assertEqual(theirs.status, Ad.Status.OPEN)
+        # theirs is still open
+        self.assertEqual(self.open_count(), 1)
+
+
+class AdLifecycleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.ad = Ad.objects.create(title="t", description="d", category=self.category, creator=self.creator)
+        self.req = AdRequest.objects.create(ad=self.ad, performer=self.performer)
+
+    def post(self, user, url):
+        self.client.force_authenticate(user=user)
+        return self.client.post(url)
+
+    def test_transitions_are_recorded_in_history(self):
+        self.assertEqual(self.post(self.creator, f"/api/ads/{self.ad.id}/requests/{self.req.id}/choose/").status_code, 200)
+        self.assertEqual(self.post(self.performer, f"/api/ads/{self.ad.id}/report-done/").status_code, 200)
+        self.assertEqual(self.post(self.creator, f"/api/ads/{self.ad.id}/confirm-done/").status_code, 200)
+
+        self.assertEqual(
+            list(self.ad.status_history.values_list("from_status", "to_status", "actor_id")),
+            [
+                (Ad.Status.OPEN, Ad.Status.ASSIGNED, self.creator.id),
+                (Ad.Status.ASSIGNED, Ad.Status.DONE_REPORTED, self.performer.id),
+                (Ad.Status.DONE_REPORTED, Ad.Status.DONE, self.creator.id),
+            ],
+        )
+        self.ad.refresh_from_db()
+        self.assertEqual(set(time_in_status(self.ad)), set(Ad.Status.values) - {Ad.Status.CANCELLED})
+
+    def test_rejected_transitions_change_nothing(self):
+        # Wrong actor, then wrong source state
+        self.assertEqual(self.post(self.performer, f"/api/ads/{self.ad.id}/requests/{self.req.id}/choose/").status_code, 403)
+        self.assertEqual(self.post(self.creator, f"/api/ads/{self.ad.id}/confirm-done/").status_code, 400)
+
+        self.ad.refresh_from_db()
+        self.assertEqual((self.ad.status, self.ad.version), (Ad.Status.OPEN, 0))
+        self.assertFalse(AdStatusHistory.objects.exists())
+
+    def test_bulk_cancel_writes_history_in_one_insert(self):
+        ads = [self.ad] + [
+            Ad.objects.create(title=f"t{i}", description="d", category=self.category, creator=self.creator)
+            for i in range(4)
+        ]
+        self.client.force_authenticate(user=self.creator)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post("/api/ads/bulk/cancel/", {"ids": [ad.id for ad in ads]}, format="json")
+
+        self.assertEqual(len(res.data["cancelled"]), 5)
+        inserts = [q for q in ctx.captured_queries if q["sql"].startswith('INSERT INTO "ad_adstatushistory"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(AdStatusHistory.objects.filter(to_status=Ad.Status.CANCELLED).count(), 5)
+
+    def test_cancelling_a_cancelled_ad_is_a_no_op(self):
+        self.client.force_authenticate(user=self.creator)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f"/api/ads/{self.ad.id}/").status_code, 204)
+            self.assertEqual(self.client.delete(f"/api/ads/{self.ad.id}/").status_code, 204)
+            res = self.client.post("/api/ads/bulk/cancel/", {"ids": [self.ad.id]}, format="json")
+
+        self.assertEqual(res.data, {"cancelled": [self.ad.id], "errors": []})
+        self.ad.refresh_from_db()
+        self.assertEqual(self.ad.version, 1)
+        self.assertEqual(
+            list(AdStatusHistory.objects.values_list("from_status", "to_status")), [(Ad.Status.OPEN, Ad.Status.CANCELLED)]
+        )
+        self.assertEqual(OutboxEvent.objects.filter(topic="ad.cancel").count(), 1)
+
+    def test_lost_races_are_reported_per_ad(self):
+        other = Ad.objects.create(title="o", description="d", category=self.category, creator=self.creator)
+        ads = list(Ad.objects.filter(pk__in=[self.ad.pk, other.pk]).order_by("pk"))
+        # Another transaction moves the first ad after it was read.
+        Ad.objects.filter(pk=self.ad.pk).update(version=F("version") + 1)
+
+        with transaction.atomic():
+            moved, failures = apply_transitions(ads, "cancel", actor=self.creator)
+
+        self.assertEqual([ad.pk for ad in moved], [other.pk])
+        self.assertEqual(list(failures), [self.ad.pk])
+        self.assertEqual(Ad.objects.get(pk=self.ad.pk).status, Ad.Status.OPEN)
+        self.assertEqual(Ad.objects.get(pk=other.pk).status, Ad.Status.CANCELLED)
+
+    def test_single_ad_race_is_one_guarded_update(self):
+        stale = Ad.objects.get(pk=self.ad.pk)
+        Ad.objects.filter(pk=self.ad.pk).update(version=F("version") + 1)
+
+        with transaction.atomic(), CaptureQueriesContext(connection) as ctx:
+            moved, failures = apply_transitions([stale], "cancel", actor=self.creator)
+
+        self.assertEqual((moved, list(failures)), ([], [self.ad.pk]))
+        ad_queries = [query["sql"] for query in ctx.captured_queries if '"ad_ad"' in query["sql"]]
+        self.assertEqual(len(ad_queries), 1)
+        self.assertTrue(ad_queries[0].startswith('UPDATE "ad_ad"'))
+
+    def test_history_buffer_flushes_in_batches(self):
+        buffer = StatusHistoryBuffer(batch_size=2)
+        for _ in range(3):
+            buffer.add(self.ad, Ad.Status.OPEN, Ad.Status.CANCELLED, self.creator)
+        self.assertEqual(AdStatusHistory.objects.count(), 2)
+        buffer.flush()
+        self.assertEqual(AdStatusHistory.objects.count(), 3)
+
+
+class AdRequestRankingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.other_category = Category.objects.create(name="other")
+        self.ad = Ad.objects.create(title="t", description="d", category=self.category, creator=self.creator)
+
+        self.veteran, self.newcomer, self.flaky = (
+            User.objects.create_user(username=name, password="pass12345") for name in ("veteran", "newcomer", "flaky")
+        )
+        PerformerRating.objects.create(performer=self.veteran, rating_sum=48, rating_count=10, average=4.8)
+        PerformerRating.objects.create(performer=self.flaky, rating_sum=8, rating_count=4, average=2.0)
+        PerformerStats.objects.create(
+            performer=self.veteran, assigned_count=9, done_count=8, last_done_at=timezone.now() - timedelta(days=2)
+        )
+        PerformerStats.objects.create(
+            performer=self.flaky, assigned_count=6, done_count=1, last_done_at=timezone.now() - timedelta(days=400)
+        )
+        PerformerCategoryStats.objects.create(performer=self.veteran, category=self.category, done_count=8)
+        PerformerCategoryStats.objects.create(performer=self.flaky, category=self.other_category, done_count=1)
+        for performer in (self.flaky, self.newcomer, self.veteran):
+            AdRequest.objects.create(ad=self.ad, performer=performer)
+
+    def test_owner_sees_applicants_ranked_in_one_query(self):
+        self.client.force_authenticate(user=self.creator)
+        with self.assertNumQueries(2):
+            res = self.client.get(f"/api/ads/{self.ad.id}/requests/")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row["performer_username"] for row in res.data], ["veteran", "newcomer", "flaky"])
+        scores = [row["score"] for row in res.data]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+        # Applicants only see their own request, unscored
+        self.veteran.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.client.force_authenticate(user=self.veteran)
+        res = self.client.get(f"/api/ads/{self.ad.id}/requests/")
+        self.assertEqual([row["performer_username"] for row in res.data], ["veteran"])
+        self.assertNotIn("score", res.data[0])
+
+    def test_transitions_keep_features_in_step_with_rebuild(self):
+        req = self.ad.requests.get(performer=self.newcomer)
+        self.client.force_authenticate(user=self.creator)
+        self.assertEqual(self.client.post(f"/api/ads/{self.ad.id}/requests/{req.id}/choose/").status_code, 200)
+        self.client.force_authenticate(user=self.newcomer)
+        self.assertEqual(self.client.post(f"/api/ads/{self.ad.id}/report-done/").status_code, 200)
+        self.client.force_authenticate(user=self.creator)
+        self.assertEqual(self.client.post(f"/api/ads/{self.ad.id}/confirm-done/").status_code, 200)
+
+        stats = PerformerStats.objects.get(performer=self.newcomer)
+        self.assertEqual((stats.assigned_count, stats.done_count), (1, 1))
+        self.assertIsNotNone(stats.last_done_at)
+        self.assertEqual(
+            PerformerCategoryStats.objects.get(performer=self.newcomer, category=self.category).done_count, 1
+        )
+
+        rebuild_performer_stats()
+        rebuilt = PerformerStats.objects.get(performer=self.newcomer)
+        self.assertEqual((rebuilt.assigned_count, rebuilt.done_count), (1, 1))
+        self.assertAlmostEqual(rebuilt.last_done_at, stats.last_done_at, delta=timedelta(seconds=5))
+        # Rows set up without ads are gone: the ad table is the source of truth.
+        self.assertFalse(PerformerStats.objects.filter(performer=self.veteran).exists())
+
+
+class NearbyAdsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.category = Category.objects.create(name="cat")
+        self.lat, self.lon = 35.6892, 51.3890
+
+        def ad(title, lat=None, lon=None, status=Ad.Status.OPEN):
+            return Ad.objects.create(
+                title=title, description="d", category=self.category, creator=self.creator,
+                status=status, latitude=lat, longitude=lon,
+            )
+
+        ad("here", self.lat, self.lon)
+        ad("5km north", self.lat + 5 / 111.195, self.lon)
+        ad("30km east", self.lat, self.lon + 0.3323)
+        ad("isfahan", 32.6546, 51.6680)
+        ad("nowhere")
+        ad("assigned", self.lat, self.lon, status=Ad.Status.ASSIGNED)
+
+    def get(self, **params):
+        self.client.force_authenticate(user=self.performer)
+        return self.client.get("/api/ads/open/nearby/", params)
+
+    def test_nearby_open_ads_sorted_by_distance(self):
+        self.performer = User.objects.get(pk=self.performer.pk)
+        # Roles, candidates within 2, 8 and 32 km (where the third ad is found), winners
+        with self.assertNumQueries(5):
+            res = self.get(lat=self.lat, lon=self.lon, radius_km=40, limit=3)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([ad["title"] for ad in res.data], ["here", "5km north", "30km east"])
+        self.assertEqual([round(ad["distance_km"]) for ad in res.data], [0, 5, 30])
+        self.assertFalse({"geo_cell", "version"} & set(res.data[0]))
+
+        res = self.get(lat=self.lat, lon=self.lon, radius_km=20, limit=1)
+        self.assertEqual([ad["title"] for ad in res.data], ["here"])
+
+    def test_cell_ranges_cover_the_radius(self):
+        rng = random.Random(0)
+        for lat, lon, radius_km in [(35.7, 51.4, 50), (0, 179.98, 30), (-89.5, 10, 80), (60, -0.01, 100)]:
+            covered = cell_ranges(lat, lon, radius_km)
+            for _ in range(300):
+                other_lat = max(min(lat + rng.uniform(-1, 1), 90), -90)
+                other_lon = (lon + rng.uniform(-4, 4) + 180) % 360 - 180
+                if haversine_km(lat, lon, [other_lat], [other_lon])[0] <= radius_km:
+                    cell = geo_cell(other_lat, other_lon)
+                    self.assertTrue(any(first <= cell <= last for first, last in covered), (lat, lon, other_lat, other_lon))
+
+    def test_coordinates_are_validated_and_keep_the_cell_in_step(self):
+        self.assertEqual(self.get(lat=self.lat).status_code, 400)
+        self.assertEqual(self.get(lat=self.lat, lon=self.lon, radius_km=500).status_code, 400)
+        self.client.force_authenticate(user=self.creator)
+        self.assertEqual(self.client.get("/api/ads/open/nearby/", {"lat": 1, "lon": 1}).status_code, 403)
+
+        ad = Ad.objects.get(title="nowhere")
+        res = self.client.patch(f"/api/ads/{ad.id}/", {"latitude": 10}, format="json")
+        self.assertEqual(res.status_code, 400)
+        res = self.client.patch(f"/api/ads/{ad.id}/", {"latitude": self.lat, "longitude": self.lon}, format="json")
+        self.assertEqual(res.status_code, 200)
+        ad.refresh_from_db()
+        self.assertEqual(ad.geo_cell, geo_cell(self.lat, self.lon))
+
+
+class PerformerBookingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.category = Category.objects.create(name="cat")
+        self.noon = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        self.client.force_authenticate(user=self.creator)
+
+    def request_for(self, execution_time):
+        ad = Ad.objects.create(
+            title="t", description="d", category=self.category, creator=self.creator, execution_time=execution_time
+        )
+        return ad, AdRequest.objects.create(ad=ad, performer=self.performer)
+
+    def choose(self, ad, req):
+        return self.client.post(f"/api/ads/{ad.id}/requests/{req.id}/choose/")
+
+    def test_overlapping_assignment_is_rejected_and_rolled_back(self):
+        first, first_req = self.request_for(self.noon)
+        clash, clash_req = self.request_for(self.noon + BOOKING_DURATION / 2)
+        later, later_req = self.request_for(self.noon + BOOKING_DURATION)
+
+        self.assertEqual(self.choose(first, first_req).status_code, 200)
+        res = self.choose(clash, clash_req)
+        self.assertEqual(res.status_code, 400)
+        clash.refresh_from_db()
+        self.assertEqual(clash.status, Ad.Status.OPEN)
+        self.assertIsNone(clash.performer_id)
+        self.assertEqual(AdRequest.objects.get(pk=clash_req.pk).status, AdRequest.Status.PENDING)
+
+        # Back-to-back jobs don't overlap.
+        self.assertEqual(self.choose(later, later_req).status_code, 200)
+        self.assertEqual(
+            list(self.performer.bookings.values_list("ad_id", "start", "end")),
+            [
+                (first.id, self.noon, self.noon + BOOKING_DURATION),
+                (later.id, self.noon + BOOKING_DURATION, self.noon + 2 * BOOKING_DURATION),
+            ],
+        )
+
+    def test_cancel_and_reschedule_move_the_booking(self):
+        first, first_req = self.request_for(self.noon)
+        clash, clash_req = self.request_for(self.noon)
+        self.choose(first, first_req)
+
+        res = self.client.patch(f"/api/ads/{first.id}/", {"execution_time": self.noon + timedelta(days=1)}, format="json")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(PerformerBooking.objects.get(ad=first).start, self.noon + timedelta(days=1))
+        self.assertEqual(self.choose(clash, clash_req).status_code, 200)
+
+        # Moving onto another booking is refused.
+        res = self.client.patch(f"/api/ads/{first.id}/", {"execution_time": self.noon}, format="json")
+        self.assertEqual(res.status_code, 400)
+        first.refresh_from_db()
+        self.assertEqual(first.execution_time, self.noon + timedelta(days=1))
+
+        self.assertEqual(self.client.delete(f"/api/ads/{clash.id}/").status_code, 204)
+        self.assertFalse(PerformerBooking.objects.filter(ad_id=clash.id).exists())
+
+    def test_free_slots_fill_the_gaps_between_bookings(self):
+        for hours in (2, 4, 9):
+            ad, req = self.request_for(self.noon + timedelta(hours=hours))
+            self.choose(ad, req)
+
+        # The last hour after the 9h booking is shorter than a booking.
+        day_end = self.noon + timedelta(hours=12)
+        self.assertEqual(free_slots(self.performer.id, self.noon, day_end), [
+            (self.noon, self.noon + timedelta(hours=2)),
+            (self.noon + timedelta(hours=6), self.noon + timedelta(hours=9)),
+        ])
+        self.assertEqual(free_slots(self.performer.id, self.noon + timedelta(hours=3), self.noon + timedelta(hours=7)), [])
+
+        url = f"/api/ads/performers/{self.performer.id}/free-slots/"
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {"from": self.noon.isoformat(), "to": day_end.isoformat()})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data), 2)
+
+        self.assertEqual(self.client.get(url, {"from": self.noon.isoformat()}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"from": day_end.isoformat(), "to": self.noon.isoformat()}).status_code, 400)
+        self.assertEqual(
+            self.client.get(url, {"from": self.noon.isoformat(), "to": (self.noon + timedelta(days=40)).isoformat()})
+            .status_code, 400,
+        )
+        res = self.client.get(
+            f"/api/ads/performers/{self.creator.id}/free-slots/",
+            {"from": self.noon.isoformat(), "to": day_end.isoformat()},
+        )
+        self.assertEqual(res.status_code, 404)
+
+
+class SeedMarketplaceTests(TestCase):
+    def test_seed_covers_every_status_and_derived_tables(self):
+        call_command(
+            "seed_marketplace", users=20, ads=25, tickets=5, messages_per_ticket=2, stdout=StringIO()
+        )
+
+        self.assertEqual(
+            set(Ad.objects.values_list("status", flat=True).distinct()), set(Ad.Status.values)
+        )
+        self.assertTrue(AdRequest.objects.exists())
+        self.assertEqual(TicketMessage.objects.count(), 10)
+        self.assertEqual(
+            sum(CategoryOpenAdCount.objects.values_list("count", flat=True)),
+            Ad.objects.filter(status=Ad.Status.OPEN).count(),
+        )
+        self.assertEqual(
+            sum(PerformerRating.objects.values_list("rating_count", flat=True)), Comment.objects.count()
+        )
+        self.assertEqual(
+            sum(PerformerStats.objects.values_list("done_count", flat=True)),
+            Ad.objects.filter(status=Ad.Status.DONE, performer__isnull=False).count(),
+        )
+        self.assertEqual(
+            PerformerBooking.objects.count(),
+            Ad.objects.filter(performer__isnull=False, execution_time__isnull=False).exclude(status=Ad.Status.CANCELLED).count(),
+        )
+        self.assertEqual(sum(Profile.objects.values_list("comment_count", flat=True)), Comment.objects.count())
+        self.assertTrue(User.objects.filter(roles__name=Role.Names.PERFORMER).exists())
+
+
+class AdTransitionStressTests(TransactionTestCase):
+    def test_concurrent_transitions_have_one_winner_per_ad(self):
+        out = StringIO()
+        call_command(
+            "stress_ad_transitions", ads=5, performers=4, threads=4, duplicates=3, keep=True, stdout=out
+        )
+        self.assertIn("double assignments: 0", out.getvalue())
+
+        ads = Ad.objects.filter(title__startswith="stress")
+        self.assertEqual(ads.count(), 5)
+        for ad in ads:
+            self.assertEqual(ad.status, Ad.Status.DONE)
+            # open -> assigned -> done_reported -> done
+            self.assertEqual(ad.version, 3)
+            approved = ad.requests.filter(status=AdRequest.Status.APPROVED)
+            self.assertEqual([req.performer_id for req in approved], [ad.performer_id])
+            self.assertEqual(ad.requests.filter(status=AdRequest.Status.REJECTED).count(), 3)
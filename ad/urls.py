@@ -1,8 +1,14 @@
 from django.urls import path
 from .views import (
     AdListCreateAPIView,
+    AdBulkCreateAPIView,
+    AdBulkCancelAPIView,
     AdRetrieveUpdateDestroyAPIView,
     OpenAdListAPIView,
+    NearbyOpenAdListAPIView,
+    AdSearchAPIView,
+    AdFacetListAPIView,
+    PerformerFreeSlotsAPIView,
     AdRequestListCreateAPIView,
     # AdRequestRetrieveUpdateAPIView,
     RequestListAPIView,
@@ -14,7 +20,13 @@ from .views import (
 
 urlpatterns = [
     path("ads/", AdListCreateAPIView.as_view()),
+    path("ads/bulk/", AdBulkCreateAPIView.as_view()),
+    path("ads/bulk/cancel/", AdBulkCancelAPIView.as_view()),
     path("ads/open/", OpenAdListAPIView.as_view()),
+    path("ads/open/nearby/", NearbyOpenAdListAPIView.as_view()),
+    path("ads/search/", AdSearchAPIView.as_view()),
+    path("ads/facets/", AdFacetListAPIView.as_view()),
+    path("ads/performers/<int:performer_id>/free-slots/", PerformerFreeSlotsAPIView.as_view()),
     path("ads/<int:pk>/", AdRetrieveUpdateDestroyAPIView.as_view()),
 
     path("ads/<int:pk>/requests/", AdRequestListCreateAPIView.as_view()),
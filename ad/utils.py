@@ -1,3 +1,9 @@
+from collections import Counter
+
+from django.core.exceptions import FieldDoesNotExist
+from django.utils import timezone
+from rest_framework.relations import RelatedField
+
 from .models import Ad
 
 def is_assigned(ad):
@@ -11,4 +17,95 @@ def is_open(ad):
 def calculate_rating(ratings, comment_counts):
     if comment_counts > 0:
         return sum([rating for rating in ratings])/ comment_counts
-    return 0.0
\ No newline at end of file
+    return 0.0
+
+def time_in_status(ad, now=None):
+    """
+    Seconds ``ad`` has spent in each status, from date_added and its status
+    history in one query. The current status counts up to ``now``.
+    """
+    history = list(ad.status_history.only("from_status", "to_status", "changed_at"))
+    status = history[0].from_status if history else ad.status
+    since = ad.date_added
+    durations = Counter()
+    for row in history:
+        durations[status] += (row.changed_at - since).total_seconds()
+        status, since = row.to_status, row.changed_at
+    durations[status] += ((now or timezone.now()) - since).total_seconds()
+    return dict(durations)
+
+def build_category_facets(categories):
+    """
+    Turn categories (with their open-ad counters) into facet rows.
+    ``open_ads_total`` also includes every descendant category.
+    """
+    facets = {}
+    for category in categories:
+        counter = getattr(category, "open_ads_counter", None)
+        facets[category.id] = {
+            "id": category.id,
+            "name": category.name,
+            "parent_id": category.parent_id,
+            "open_ads": counter.count if counter else 0,
+            "open_ads_total": 0,
+        }
+
+    for facet in facets.values():
+        count = facet["open_ads"]
+        node, seen = facet, set()
+        while node is not None and node["id"] not in seen:
+            seen.add(node["id"])
+            node["open_ads_total"] += count
+            node = facets.get(node["parent_id"])
+
+    return list(facets.values())
+
+
+def select_for_serializer(queryset, serializer_class):
+    """
+    Join every relation ``serializer_class`` reads and load only the columns
+    it renders, so serializing a page of rows costs one query.
+    """
+    model = queryset.model
+    related = set()
+    only = {model._meta.pk.name}
+    restrict = True
+
+    for field in serializer_class().fields.values():
+        if field.write_only:
+            continue
+        if field.source == "*":
+            restrict = False
+            continue
+
+        path, current = [], model
+        for position, attr in enumerate(field.source_attrs, start=1):
+            is_last = position == len(field.source_attrs)
+            try:
+                model_field = current._meta.get_field(attr)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is None or model_field.many_to_many or model_field.one_to_many:
+                # Properties, methods and to-many relations: columns can't be inferred.
+                restrict = False
+                break
+
+            name = "__".join(path + [attr])
+            if not model_field.is_relation:
+                only.add(name)
+                continue
+            if is_last and isinstance(field, RelatedField) and field.use_pk_only_optimization():
+                only.add(name)
+                continue
+
+            related.add(name)
+            path.append(attr)
+            current = model_field.related_model
+            if is_last:
+                # e.g. StringRelatedField: __str__ may touch any column.
+                only.add(name)
+
+    queryset = queryset.select_related(*sorted(related))
+    if restrict:
+        queryset = queryset.only(*sorted(only))
+    return queryset
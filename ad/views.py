@@ -1,3 +1,5 @@
+from datetime import timedelta
+
 from rest_framework.generics import (
     ListCreateAPIView,
     RetrieveUpdateDestroyAPIView,
@@ -8,42 +10,107 @@ from rest_framework.generics import (
 from rest_framework.permissions import IsAuthenticated
 from user.permissions import IsAdOwner, IsAdPerformer
 from rest_framework.response import Response
-from rest_framework.exceptions import ValidationError, PermissionDenied
+from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
 from django.db import transaction, IntegrityError
 from django.db.models import Avg, Count
-from .models import Ad, AdRequest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from .models import Ad, AdRequest, Category
 from .serializer import (
     AdCreateSerializer,
+    AdBulkCancelSerializer,
+    AdNearbySerializer,
     AdReadSerializer,
     AdUpdateSerializer,
     AdRequestCreateSerializer,
+    AdRequestRankedSerializer,
     AdRequestReadSerializer,
+    CategoryFacetSerializer,
+    FreeSlotSerializer,
 )
 from comment.models import Comment
-from user.models import Profile
+from user.models import Profile, Role
 from user.utils import is_performer, is_support
-from .services import choose_ad_request, report_ad_done, confirm_ad_done
+from .services import (
+    choose_ad_request,
+    report_ad_done,
+    confirm_ad_done,
+    create_ad,
+    update_ad,
+    cancel_ad,
+    bulk_create_ads,
+    bulk_cancel_ads,
+)
+from .bookings import free_slots
+from .pagination import OpenAdFeedPagination
+from .cache import get_open_ads_page, set_open_ads_page
+from .geo import nearby_open_ads
+from .ranking import rank_requests
+from .search import search_ads
+from .utils import build_category_facets, select_for_serializer
 
 class AdListCreateAPIView(ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        if is_support(self.request.user):
-            return Ad.objects.all()
-        return Ad.objects.filter(creator=self.request.user)
+        qs = Ad.objects.all() if is_support(self.request.user) else Ad.objects.filter(creator=self.request.user)
+        return select_for_serializer(qs, AdReadSerializer)
 
     def get_serializer_class(self):
         return AdCreateSerializer if self.request.method == "POST" else AdReadSerializer
 
     def perform_create(self, serializer):
-        serializer.save(creator=self.request.user)
+        create_ad(serializer=serializer, user=self.request.user)
+
+
+class AdBulkCreateAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AdCreateSerializer
+    max_items = 100
+
+    def post(self, request, *args, **kwargs):
+        if not isinstance(request.data, list) or not request.data:
+            raise ValidationError("یک لیست غیرخالی از آگهی‌ها ارسال کنید.")
+        if len(request.data) > self.max_items:
+            raise ValidationError(f"حداکثر {self.max_items} آگهی در هر درخواست مجاز است.")
+
+        # Validate item by item so one bad ad doesn't reject the whole batch.
+        serializer = AdCreateSerializer(data=request.data, many=True)
+        items, errors = [], []
+        for index, item in enumerate(request.data):
+            try:
+                items.append(serializer.child.run_validation(item))
+            except ValidationError as exc:
+                errors.append({"index": index, "errors": exc.detail})
+
+        ads = bulk_create_ads(items=items, user=request.user) if items else []
+        return Response(
+            {"created": AdReadSerializer(ads, many=True).data, "errors": errors},
+            status=201 if ads else 400,
+        )
+
+
+class AdBulkCancelAPIView(APIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AdBulkCancelSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = AdBulkCancelSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        cancelled, errors = bulk_cancel_ads(ad_ids=serializer.validated_data["ids"], user=request.user)
+        return Response({"cancelled": cancelled, "errors": errors}, status=200)
 
 
 class AdRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAuthenticated]
-    queryset = Ad.objects.all()
+
+    def get_queryset(self):
+        if self.request.method == "GET":
+            return select_for_serializer(Ad.objects.all(), AdReadSerializer)
+        return Ad.objects.all()
 
     def get_serializer_class(self):
         if self.request.method == "GET":
@@ -58,7 +125,7 @@ class AdRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
 
         serializer = self.get_serializer(ad, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
-        ad = serializer.save()
+        ad = update_ad(serializer=serializer)
 
         return Response(AdReadSerializer(ad).data, status=200)
 
@@ -70,32 +137,148 @@ class AdRetrieveUpdateDestroyAPIView(RetrieveUpdateDestroyAPIView):
 
         serializer = self.get_serializer(ad, data=request.data)
         serializer.is_valid(raise_exception=True)
-        ad = serializer.save()
+        ad = update_ad(serializer=serializer)
 
         return Response(AdReadSerializer(ad).data, status=200)
 
     def destroy(self, request, *args, **kwargs):
         ad = self.get_object()
+        cancel_ad(ad_id=ad.id, user=request.user)
+        return Response(status=204)
 
-        if ad.creator_id != request.user.id:
-            raise PermissionDenied("تنها مالک آگهی می‌تواند آن را لغو کند.")
 
-        if ad.status == Ad.Status.DONE:
-            raise ValidationError("آگهی‌ای که انجام شده است را نمی‌توان لغو کرد.")
+class OpenAdListAPIView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = AdReadSerializer
+    pagination_class = OpenAdFeedPagination
 
-        ad.status = Ad.Status.CANCELLED
-        ad.save(update_fields=["status"])
-        return Response(status=204)
+    def get_queryset(self):
+        return select_for_serializer(Ad.objects.filter(status=Ad.Status.OPEN), AdReadSerializer)
 
+    def list(self, request, *args, **kwargs):
+        if not is_performer(request.user):
+            raise PermissionDenied("فقط پیمانکار می‌تواند لیست آگهی‌های باز را مشاهده کند.")
 
-class OpenAdListAPIView(ListAPIView):
+        key, data = get_open_ads_page(request)
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        set_open_ads_page(key, response.data)
+        return response
+
+class AdSearchAPIView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = AdReadSerializer
+    default_limit = 20
+    max_limit = 50
+
+    def get_limit(self):
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError("پارامتر limit باید عدد باشد.")
+        return max(1, min(limit, self.max_limit))
+
+    def get_queryset(self):
+        if not is_performer(self.request.user):
+            raise PermissionDenied("فقط پیمانکار می‌تواند در آگهی‌ها جستجو کند.")
+        query = self.request.query_params.get("q", "").strip()
+        if not query:
+            raise ValidationError("عبارت جستجو (q) الزامی است.")
+        return search_ads(
+            query,
+            limit=self.get_limit(),
+            queryset=select_for_serializer(Ad.objects.all(), AdReadSerializer),
+        )
+
+
+class NearbyOpenAdListAPIView(ListAPIView):
+    """
+    Open ads within ``radius_km`` of ``lat``/``lon``, nearest first, with
+    their distance. Ads without coordinates are never listed.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = AdNearbySerializer
+    default_radius_km = 10
+    max_radius_km = 100
+    default_limit = 20
+    max_limit = 100
+
+    def get_float(self, name, low, high, default=None):
+        value = self.request.query_params.get(name, default)
+        if value is None:
+            raise ValidationError(f"پارامتر {name} الزامی است.")
+        try:
+            value = float(value)
+        except ValueError:
+            raise ValidationError(f"پارامتر {name} باید عدد باشد.")
+        if not low <= value <= high:
+            raise ValidationError(f"پارامتر {name} باید بین {low} و {high} باشد.")
+        return value
 
     def get_queryset(self):
         if not is_performer(self.request.user):
             raise PermissionDenied("فقط پیمانکار می‌تواند لیست آگهی‌های باز را مشاهده کند.")
-        return Ad.objects.filter(status=Ad.Status.OPEN).order_by("-date_added")
+        lat = self.get_float("lat", -90, 90)
+        lon = self.get_float("lon", -180, 180)
+        radius_km = self.get_float("radius_km", 0, self.max_radius_km, self.default_radius_km)
+        try:
+            limit = int(self.request.query_params.get("limit", self.default_limit))
+        except ValueError:
+            raise ValidationError("پارامتر limit باید عدد باشد.")
+        return nearby_open_ads(
+            select_for_serializer(Ad.objects.all(), AdReadSerializer),
+            lat, lon, radius_km, max(1, min(limit, self.max_limit)),
+        )
+
+
+class PerformerFreeSlotsAPIView(APIView):
+    """
+    Gaps of at least BOOKING_DURATION between the performer's bookings in
+    ``[from, to)``, a range of at most ``max_range_days``.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = FreeSlotSerializer
+    max_range_days = 31
+
+    def get_datetime(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            raise ValidationError(f"پارامتر {name} الزامی است.")
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            value = None
+        if value is None:
+            raise ValidationError(f"پارامتر {name} باید زمان معتبر باشد.")
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    def get(self, request, *args, **kwargs):
+        start, end = self.get_datetime("from"), self.get_datetime("to")
+        if end <= start:
+            raise ValidationError("پارامتر to باید بعد از from باشد.")
+        if end - start > timedelta(days=self.max_range_days):
+            raise ValidationError(f"بازه زمانی حداکثر {self.max_range_days} روز است.")
+        performer_id = kwargs["performer_id"]
+        if not Role.objects.filter(name=Role.Names.PERFORMER, users__id=performer_id).exists():
+            raise NotFound("پیمانکار یافت نشد.")
+        slots = [{"start": slot_start, "end": slot_end} for slot_start, slot_end in free_slots(performer_id, start, end)]
+        return Response(FreeSlotSerializer(slots, many=True).data)
+
+
+class AdFacetListAPIView(ListAPIView):
+    permission_classes = [IsAuthenticated]
+    serializer_class = CategoryFacetSerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        # One row per category, read straight from the counter table.
+        return build_category_facets(
+            Category.objects.select_related("open_ads_counter").order_by("name")
+        )
 
 class AdRequestListCreateAPIView(ListCreateAPIView):
     permission_classes = [IsAuthenticated]
@@ -104,13 +287,18 @@ class AdRequestListCreateAPIView(ListCreateAPIView):
         return get_object_or_404(Ad, pk=self.kwargs["pk"])
 
     def get_serializer_class(self):
-        return AdRequestCreateSerializer if self.request.method == "POST" else AdRequestReadSerializer
+        if self.request.method == "POST":
+            return AdRequestCreateSerializer
+        # The owner sees the applicants ranked; the schema documents that view.
+        if getattr(self, "swagger_fake_view", False) or self.ad.creator_id == self.request.user.id:
+            return AdRequestRankedSerializer
+        return AdRequestReadSerializer
 
     def get_queryset(self):
-        ad = self.get_ad()
+        ad = self.ad = self.get_ad()
         user = self.request.user
 
-        base_qs = ad.requests.select_related("ad", "performer").order_by("-created_at")
+        base_qs = select_for_serializer(ad.requests.order_by("-created_at"), AdRequestReadSerializer)
 
         if ad.creator_id == user.id:
             return base_qs
@@ -120,6 +308,13 @@ class AdRequestListCreateAPIView(ListCreateAPIView):
 
         raise PermissionDenied("شما اجازه مشاهده درخواست‌های این آگهی را ندارید.")
 
+    def list(self, request, *args, **kwargs):
+        queryset = self.get_queryset()
+        if self.ad.creator_id == request.user.id:
+            # The owner sees the applicants best first (see ad.ranking).
+            queryset = rank_requests(self.ad, queryset)
+        return Response(self.get_serializer(queryset, many=True).data)
+
     def perform_create(self, serializer):
         ad = self.get_ad()
         user = self.request.user
@@ -183,7 +378,10 @@ class RequestListAPIView(ListAPIView):
     def get_queryset(self):
         if not is_performer(self.request.user):
             raise PermissionDenied("شما پیمانکار نیستید.")
-        return AdRequest.objects.filter(performer=self.request.user).order_by("-created_at")
+        return select_for_serializer(
+            AdRequest.objects.filter(performer=self.request.user).order_by("-created_at"),
+            AdRequestReadSerializer,
+        )
 
 
 
@@ -0,0 +1,47 @@
+# Generated by Django 6.0 on 2026-10-18 10:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_performer_ratings(apps, schema_editor):
+    Comment = apps.get_model('comment', 'Comment')
+    PerformerRating = apps.get_model('comment', 'PerformerRating')
+    totals = Comment.objects.order_by().values('performer_id').annotate(total=Sum('rating'), count=Count('id'))
+    PerformerRating.objects.bulk_create([
+        PerformerRating(
+            performer_id=row['performer_id'],
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            average=row['total'] / row['count'],
+        )
+        for row in totals
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0005_comment_performer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PerformerRating',
+            fields=[
+                ('performer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='پیمانکار')),
+                ('rating_sum', models.PositiveIntegerField(default=0, verbose_name='مجموع امتیازها')),
+                ('rating_count', models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات')),
+                ('average', models.FloatField(default=0.0, verbose_name='میانگین امتیاز')),
+            ],
+            options={
+                'verbose_name': 'امتیاز پیمانکار',
+                'verbose_name_plural': 'امتیاز پیمانکاران',
+                'indexes': [models.Index(fields=['average', 'rating_count'], name='performer_rating_avg_cnt_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_performer_ratings, migrations.RunPython.noop),
+    ]
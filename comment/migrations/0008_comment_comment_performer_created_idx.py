@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 11:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0020_ad_ad_creator_date_idx'),
+        ('comment', '0007_comment_comment_user_created_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['performer', '-created_at', '-id'], name='comment_performer_created_idx'),
+        ),
+    ]
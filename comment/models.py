@@ -38,8 +38,41 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A customer's comments, newest first; see user.pagination
+            models.Index(fields=['user', '-created_at', '-id'], name='comment_user_created_idx'),
+            # A performer's reviews, newest first
+            models.Index(fields=['performer', '-created_at', '-id'], name='comment_performer_created_idx'),
+        ]
         verbose_name = 'نظر'
         verbose_name_plural = 'نظرات'
 
     def __str__(self):
         return f'نظر {self.user} برای {self.ad} - امتیاز: {self.rating}'
+
+
+class PerformerRating(models.Model):
+    """
+    Running rating totals per performer, updated in the same transaction
+    that creates a Comment.
+    """
+    performer = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='rating',
+        verbose_name='پیمانکار'
+    )
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='مجموع امتیازها')
+    rating_count = models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات')
+    average = models.FloatField(default=0.0, verbose_name='میانگین امتیاز')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['average', 'rating_count'], name='performer_rating_avg_cnt_idx'),
+        ]
+        verbose_name = 'امتیاز پیمانکار'
+        verbose_name_plural = 'امتیاز پیمانکاران'
+
+    def __str__(self):
+        return f'{self.performer} - {self.average:.2f} ({self.rating_count})'
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Comment
+from .models import Comment, PerformerRating
 from user.models import User
 from ad.models import Ad
 
@@ -37,4 +37,18 @@ class CommentDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = ['id', 'content', 'rating', 'user', 'user_name', 'ad', 'ad_title', 'created_at']
-        read_only_fields = ['user', 'created_at']
\ No newline at end of file
+        read_only_fields = ['user', 'created_at']
+
+
+class PerformerRatingSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='performer_id', read_only=True)
+    username = serializers.CharField(source='performer.username', read_only=True)
+    first_name = serializers.CharField(source='performer.first_name', read_only=True)
+    last_name = serializers.CharField(source='performer.last_name', read_only=True)
+    avg_rating = serializers.FloatField(source='average', read_only=True)
+    comment_count = serializers.IntegerField(source='rating_count', read_only=True)
+    profile_id = serializers.IntegerField(source='performer.profile.id', read_only=True)
+
+    class Meta:
+        model = PerformerRating
+        fields = ['id', 'username', 'first_name', 'last_name', 'avg_rating', 'comment_count', 'profile_id']
@@ -1,11 +1,78 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+
+from user.cache import invalidate_performer_profiles
 from user.models import Profile
+from .models import Comment, PerformerRating
+
 
 def update_performer_rating(performer, new_rating):
-    performer_profile, created = Profile.objects.get_or_create(user=performer)
-    performer_profile.average_rating = (
-        performer_profile.average_rating * performer_profile.rating_count + new_rating
-    ) / (performer_profile.rating_count + 1)
-    performer_profile.rating_count += 1
-    performer_profile.save()
+    # Must run in the transaction that creates the Comment. Every right-hand
+    # side reads the pre-update row, so the average uses the new totals.
+    totals = {
+        "rating_sum": F("rating_sum") + new_rating,
+        "rating_count": F("rating_count") + 1,
+        "average": Cast(F("rating_sum") + new_rating, FloatField()) / (F("rating_count") + 1),
+    }
+    if not PerformerRating.objects.filter(performer_id=performer.id).update(**totals):
+        try:
+            with transaction.atomic():
+                PerformerRating.objects.create(
+                    performer_id=performer.id,
+                    rating_sum=new_rating,
+                    rating_count=1,
+                    average=float(new_rating),
+                )
+        except IntegrityError:
+            # Another comment created the row first; add on top of it.
+            PerformerRating.objects.filter(performer_id=performer.id).update(**totals)
+
+    Profile.objects.filter(user_id=performer.id).update(
+        average_rating=Subquery(
+            PerformerRating.objects.filter(performer_id=performer.id).values("average")[:1]
+        )
+    )
+    invalidate_performer_profiles([performer.id])
+
+
+def count_written_comment(user_id):
+    # Must run in the transaction that creates the Comment.
+    Profile.objects.filter(user_id=user_id).update(comment_count=F("comment_count") + 1)
+
+
+@transaction.atomic
+def rebuild_performer_ratings():
+    """
+    Recompute every performer aggregate from the comment table, for data
+    loaded outside the normal write paths (imports, seeding).
+    """
+    totals = Comment.objects.order_by().values("performer_id").annotate(total=Sum("rating"), count=Count("id"))
+    PerformerRating.objects.all().delete()
+    PerformerRating.objects.bulk_create([
+        PerformerRating(
+            performer_id=row["performer_id"],
+            rating_sum=row["total"],
+            rating_count=row["count"],
+            average=row["total"] / row["count"],
+        )
+        for row in totals
+    ])
+    Profile.objects.filter(user__rating__isnull=False).update(
+        average_rating=Subquery(
+            PerformerRating.objects.filter(performer_id=OuterRef("user_id")).values("average")[:1]
+        )
+    )
 
 
+@transaction.atomic
+def rebuild_comment_counts():
+    """
+    Recompute Profile.comment_count from the comment table, for data loaded
+    outside the normal write paths (imports, seeding).
+    """
+    written = (
+        Comment.objects.filter(user_id=OuterRef("user_id")).order_by()
+        .values("user_id").annotate(count=Count("id")).values("count")
+    )
+    Profile.objects.update(comment_count=Coalesce(Subquery(written), 0))
@@ -1,3 +1,61 @@
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from rest_framework.test import APIClient
+
+from ad.models import Ad, Category
+from comment.models import PerformerRating
+
+
+User = get_user_model()
+
+
+class PerformerRatingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.other_performer = User.objects.create_user(username="other", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.client.force_authenticate(user=self.creator)
+
+    def rate(self, performer, rating):
+        ad = Ad.objects.create(
+            title="t", description="d", category=self.category,
+            creator=self.creator, performer=performer, status=Ad.Status.DONE,
+        )
+        res = self.client.post(
+            "/api/comments/",
+            {"content": "ok", "rating": rating, "ad": ad.id, "performer": performer.id},
+            format="json",
+        )
+        self.assertEqual(res.status_code, 201)
+
+    def test_comment_updates_aggregate_and_profile(self):
+        self.rate(self.performer, 5)
+        self.rate(self.performer, 2)
+
+        rating = PerformerRating.objects.get(performer=self.performer)
+        self.assertEqual((rating.rating_sum, rating.rating_count), (7, 2))
+        self.assertAlmostEqual(rating.average, 3.5)
+        self.performer.profile.refresh_from_db()
+        self.assertAlmostEqual(self.performer.profile.average_rating, 3.5)
+
+    def test_list_filters_and_sorts_from_aggregate(self):
+        self.rate(self.performer, 5)
+        self.rate(self.other_performer, 3)
+        self.rate(self.other_performer, 3)
+
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/performers/ratings/")
+        self.assertEqual([row["username"] for row in res.data], ["performer", "other"])
+        self.assertEqual(res.data[0]["profile_id"], self.performer.profile.id)
+
+        res = self.client.get("/api/performers/ratings/", {"min_comments": 2})
+        self.assertEqual([row["username"] for row in res.data], ["other"])
+
+        res = self.client.get("/api/performers/ratings/", {"sort_by": "comment_count"})
+        self.assertEqual([row["comment_count"] for row in res.data], [2, 1])
+
+        res = self.client.get("/api/performers/ratings/", {"sort_by": "password"})
+        self.assertEqual(res.status_code, 400)
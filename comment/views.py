@@ -1,17 +1,12 @@
 from rest_framework.generics import ListCreateAPIView, RetrieveAPIView, ListAPIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.response import Response
-from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from django.shortcuts import get_object_or_404
-from django.contrib.auth import get_user_model
-from django.db.models import Avg, Count
-from .models import Comment
-from .serializer import CommentCreateSerializer, CommentListSerializer, CommentDetailSerializer
+from django.db import transaction
+from .models import Comment, PerformerRating
+from .serializer import CommentCreateSerializer, CommentListSerializer, CommentDetailSerializer, PerformerRatingSerializer
 from ad.models import Ad
-from user.models import Profile, Role
-from .services import update_performer_rating
-
-User = get_user_model()
+from .services import count_written_comment, update_performer_rating
 
 
 class CommentListCreateAPIView(ListCreateAPIView):
@@ -50,11 +45,13 @@ class CommentListCreateAPIView(ListCreateAPIView):
             from rest_framework.exceptions import ValidationError
             raise ValidationError("A rating already exists for this ad.")
 
-        comment = serializer.save(user=self.request.user)
+        with transaction.atomic():
+            comment = serializer.save(user=self.request.user)
+            count_written_comment(comment.user_id)
 
-        performer = ad.performer
-        if performer:
-            update_performer_rating(performer, comment.rating)
+            performer = ad.performer
+            if performer:
+                update_performer_rating(performer, comment.rating)
             
 
 class CommentDetailAPIView(RetrieveAPIView):
@@ -66,30 +63,17 @@ class CommentDetailAPIView(RetrieveAPIView):
 class PerformerRatingListView(ListAPIView):
 
     permission_classes = [IsAuthenticated]
-    serializer_class = None  
-    def get_serializer_class(self):
-        from rest_framework import serializers
-
-        class PerformerRatingSerializer(serializers.ModelSerializer):
-            avg_rating = serializers.FloatField(read_only=True)
-            comment_count = serializers.IntegerField(read_only=True)
-            profile_id = serializers.IntegerField(source='profile.id', read_only=True)
-
-            class Meta:
-                model = User
-                fields = ['id', 'username', 'first_name', 'last_name', 'avg_rating', 'comment_count', 'profile_id']
-
-        return PerformerRatingSerializer
+    serializer_class = PerformerRatingSerializer
+    sort_fields = {
+        'avg_rating': ('average', 'rating_count'),
+        'comment_count': ('rating_count', 'average'),
+    }
 
     def get_queryset(self):
-        performer_role = Role.objects.get(name=Role.Names.PERFORMER)
-        performers = User.objects.filter(roles=performer_role)
-
-        performers = performers.annotate(
-            avg_rating=Avg('ads_performed__comments__rating'),
-            comment_count=Count('ads_performed__comments')
-        ).filter(
-            avg_rating__isnull=False  
+        # Filters and ordering run on the (average, rating_count) index of
+        # the aggregate table; users are only joined by primary key.
+        performers = PerformerRating.objects.filter(rating_count__gt=0).select_related(
+            'performer', 'performer__profile'
         )
 
         # Apply filters
@@ -99,21 +83,22 @@ class PerformerRatingListView(ListAPIView):
         max_comments = self.request.query_params.get('max_comments')
 
         if min_rating:
-            performers = performers.filter(avg_rating__gte=min_rating)
+            performers = performers.filter(average__gte=min_rating)
         if max_rating:
-            performers = performers.filter(avg_rating__lte=max_rating)
+            performers = performers.filter(average__lte=max_rating)
         if min_comments:
-            performers = performers.filter(comment_count__gte=min_comments)
+            performers = performers.filter(rating_count__gte=min_comments)
         if max_comments:
-            performers = performers.filter(comment_count__lte=max_comments)
+            performers = performers.filter(rating_count__lte=max_comments)
 
         # Sort by parameters
         sort_by = self.request.query_params.get('sort_by', 'avg_rating')  # Default sort by rating
         order = self.request.query_params.get('order', 'desc')  # Default descending
 
-        if order == 'asc':
-            performers = performers.order_by(sort_by)
-        else:
-            performers = performers.order_by(f'-{sort_by}')
+        if sort_by not in self.sort_fields:
+            raise ValidationError({'sort_by': f"Must be one of: {', '.join(self.sort_fields)}."})
 
-        return performers
\ No newline at end of file
+        fields = self.sort_fields[sort_by]
+        if order != 'asc':
+            fields = [f'-{field}' for field in fields]
+        return performers.order_by(*fields)
@@ -0,0 +1,72 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+from django.utils.module_loading import autodiscover_modules
+
+from outbox.services import claim_batch, deliver, purge_delivered
+
+
+def release_connections():
+    # Like Django's request cycle: drop connections that are broken or past
+    # CONN_MAX_AGE, so a long-running thread never holds a stale one. A
+    # worker run inside a transaction (tests) keeps its connection.
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def deliver_in_thread(event, *, max_attempts):
+    try:
+        return deliver(event, max_attempts=max_attempts)
+    finally:
+        release_connections()
+
+
+class Command(BaseCommand):
+    help = "Deliver pending outbox events to their subscribers, in batches on a thread pool."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument("--threads", type=int, default=4, help="1 delivers in the worker's own thread.")
+        parser.add_argument("--max-attempts", type=int, default=5)
+        parser.add_argument("--lease", type=int, default=60, help="Seconds a claimed batch stays reserved.")
+        parser.add_argument("--poll-interval", type=float, default=1.0)
+        parser.add_argument("--keep-days", type=int, default=7, help="Delete delivered events older than this.")
+        parser.add_argument("--purge-interval", type=float, default=3600, help="Seconds between purges.")
+        parser.add_argument("--once", action="store_true", help="Exit when nothing is left to deliver.")
+
+    def handle(self, *args, **options):
+        autodiscover_modules("consumers")
+        threads = max(options["threads"], 1)
+        executor = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+        send = partial(deliver_in_thread if executor else deliver, max_attempts=options["max_attempts"])
+        lease = timedelta(seconds=options["lease"])
+        keep = timedelta(days=options["keep_days"])
+        delivered = failed = purged = 0
+        next_purge = time.monotonic()
+
+        try:
+            while True:
+                release_connections()
+                if time.monotonic() >= next_purge:
+                    purged += purge_delivered(older_than=keep)
+                    next_purge = time.monotonic() + options["purge_interval"]
+                events = claim_batch(size=options["batch_size"], lease=lease)
+                if not events:
+                    if options["once"]:
+                        break
+                    time.sleep(options["poll_interval"])
+                    continue
+                results = list(executor.map(send, events)) if executor else [send(event) for event in events]
+                delivered += results.count(True)
+                failed += results.count(False)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(f"delivered={delivered} failed_attempts={failed} purged={purged}")
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-18 11:02
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('topic', models.CharField(max_length=100, verbose_name='موضوع')),
+                ('payload', models.JSONField(default=dict, verbose_name='داده')),
+                ('status', models.CharField(choices=[('pending', 'در انتظار'), ('done', 'ارسال شده'), ('failed', 'ناموفق')], default='pending', max_length=20, verbose_name='وضعیت')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='زمان قابل ارسال')),
+                ('claimed_by', models.CharField(blank=True, default='', max_length=32, verbose_name='کارگر')),
+                ('locked_until', models.DateTimeField(blank=True, null=True, verbose_name='قفل تا')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='آخرین خطا')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='زمان ارسال')),
+            ],
+            options={
+                'verbose_name': 'رویداد',
+                'verbose_name_plural': 'رویدادها',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_ready_idx')],
+            },
+        ),
+    ]
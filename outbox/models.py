@@ -0,0 +1,41 @@
+from django.db import models
+from django.utils import timezone
+
+
+class OutboxEvent(models.Model):
+    """
+    A domain event written in the same transaction as the change it
+    describes, and delivered later by ``run_outbox_worker``.
+    """
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'در انتظار'
+        DONE = 'done', 'ارسال شده'
+        FAILED = 'failed', 'ناموفق'
+
+    topic = models.CharField(max_length=100, verbose_name='موضوع')
+    payload = models.JSONField(default=dict, verbose_name='داده')
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name='وضعیت'
+    )
+    attempts = models.PositiveSmallIntegerField(default=0, verbose_name='تعداد تلاش')
+    available_at = models.DateTimeField(default=timezone.now, verbose_name='زمان قابل ارسال')
+    # Lease held by the worker batch currently delivering the event
+    claimed_by = models.CharField(max_length=32, blank=True, default='', verbose_name='کارگر')
+    locked_until = models.DateTimeField(null=True, blank=True, verbose_name='قفل تا')
+    last_error = models.TextField(blank=True, default='', verbose_name='آخرین خطا')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+    processed_at = models.DateTimeField(null=True, blank=True, verbose_name='زمان ارسال')
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_ready_idx'),
+        ]
+        verbose_name = 'رویداد'
+        verbose_name_plural = 'رویدادها'
+
+    def __str__(self):
+        return f'{self.topic} #{self.id} - {self.get_status_display()}'
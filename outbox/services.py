@@ -0,0 +1,88 @@
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxEvent
+
+# topic -> handlers; "*" receives every topic
+HANDLERS = defaultdict(list)
+
+MAX_BACKOFF_SECONDS = 300
+
+
+def subscribe(topic):
+    """
+    Register ``handler(event)`` for ``topic``. Delivery is at least once,
+    and a failing handler retries the whole event, so handlers must be
+    idempotent. Handlers live in each app's ``consumers.py``.
+    """
+    def decorator(handler):
+        HANDLERS[topic].append(handler)
+        return handler
+    return decorator
+
+
+def publish(topic, payload):
+    # Must run inside the transaction of the change being described.
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def publish_many(events):
+    return OutboxEvent.objects.bulk_create(
+        [OutboxEvent(topic=topic, payload=payload) for topic, payload in events]
+    )
+
+
+def claim_batch(*, size, lease):
+    """
+    Lease up to ``size`` deliverable events to a new worker token. The claim
+    is a conditional UPDATE, so two workers never get the same event while
+    the lease holds; an expired lease makes the event claimable again.
+    """
+    now = timezone.now()
+    ready = OutboxEvent.objects.filter(status=OutboxEvent.Status.PENDING, available_at__lte=now).filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    )
+    ids = list(ready.order_by("id").values_list("id", flat=True)[:size])
+    if not ids:
+        return []
+
+    token = uuid.uuid4().hex
+    ready.filter(pk__in=ids).update(claimed_by=token, locked_until=now + lease)
+    return list(OutboxEvent.objects.filter(pk__in=ids, claimed_by=token).order_by("id"))
+
+
+def deliver(event, *, max_attempts):
+    """
+    Run every handler for ``event`` and record the outcome. Failures are
+    retried with exponential backoff until ``max_attempts``.
+    """
+    handlers = HANDLERS.get(event.topic, []) + HANDLERS.get("*", [])
+    released = {"claimed_by": "", "locked_until": None}
+    # Only the current lease holder may record the outcome.
+    mine = OutboxEvent.objects.filter(pk=event.pk, claimed_by=event.claimed_by)
+    try:
+        for handler in handlers:
+            handler(event)
+    except Exception as exc:
+        attempts = event.attempts + 1
+        changes = {"attempts": attempts, "last_error": repr(exc), **released}
+        if attempts >= max_attempts:
+            changes["status"] = OutboxEvent.Status.FAILED
+        else:
+            delay = min(2 ** attempts, MAX_BACKOFF_SECONDS)
+            changes["available_at"] = timezone.now() + timedelta(seconds=delay)
+        mine.update(**changes)
+        return False
+
+    mine.update(status=OutboxEvent.Status.DONE, processed_at=timezone.now(), **released)
+    return True
+
+
+def purge_delivered(*, older_than):
+    return OutboxEvent.objects.filter(
+        status=OutboxEvent.Status.DONE, processed_at__lt=timezone.now() - older_than
+    ).delete()[0]
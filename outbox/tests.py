@@ -0,0 +1,147 @@
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from ad.models import Ad, AdRequest, Category
+from outbox.models import OutboxEvent
+from outbox.services import HANDLERS, claim_batch, deliver, publish, publish_many
+from tickets.models import Ticket
+from user.models import Role
+
+
+User = get_user_model()
+
+
+class OutboxPublishTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.category = Category.objects.create(name="cat")
+        self.ad = Ad.objects.create(title="t", description="d", category=self.category, creator=self.creator)
+        self.req = AdRequest.objects.create(ad=self.ad, performer=self.performer)
+
+    def test_choose_and_ticket_reply_publish_events(self):
+        self.client.force_authenticate(user=self.creator)
+        res = self.client.post(f"/api/ads/{self.ad.id}/requests/{self.req.id}/choose/")
+        self.assertEqual(res.status_code, 200)
+
+        support = User.objects.create_user(username="support", password="pass12345")
+        support.roles.add(Role.objects.get_or_create(name=Role.Names.SUPPORT)[0])
+        ticket = Ticket.objects.create(title="help", user=self.creator, ad=self.ad)
+        self.client.force_authenticate(user=support)
+        res = self.client.post(f"/api/tickets/{ticket.id}/reply/", {"body": "on it"}, format="json")
+        self.assertEqual(res.status_code, 201)
+
+        events = {event.topic: event.payload for event in OutboxEvent.objects.all()}
+        self.assertEqual(set(events), {"ad.assign", "ad_request.approved", "ticket.replied"})
+        self.assertEqual(events["ad.assign"]["to_status"], Ad.Status.ASSIGNED)
+        self.assertEqual(events["ad_request.approved"]["performer_id"], self.performer.id)
+        self.assertEqual(events["ticket.replied"]["ticket_id"], ticket.id)
+
+    def test_rejected_transition_publishes_nothing(self):
+        self.client.force_authenticate(user=self.creator)
+        res = self.client.post(f"/api/ads/{self.ad.id}/confirm-done/")
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class OutboxDeliveryTests(TestCase):
+    def test_worker_delivers_and_marks_done(self):
+        received = []
+        publish_many([("ad.cancel", {"ad_id": 1}), ("ad.cancel", {"ad_id": 2})])
+
+        with patch.dict(HANDLERS, {"ad.cancel": [lambda event: received.append(event.payload["ad_id"])]}, clear=True):
+            out = StringIO()
+            call_command("run_outbox_worker", once=True, threads=1, stdout=out)
+
+        self.assertEqual(received, [1, 2])
+        self.assertIn("delivered=2", out.getvalue())
+        self.assertFalse(OutboxEvent.objects.exclude(status=OutboxEvent.Status.DONE).exists())
+
+    def test_failures_back_off_then_give_up(self):
+        event = publish("ad.cancel", {"ad_id": 1})
+
+        def broken(event):
+            raise RuntimeError("boom")
+
+        with patch.dict(HANDLERS, {"*": [broken]}, clear=True):
+            [claimed] = claim_batch(size=10, lease=timedelta(seconds=60))
+            self.assertFalse(deliver(claimed, max_attempts=2))
+            event.refresh_from_db()
+            self.assertEqual((event.status, event.attempts), (OutboxEvent.Status.PENDING, 1))
+            self.assertGreater(event.available_at, timezone.now())
+            # Not claimable until the backoff passes
+            self.assertEqual(claim_batch(size=10, lease=timedelta(seconds=60)), [])
+
+            OutboxEvent.objects.filter(pk=event.pk).update(available_at=timezone.now())
+            [claimed] = claim_batch(size=10, lease=timedelta(seconds=60))
+            self.assertFalse(deliver(claimed, max_attempts=2))
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.attempts), (OutboxEvent.Status.FAILED, 2))
+        self.assertIn("boom", event.last_error)
+
+    def test_claimed_events_are_leased(self):
+        publish("ad.cancel", {"ad_id": 1})
+        self.assertEqual(len(claim_batch(size=10, lease=timedelta(seconds=60))), 1)
+        self.assertEqual(claim_batch(size=10, lease=timedelta(seconds=60)), [])
+
+        # An expired lease (crashed worker) makes the event deliverable again.
+        OutboxEvent.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_batch(size=10, lease=timedelta(seconds=60))), 1)
+
+
+class OutboxWorkerThreadTests(TransactionTestCase):
+    def test_thread_pool_delivers_every_event(self):
+        publish_many(("ad.cancel", {"ad_id": i}) for i in range(40))
+        received = []
+        lock = threading.Lock()
+
+        def record(event):
+            with lock:
+                received.append(event.payload["ad_id"])
+
+        with patch.dict(HANDLERS, {"ad.cancel": [record]}, clear=True):
+            call_command("run_outbox_worker", once=True, threads=4, batch_size=10, stdout=StringIO())
+
+        self.assertEqual(sorted(received), list(range(40)))
+        self.assertEqual(OutboxEvent.objects.filter(status=OutboxEvent.Status.DONE).count(), 40)
+
+    def test_threads_release_connections_after_each_event(self):
+        publish_many(("ad.cancel", {"ad_id": i}) for i in range(6))
+        with patch.dict(HANDLERS, {"ad.cancel": []}, clear=True), patch(
+            "outbox.management.commands.run_outbox_worker.close_old_connections"
+        ) as close:
+            call_command("run_outbox_worker", once=True, threads=3, stdout=StringIO())
+        # Once per event in the pool, plus once per loop in the main thread
+        self.assertGreaterEqual(close.call_count, 6 + 2)
+
+    def test_delivered_events_are_purged_while_running(self):
+        long_ago = timezone.now() - timedelta(days=30)
+        stale = publish("ad.cancel", {"ad_id": 0})
+        OutboxEvent.objects.filter(pk=stale.pk).update(status=OutboxEvent.Status.DONE, processed_at=long_ago)
+        later = publish("ad.cancel", {"ad_id": 1})
+        OutboxEvent.objects.filter(pk=later.pk).update(status=OutboxEvent.Status.FAILED)
+        publish("ad.cancel", {"ad_id": 2})
+
+        def age_later(event):
+            # Becomes purgeable only after the first purge has run.
+            OutboxEvent.objects.filter(pk=later.pk).update(status=OutboxEvent.Status.DONE, processed_at=long_ago)
+
+        out = StringIO()
+        with patch.dict(HANDLERS, {"ad.cancel": [age_later]}, clear=True):
+            call_command("run_outbox_worker", once=True, threads=1, purge_interval=0, stdout=out)
+
+        self.assertIn("purged=2", out.getvalue())
+        self.assertEqual(list(OutboxEvent.objects.values_list("payload__ad_id", flat=True)), [2])
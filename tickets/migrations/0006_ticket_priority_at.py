@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-18 13:05
+
+from datetime import timedelta
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Case, DurationField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact
+
+
+def fill_queue_priority(apps, schema_editor):
+    Ticket = apps.get_model('tickets', 'Ticket')
+    TicketMessage = apps.get_model('tickets', 'TicketMessage')
+
+    last_sender = TicketMessage.objects.filter(ticket=OuterRef('pk')).order_by('-created_at', '-id').values('sender_id')[:1]
+    Ticket.objects.update(waiting_on_support=Case(
+        When(Exact(Coalesce(Subquery(last_sender), F('user_id'), output_field=models.BigIntegerField()), F('user_id')), then=Value(True)),
+        default=Value(False),
+    ))
+    boost = Case(
+        When(status='open', then=Value(timedelta(hours=24))),
+        default=Value(timedelta(0)),
+        output_field=DurationField(),
+    )
+    waiting_boost = Case(
+        When(waiting_on_support=True, then=Value(timedelta(hours=12))),
+        default=Value(timedelta(0)),
+        output_field=DurationField(),
+    )
+    Ticket.objects.update(priority_at=F('created_at') - boost - waiting_boost)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tickets', '0005_ticket_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='waiting_on_support',
+            field=models.BooleanField(default=True, verbose_name='در انتظار پشتیبانی'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='priority_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='اولویت صف'),
+        ),
+        migrations.RunPython(fill_queue_priority, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['priority_at', 'id'], name='ticket_priority_idx'),
+        ),
+    ]
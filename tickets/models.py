@@ -1,5 +1,12 @@
+from datetime import timedelta
+
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
+
+# How much earlier than its creation time a ticket is treated as arriving
+OPEN_BOOST = timedelta(hours=24)
+WAITING_BOOST = timedelta(hours=12)
 
 
 class Ticket(models.Model):
@@ -34,15 +41,36 @@ class Ticket(models.Model):
     )
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='تاریخ ایجاد')
+    # Support queue order, kept by save() and the TicketMessage signal
+    waiting_on_support = models.BooleanField(default=True, verbose_name='در انتظار پشتیبانی')
+    priority_at = models.DateTimeField(default=timezone.now, editable=False, verbose_name='اولویت صف')
 
     class Meta:
         verbose_name = 'تیکت'
         verbose_name_plural = 'تیکت‌ها'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='ticket_status_created_idx'),
+            models.Index(fields=['priority_at', 'id'], name='ticket_priority_idx'),
+        ]
 
     def __str__(self):
         return f'تیکت {self.id}: {self.title} - {self.get_status_display()}'
 
+    def save(self, *args, **kwargs):
+        # priority_at: created_at moved earlier by OPEN_BOOST while open and
+        # by WAITING_BOOST while waiting on support.
+        priority_at = self.created_at or timezone.now()
+        if self.status == self.Status.OPEN:
+            priority_at -= OPEN_BOOST
+        if self.waiting_on_support:
+            priority_at -= WAITING_BOOST
+        self.priority_at = priority_at
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'priority_at'}
+        super().save(*args, **kwargs)
+
 
 class TicketMessage(models.Model):
 
@@ -67,6 +95,9 @@ class TicketMessage(models.Model):
         verbose_name = 'پیام تیکت'
         verbose_name_plural = 'پیام‌های تیکت'
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['ticket', 'created_at', 'id'], name='ticket_msg_ticket_created_idx'),
+        ]
 
     def __str__(self):
         return f'پیام {self.id} برای تیکت {self.ticket_id}'
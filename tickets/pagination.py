@@ -0,0 +1,6 @@
+from ad.pagination import KeysetPagination
+
+
+class SupportQueuePagination(KeysetPagination):
+    # Seeks along the ticket_priority_idx index
+    ordering = ("priority_at", "id")
@@ -1,6 +1,11 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Ticket, TicketMessage
-from user.models import User
+from outbox.services import publish
+from user.models import User, Role
+from user.utils import has_role
+
+LATEST_MESSAGES = 20
 
 
 class TicketMessageSerializer(serializers.ModelSerializer):
@@ -22,16 +27,38 @@ class TicketListSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'created_at']
 
 
+class TicketQueueSerializer(TicketListSerializer):
+    class Meta(TicketListSerializer.Meta):
+        fields = TicketListSerializer.Meta.fields + ['waiting_on_support', 'priority_at']
+        read_only_fields = TicketListSerializer.Meta.read_only_fields + ['waiting_on_support', 'priority_at']
+
+
 class TicketDetailSerializer(serializers.ModelSerializer):
+    """
+    Embeds only the latest LATEST_MESSAGES messages; older ones are paged
+    through /api/tickets/<pk>/messages/?before=<id>.
+    Expects ``latest_messages`` prefetched newest first, one more than shown.
+    """
     user_name = serializers.CharField(source='user.username', read_only=True)
     ad_title = serializers.CharField(source='ad.title', read_only=True, allow_null=True)
-    messages = TicketMessageSerializer(many=True, read_only=True)
+    messages = serializers.SerializerMethodField()
+    has_older_messages = serializers.SerializerMethodField()
     
     class Meta:
         model = Ticket
-        fields = ['id', 'title', 'status', 'user', 'user_name', 'ad', 'ad_title', 'created_at', 'messages']
+        fields = [
+            'id', 'title', 'status', 'user', 'user_name', 'ad', 'ad_title', 'created_at',
+            'messages', 'has_older_messages',
+        ]
         read_only_fields = ['user', 'created_at']
 
+    def get_messages(self, obj):
+        latest = obj.latest_messages[:LATEST_MESSAGES]
+        return TicketMessageSerializer(reversed(latest), many=True).data
+
+    def get_has_older_messages(self, obj):
+        return len(obj.latest_messages) > LATEST_MESSAGES
+
 
 class TicketCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -49,17 +76,17 @@ class TicketReplySerializer(serializers.ModelSerializer):
         model = TicketMessage
         fields = ['body']
     
+    @transaction.atomic
     def create(self, validated_data):
-        user = self.context['request'].user
-        ticket_id = self.context['ticket_id']
-        
-        validated_data['sender'] = user
-        validated_data['ticket_id'] = ticket_id
+        # sender and ticket are passed in by the view's serializer.save()
+        user = validated_data['sender']
+        ticket = validated_data['ticket']
         
         # Update ticket status to PENDING when support replies
-        ticket = Ticket.objects.get(id=ticket_id)
-        if user.roles.filter(name='support').exists():
+        if has_role(user, Role.Names.SUPPORT):
             ticket.status = Ticket.Status.PENDING
-            ticket.save()
+            ticket.save(update_fields=['status'])
         
-        return super().create(validated_data)
\ No newline at end of file
+        message = super().create(validated_data)
+        publish('ticket.replied', {'ticket_id': ticket.id, 'message_id': message.id, 'sender_id': user.id})
+        return message
\ No newline at end of file
@@ -0,0 +1,29 @@
+from django.db import transaction
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import TicketMessage
+from .streams import broker, message_event
+
+
+def _publish(message):
+    # Serialize only when someone is listening.
+    if broker.has_subscribers(message.ticket_id):
+        broker.publish(message.ticket_id, message_event(message))
+
+
+@receiver(post_save, sender=TicketMessage)
+def track_waiting_on_support(sender, instance, created, **kwargs):
+    # The newest message decides whether the ticket waits on support.
+    if created:
+        ticket = instance.ticket
+        waiting = instance.sender_id == ticket.user_id
+        if ticket.waiting_on_support != waiting:
+            ticket.waiting_on_support = waiting
+            ticket.save(update_fields=['waiting_on_support'])
+
+
+@receiver(post_save, sender=TicketMessage)
+def push_ticket_message(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: _publish(instance))
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.core import signing
+
+from .serializer import TicketMessageSerializer
+
+QUEUE_SIZE = 100
+HEARTBEAT_SECONDS = 15
+# Stream tokens go in the URL, where access logs and proxies record them, so
+# they only open one ticket's stream and expire quickly.
+STREAM_TOKEN_SALT = "tickets.stream"
+STREAM_TOKEN_SECONDS = 60
+# Sent to a subscriber whose queue overflowed; its stream ends and the
+# client reconnects with Last-Event-ID to catch up from the database.
+OVERFLOW = None
+
+
+def make_stream_token(user_id, ticket_id):
+    return signing.dumps({"user": user_id, "ticket": ticket_id}, salt=STREAM_TOKEN_SALT, compress=True)
+
+
+def read_stream_token(token, ticket_id):
+    """The user id ``token`` was issued to for ``ticket_id``, or None."""
+    try:
+        claims = signing.loads(token, salt=STREAM_TOKEN_SALT, max_age=STREAM_TOKEN_SECONDS)
+    except signing.BadSignature:
+        return None
+    if not isinstance(claims, dict) or claims.get("ticket") != ticket_id:
+        return None
+    return claims.get("user")
+
+
+def message_event(message):
+    """
+    The SSE frame for ``message``, serialized once and shared by every
+    subscriber.
+    """
+    data = json.dumps(TicketMessageSerializer(message).data, ensure_ascii=False, default=str)
+    return message.id, f"id: {message.id}\nevent: message\ndata: {data}\n\n"
+
+
+def _offer(queue, event):
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        event = OVERFLOW
+    queue.put_nowait(event)
+
+
+class TicketBroker:
+    """
+    In-process fan-out of new ticket messages to open SSE streams.
+
+    Each subscriber is an asyncio.Queue on the event loop serving it, and
+    publishers may run in any thread. Only messages saved by this process
+    are seen, so serve the API from a single ASGI process (or bridge
+    brokers through a shared channel).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = defaultdict(set)
+
+    def subscribe(self, ticket_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self.lock:
+            self.subscribers[ticket_id].add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, ticket_id, subscriber):
+        with self.lock:
+            subscribers = self.subscribers.get(ticket_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self.subscribers[ticket_id]
+
+    def has_subscribers(self, ticket_id):
+        return ticket_id in self.subscribers
+
+    def publish(self, ticket_id, event):
+        with self.lock:
+            subscribers = list(self.subscribers.get(ticket_id, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down.
+                pass
+
+
+broker = TicketBroker()
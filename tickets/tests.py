@@ -1,3 +1,256 @@
-from django.test import TestCase
+import asyncio
+from datetime import timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncRequestFactory, TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from tickets.models import Ticket, TicketMessage
+from tickets.streams import broker, message_event
+from tickets.utils import rebuild_queue_priority
+from tickets.views import ticket_stream
+from user.models import Role
+
+
+User = get_user_model()
+
+
+class TicketStreamTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username="owner", password="pass12345")
+        self.support = User.objects.create_user(username="support", password="pass12345")
+        self.support.roles.add(Role.objects.get_or_create(name=Role.Names.SUPPORT)[0])
+        self.stranger = User.objects.create_user(username="stranger", password="pass12345")
+        self.ticket = Ticket.objects.create(title="help", user=self.owner, ad=None)
+        self.first = TicketMessage.objects.create(ticket=self.ticket, sender=self.owner, body="first")
+        self.factory = AsyncRequestFactory()
+
+    async def open_stream(self, user, headers=None):
+        request = self.factory.get(
+            f"/api/tickets/{self.ticket.id}/stream/",
+            headers={"Authorization": f"Bearer {AccessToken.for_user(user)}", **(headers or {})},
+        )
+        return await ticket_stream(request, pk=self.ticket.id)
+
+    async def test_stream_replays_after_last_event_id_then_pushes_without_queries(self):
+        response = await self.open_stream(self.owner, {"Last-Event-ID": str(self.first.id - 1)})
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = response.streaming_content
+        try:
+            self.assertTrue((await anext(stream)).startswith(b"retry:"))
+            self.assertIn('"body": "first"', (await anext(stream)).decode())
+
+            reply = await TicketMessage.objects.select_related("sender").acreate(
+                ticket=self.ticket, sender=self.support, body="second"
+            )
+            # Published from another thread, like a sync request worker
+            await sync_to_async(broker.publish, thread_sensitive=False)(self.ticket.id, message_event(reply))
+            queries = []
+            with connection.execute_wrapper(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args)):
+                frame = (await anext(stream)).decode()
+            self.assertEqual(queries, [])
+            self.assertTrue(frame.startswith(f"id: {reply.id}\n"))
+            self.assertIn('"sender_name": "support"', frame)
+        finally:
+            # A client disconnect cancels the task waiting on the stream.
+            waiting = asyncio.ensure_future(anext(stream))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+        self.assertFalse(broker.has_subscribers(self.ticket.id))
+
+    async def test_stream_is_limited_to_owner_and_support(self):
+        response = await self.open_stream(self.stranger)
+        self.assertEqual(response.status_code, 403)
+
+        response = await ticket_stream(self.factory.get("/"), pk=self.ticket.id)
+        self.assertEqual(response.status_code, 401)
+
+        response = await self.open_stream(self.support)
+        self.assertEqual(response.status_code, 200)
+
+    async def test_url_token_must_be_a_fresh_stream_token_for_the_ticket(self):
+        url = f"/api/tickets/{self.ticket.id}/stream/"
+        response = await ticket_stream(self.factory.get(url, {"token": str(AccessToken.for_user(self.owner))}), pk=self.ticket.id)
+        self.assertEqual(response.status_code, 401)
+
+        client = APIClient()
+        await sync_to_async(client.force_authenticate)(user=self.owner)
+        res = await sync_to_async(client.post)(f"/api/tickets/{self.ticket.id}/stream-token/")
+        self.assertEqual(res.status_code, 200)
+        token = res.data["token"]
+
+        response = await ticket_stream(self.factory.get(url, {"token": token}), pk=self.ticket.id)
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+        # Bound to the ticket it was issued for
+        response = await ticket_stream(self.factory.get("/", {"token": token}), pk=self.ticket.id + 1)
+        self.assertEqual(response.status_code, 401)
+        # Expired
+        with patch("tickets.streams.STREAM_TOKEN_SECONDS", -1):
+            response = await ticket_stream(self.factory.get(url, {"token": token}), pk=self.ticket.id)
+        self.assertEqual(response.status_code, 401)
+
+        await sync_to_async(client.force_authenticate)(user=self.stranger)
+        res = await sync_to_async(client.post)(f"/api/tickets/{self.ticket.id}/stream-token/")
+        self.assertEqual(res.status_code, 403)
+
+    def test_reply_is_published_on_commit(self):
+        client = APIClient()
+        client.force_authenticate(user=self.support)
+        with patch.object(broker, "has_subscribers", return_value=True), \
+                patch.object(broker, "publish") as publish:
+            with self.captureOnCommitCallbacks(execute=True):
+                res = client.post(f"/api/tickets/{self.ticket.id}/reply/", {"body": "on it"}, format="json")
+
+        self.assertEqual(res.status_code, 201)
+        ticket_id, (message_id, frame) = publish.call_args.args
+        reply = self.ticket.messages.get(body="on it")
+        self.assertEqual((ticket_id, message_id), (self.ticket.id, reply.id))
+        self.assertIn("on it", frame)
+
+    def test_overflowing_subscriber_is_disconnected(self):
+        async def overflow():
+            loop, queue = broker.subscribe(self.ticket.id)
+            try:
+                for i in range(queue.maxsize + 1):
+                    broker.publish(self.ticket.id, (i, "frame"))
+                await asyncio.sleep(0)
+                return queue.qsize(), queue.get_nowait()
+            finally:
+                broker.unsubscribe(self.ticket.id, (loop, queue))
+
+        self.assertEqual(asyncio.run(overflow()), (1, None))
+
+
+class TicketMessagePagingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", password="pass12345")
+        self.support = User.objects.create_user(username="support", password="pass12345")
+        self.support.roles.add(Role.objects.get_or_create(name=Role.Names.SUPPORT)[0])
+        self.ticket = Ticket.objects.create(title="help", user=self.owner, ad=None)
+        self.messages = [
+            TicketMessage.objects.create(
+                ticket=self.ticket, sender=self.owner if i % 2 else self.support, body=f"m{i}"
+            )
+            for i in range(30)
+        ]
+        self.client.force_authenticate(user=self.owner)
+
+    def bodies(self, res):
+        return [message["body"] for message in res.data["messages" if "messages" in res.data else "results"]]
+
+    def test_detail_embeds_latest_messages_in_constant_queries(self):
+        with self.assertNumQueries(2):
+            res = self.client.get(f"/api/tickets/{self.ticket.id}/")
+        self.assertEqual(self.bodies(res), [f"m{i}" for i in range(10, 30)])
+        self.assertTrue(res.data["has_older_messages"])
+
+    def test_messages_after_and_before(self):
+        url = f"/api/tickets/{self.ticket.id}/messages/"
+        res = self.client.get(url, {"after": self.messages[24].id, "limit": 3})
+        self.assertEqual(self.bodies(res), ["m25", "m26", "m27"])
+        self.assertTrue(res.data["has_more"])
+
+        with self.assertNumQueries(2):
+            res = self.client.get(url, {"after": self.messages[27].id})
+        self.assertEqual(self.bodies(res), ["m28", "m29"])
+        self.assertFalse(res.data["has_more"])
+        self.assertEqual(res.data["results"][0]["sender_name"], "support")
+
+        res = self.client.get(url, {"before": self.messages[10].id, "limit": 4})
+        self.assertEqual(self.bodies(res), ["m6", "m7", "m8", "m9"])
+        self.assertTrue(res.data["has_more"])
+
+    def test_messages_are_limited_to_owner_and_support(self):
+        url = f"/api/tickets/{self.ticket.id}/messages/"
+        self.client.force_authenticate(user=User.objects.create_user(username="x", password="pass12345"))
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.client.force_authenticate(user=self.support)
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.get(url, {"limit": "x"}).status_code, 400)
+
+        other = Ticket.objects.create(title="other", user=self.support, ad=None)
+        foreign = TicketMessage.objects.create(ticket=other, sender=self.support, body="elsewhere")
+        self.assertEqual(self.client.get(url, {"after": foreign.id}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"before": 999999}).status_code, 400)
+
+    def test_ticket_list_and_create(self):
+        res = self.client.post("/api/tickets/", {"title": "another", "ad": None}, format="json")
+        self.assertEqual(res.status_code, 201)
+        res = self.client.get("/api/tickets/")
+        self.assertEqual([ticket["title"] for ticket in res.data], ["another", "help"])
+
+
+class SupportQueueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = User.objects.create_user(username="owner", password="pass12345")
+        self.support = User.objects.create_user(username="support", password="pass12345")
+        self.support.roles.add(Role.objects.get_or_create(name=Role.Names.SUPPORT)[0])
+        now = timezone.now()
+
+        def ticket(title, status, hours_ago, last_sender=None):
+            ticket = Ticket.objects.create(title=title, user=self.owner, ad=None, status=status)
+            ticket.created_at = now - timedelta(hours=hours_ago)
+            ticket.save()
+            if last_sender:
+                TicketMessage.objects.create(ticket=ticket, sender=last_sender, body="hi")
+            return ticket
+
+        # priority_at: created_at - 24h if open - 12h if waiting on support
+        ticket("pending answered", Ticket.Status.PENDING, 72, self.support)  # -72h
+        ticket("open new", Ticket.Status.OPEN, 0)  # -36h
+        ticket("open answered", Ticket.Status.OPEN, 2, self.support)  # -26h
+        ticket("pending customer replied", Ticket.Status.PENDING, 1, self.owner)  # -13h
+        ticket("closed", Ticket.Status.CLOSED, 100)
+
+    def test_queue_orders_by_priority_with_cursor_and_counts(self):
+        self.client.force_authenticate(user=User.objects.get(pk=self.support.pk))
+        with self.assertNumQueries(3):
+            res = self.client.get("/api/tickets/support/queue/", {"page_size": 2})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([t["title"] for t in res.data["results"]], ["pending answered", "open new"])
+        self.assertEqual(res.data["counts"], {"open": 2, "pending": 2, "closed": 1})
+        self.assertTrue(res.data["results"][1]["waiting_on_support"])
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual([t["title"] for t in res.data["results"]], ["open answered", "pending customer replied"])
+        self.assertIsNone(res.data["next"])
+
+        res = self.client.get("/api/tickets/support/queue/", {"status": "pending"})
+        self.assertEqual([t["title"] for t in res.data["results"]], ["pending answered", "pending customer replied"])
+
+    def test_priority_follows_replies_and_status(self):
+        ticket = Ticket.objects.get(title="open new")
+        self.client.force_authenticate(user=self.support)
+        self.client.post(f"/api/tickets/{ticket.id}/reply/", {"body": "on it"})
+        ticket.refresh_from_db()
+        self.assertEqual((ticket.status, ticket.waiting_on_support), (Ticket.Status.PENDING, False))
+        self.assertEqual(ticket.priority_at, ticket.created_at)
+
+        TicketMessage.objects.create(ticket=ticket, sender=self.owner, body="still broken")
+        ticket.refresh_from_db()
+        self.assertTrue(ticket.waiting_on_support)
+        self.assertEqual(ticket.priority_at, ticket.created_at - timedelta(hours=12))
+
+    def test_rebuild_matches_write_paths(self):
+        expected = list(Ticket.objects.order_by("id").values_list("waiting_on_support", "priority_at"))
+        Ticket.objects.update(waiting_on_support=False, priority_at=timezone.now())
+        rebuild_queue_priority()
+        self.assertEqual(list(Ticket.objects.order_by("id").values_list("waiting_on_support", "priority_at")), expected)
+
+    def test_queue_is_support_only_and_validates_status(self):
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get("/api/tickets/support/queue/").status_code, 403)
+        self.client.force_authenticate(user=self.support)
+        self.assertEqual(self.client.get("/api/tickets/support/queue/", {"status": "closed"}).status_code, 400)
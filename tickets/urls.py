@@ -2,16 +2,24 @@ from django.urls import path
 from .views import (
     TicketListCreateAPIView,
     TicketSupportListAPIView,
+    TicketSupportQueueAPIView,
     TicketSupportReplyAPIView,
-    TicketDetailAPIView
+    TicketDetailAPIView,
+    TicketMessageListAPIView,
+    TicketStreamTokenAPIView,
+    ticket_stream,
 )
 
 urlpatterns = [
     # User endpoints - users can create tickets and see their own tickets
     path('tickets/', TicketListCreateAPIView.as_view(), name='ticket-list-create'),
     path('tickets/<int:pk>/', TicketDetailAPIView.as_view(), name='ticket-detail'),
+    path('tickets/<int:pk>/messages/', TicketMessageListAPIView.as_view(), name='ticket-messages'),
+    path('tickets/<int:pk>/stream/', ticket_stream, name='ticket-stream'),
+    path('tickets/<int:pk>/stream-token/', TicketStreamTokenAPIView.as_view(), name='ticket-stream-token'),
     
     # Support endpoints - only support users can see all tickets and reply
     path('tickets/support/', TicketSupportListAPIView.as_view(), name='ticket-support-list'),
+    path('tickets/support/queue/', TicketSupportQueueAPIView.as_view(), name='ticket-support-queue'),
     path('tickets/<int:ticket_id>/reply/', TicketSupportReplyAPIView.as_view(), name='ticket-support-reply'),
 ]
\ No newline at end of file
@@ -1,4 +1,12 @@
-from .models import Ticket
+from datetime import timedelta
+
+from django.db.models import BigIntegerField, Case, Count, DurationField, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import Exact
+
+from .models import OPEN_BOOST, WAITING_BOOST, Ticket, TicketMessage
+
+QUEUE_STATUSES = (Ticket.Status.OPEN, Ticket.Status.PENDING)
 
 def is_ticket_open(ticket):
     return ticket.status == Ticket.Status.OPEN
@@ -8,3 +16,32 @@ def is_ticket_closed(ticket):
 
 def is_ticket_pending(ticket):
     return ticket.status == Ticket.Status.PENDING
+
+
+def rebuild_queue_priority():
+    """
+    Recompute Ticket.waiting_on_support (no messages yet, or the customer
+    wrote last) and Ticket.priority_at, for data loaded outside the normal
+    write paths (imports, seeding, queryset.update()).
+    """
+    last_sender = TicketMessage.objects.filter(ticket=OuterRef("pk")).order_by("-created_at", "-id").values("sender_id")[:1]
+    Ticket.objects.update(waiting_on_support=Case(
+        When(Exact(Coalesce(Subquery(last_sender), F("user_id"), output_field=BigIntegerField()), F("user_id")), then=Value(True)),
+        default=Value(False),
+    ))
+    boost = Case(
+        When(status=Ticket.Status.OPEN, then=Value(OPEN_BOOST)),
+        default=Value(timedelta(0)),
+        output_field=DurationField(),
+    )
+    waiting_boost = Case(
+        When(waiting_on_support=True, then=Value(WAITING_BOOST)),
+        default=Value(timedelta(0)),
+        output_field=DurationField(),
+    )
+    Ticket.objects.update(priority_at=F("created_at") - boost - waiting_boost)
+
+
+def ticket_status_counts():
+    counts = dict(Ticket.objects.order_by().values_list("status").annotate(total=Count("id")))
+    return {status: counts.get(status, 0) for status in Ticket.Status.values}
@@ -1,16 +1,36 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
 from rest_framework.generics import ListAPIView, CreateAPIView, RetrieveAPIView
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from rest_framework.exceptions import AuthenticationFailed, PermissionDenied, ValidationError
+from rest_framework_simplejwt.exceptions import InvalidToken
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.contrib.auth import get_user_model
 from rest_framework import status
 from django.shortcuts import get_object_or_404
 from .models import Ticket, TicketMessage
 from .serializer import (
+    LATEST_MESSAGES,
     TicketListSerializer, 
     TicketDetailSerializer, 
     TicketCreateSerializer, 
+    TicketMessageSerializer,
+    TicketQueueSerializer,
     TicketReplySerializer
 )
+from .pagination import SupportQueuePagination
+from .utils import QUEUE_STATUSES, ticket_status_counts
+from .streams import (
+    HEARTBEAT_SECONDS, OVERFLOW, STREAM_TOKEN_SECONDS, broker, make_stream_token, message_event, read_stream_token,
+)
+from user.authentication import CachedJWTAuthentication
+from user.models import Role
 from user.permissions import IsSupportUser
+from user.utils import has_role
 
 
 class TicketListCreateAPIView(ListAPIView, CreateAPIView):
@@ -23,7 +43,7 @@ class TicketListCreateAPIView(ListAPIView, CreateAPIView):
     
     def get_queryset(self):
         # Users can only see their own tickets
-        return Ticket.objects.filter(user=self.request.user).order_by('-created_at')
+        return Ticket.objects.filter(user=self.request.user).select_related('user', 'ad').order_by('-created_at')
     
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -35,7 +55,32 @@ class TicketSupportListAPIView(ListAPIView):
     """
     permission_classes = [IsAuthenticated, IsSupportUser]
     serializer_class = TicketListSerializer
-    queryset = Ticket.objects.all().order_by('-created_at')
+    queryset = Ticket.objects.select_related('user', 'ad').order_by('-created_at')
+
+
+class TicketSupportQueueAPIView(ListAPIView):
+    """
+    Open and pending tickets for support, most urgent first (see
+    Ticket.priority_at), with cursor pagination and per-status counts.
+    ``?status=open`` or ``?status=pending`` narrows the queue.
+    """
+    permission_classes = [IsAuthenticated, IsSupportUser]
+    serializer_class = TicketQueueSerializer
+    pagination_class = SupportQueuePagination
+
+    def get_queryset(self):
+        statuses = QUEUE_STATUSES
+        requested = self.request.query_params.get('status')
+        if requested:
+            if requested not in QUEUE_STATUSES:
+                raise ValidationError({'status': f'Must be one of: {", ".join(QUEUE_STATUSES)}.'})
+            statuses = [requested]
+        return Ticket.objects.filter(status__in=statuses).select_related('user', 'ad')
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        response.data['counts'] = ticket_status_counts()
+        return response
 
 
 class TicketSupportReplyAPIView(CreateAPIView):
@@ -63,4 +108,165 @@ class TicketDetailAPIView(RetrieveAPIView):
     
     def get_queryset(self):
         # Users can only see their own tickets
-        return Ticket.objects.filter(user=self.request.user)
\ No newline at end of file
+        latest = TicketMessage.objects.select_related("sender").order_by("-created_at", "-id")[:LATEST_MESSAGES + 1]
+        return (
+            Ticket.objects.filter(user=self.request.user)
+            .select_related("user", "ad")
+            .prefetch_related(Prefetch("messages", queryset=latest, to_attr="latest_messages"))
+        )
+
+
+class TicketMessageListAPIView(ListAPIView):
+    """
+    A page of a ticket's messages, oldest first, for its owner and support
+    users. ``?after=<id>`` returns newer messages, ``?before=<id>`` older ones.
+    """
+    permission_classes = [IsAuthenticated]
+    serializer_class = TicketMessageSerializer
+    default_limit = 50
+    max_limit = 200
+
+    def list(self, request, *args, **kwargs):
+        try:
+            limit = int(request.query_params.get("limit", self.default_limit))
+            after = int(request.query_params.get("after", 0))
+            before = int(request.query_params.get("before", 0))
+        except ValueError:
+            return Response({"detail": "limit, after and before must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({"detail": "limit must be positive."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.max_limit)
+        pivot_id = before or after
+
+        # The pivot message's created_at is read with the ticket.
+        tickets = Ticket.objects.only("id", "user_id")
+        if pivot_id:
+            tickets = tickets.annotate(pivot_at=Subquery(
+                TicketMessage.objects.filter(pk=pivot_id, ticket_id=OuterRef("pk")).values("created_at")
+            ))
+        ticket = get_object_or_404(tickets, pk=self.kwargs["pk"])
+        if not can_view_ticket(request.user, ticket):
+            raise PermissionDenied("You do not have access to this ticket.")
+        if pivot_id and ticket.pivot_at is None:
+            return Response(
+                {"detail": "after and before must be ids of this ticket's messages."}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        messages = TicketMessage.objects.filter(ticket_id=ticket.id).select_related("sender")
+        if before:
+            messages = messages.filter(self.seek(ticket.pivot_at, before, "lt")).order_by("-created_at", "-id")
+        else:
+            if after:
+                messages = messages.filter(self.seek(ticket.pivot_at, after, "gt"))
+            messages = messages.order_by("created_at", "id")
+
+        page = list(messages[:limit + 1])
+        has_more = len(page) > limit
+        page = page[:limit]
+        if before:
+            page.reverse()
+        return Response({"results": self.get_serializer(page, many=True).data, "has_more": has_more})
+
+    def seek(self, created_at, message_id, lookup):
+        # (created_at, id) beyond the pivot message; the leading bound keeps
+        # the filter a range on the (ticket, created_at, id) index.
+        return Q(**{f"created_at__{lookup}e": created_at}) & (
+            Q(**{f"created_at__{lookup}": created_at}) | Q(created_at=created_at, **{f"id__{lookup}": message_id})
+        )
+
+
+class TicketStreamTokenAPIView(APIView):
+    """
+    A short-lived token opening this ticket's stream, for EventSource
+    clients: they cannot send headers, so it goes in ``?token=``.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        ticket = get_object_or_404(Ticket.objects.only("id", "user_id"), pk=pk)
+        if not can_view_ticket(request.user, ticket):
+            raise PermissionDenied("You do not have permission to view this ticket.")
+        return Response({"token": make_stream_token(request.user.id, ticket.id), "expires_in": STREAM_TOKEN_SECONDS})
+
+
+def authenticate_stream(request, ticket_id):
+    """
+    JWT from the Authorization header, or a stream token for this ticket
+    from ?token=. Access tokens are never accepted in the URL.
+    """
+    if "token" in request.GET:
+        user_id = read_stream_token(request.GET["token"], ticket_id)
+        if user_id is None:
+            return None
+        return get_user_model().objects.filter(pk=user_id, is_active=True).first()
+    auth = CachedJWTAuthentication()
+    try:
+        result = auth.authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return result[0] if result else None
+
+
+def can_view_ticket(user, ticket):
+    return ticket.user_id == user.id or has_role(user, Role.Names.SUPPORT)
+
+
+async def ticket_message_events(ticket_id, last_id):
+    subscriber = broker.subscribe(ticket_id)
+    _, queue = subscriber
+    try:
+        yield "retry: 3000\n\n"
+        # Subscribed before catching up, so nothing saved in between is lost.
+        if last_id is None:
+            last_id = 0
+        else:
+            backlog = await sync_to_async(list)(
+                TicketMessage.objects.filter(ticket_id=ticket_id, id__gt=last_id).select_related("sender").order_by("id")
+            )
+            for message in backlog:
+                last_id, frame = message_event(message)
+                yield frame
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            if event is OVERFLOW:
+                return
+            message_id, frame = event
+            if message_id > last_id:
+                last_id = message_id
+                yield frame
+    finally:
+        broker.unsubscribe(ticket_id, subscriber)
+
+
+async def ticket_stream(request, pk):
+    """
+    Server-Sent Events stream of new messages on a ticket, for its owner and
+    support users. Pass Last-Event-ID (or ?last_event_id=) to first replay
+    messages after that id. Idle streams cost no queries; serve via ASGI.
+    """
+    user = await sync_to_async(authenticate_stream)(request, pk)
+    if user is None:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    ticket = await Ticket.objects.filter(pk=pk).only("id", "user_id").afirst()
+    if ticket is None:
+        return JsonResponse({"detail": "Not found."}, status=404)
+    if not await sync_to_async(can_view_ticket)(user, ticket):
+        return JsonResponse({"detail": "You do not have permission to perform this action."}, status=403)
+
+    # Without a last seen id the stream starts with new messages only.
+    last_id = request.headers.get("Last-Event-ID", request.GET.get("last_event_id"))
+    try:
+        last_id = int(last_id) if last_id is not None else None
+    except ValueError:
+        last_id = None
+
+    return StreamingHttpResponse(
+        ticket_message_events(ticket.id, last_id),
+        content_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -5,4 +5,5 @@ class UserConfig(AppConfig):
     name = "user"
 
     def ready(self):
+        import user.checks
         import user.signals
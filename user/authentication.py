@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import AUTH_USER_TIMEOUT, auth_user_key
+from .utils import get_role_names
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that keeps the resolved user, roles included, in the
+    cache under the user's id and auth version (see user.cache), so a warm
+    request authenticates without queries. Saving or deleting the user, or
+    changing its roles, bumps the version. Workers must share the cache
+    (see user.checks), or bumps made by one are unseen by the others.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        # The key is fixed before the database is read, so an entry is never
+        # older than its version.
+        key = auth_user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            get_role_names(user)
+            cache.set(key, user, AUTH_USER_TIMEOUT)
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = "user.authentication.CachedJWTAuthentication"
@@ -0,0 +1,72 @@
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Bounds staleness for changes the signals can't see, e.g. QuerySet.update().
+AUTH_USER_TIMEOUT = 300
+PERFORMER_PROFILE_TIMEOUT = 300
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_versions(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Key evicted: a fresh, never-used value orphans the old entries.
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+def auth_version_key(user_id):
+    return f"user:auth:version:{user_id}"
+
+
+def get_auth_version(user_id):
+    return _get_version(auth_version_key(user_id))
+
+
+def auth_user_key(user_id):
+    return f"user:auth:{user_id}:v{get_auth_version(user_id)}"
+
+
+def _bump(user_ids):
+    _bump_versions(auth_version_key(user_id) for user_id in user_ids)
+
+
+def invalidate_auth_users(user_ids):
+    """
+    Drop the cached authenticated users once the current transaction
+    commits, so a concurrent request can't cache pre-commit rows under the
+    new version.
+    """
+    user_ids = list(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: _bump(user_ids))
+
+
+def performer_profile_version_key(user_id):
+    return f"user:performer:version:{user_id}"
+
+
+def performer_profile_key(user_id, request):
+    # Links in the payload are absolute, so scheme and host are part of the key.
+    version = _get_version(performer_profile_version_key(user_id))
+    return f"user:performer:{user_id}:v{version}:{request.scheme}://{request.get_host()}"
+
+
+def invalidate_performer_profiles(user_ids):
+    """
+    Drop the cached profiles of these performers once the current
+    transaction commits, e.g. after a new comment or a completed ad.
+    """
+    keys = [performer_profile_version_key(user_id) for user_id in user_ids]
+    if keys:
+        transaction.on_commit(lambda: _bump_versions(keys))
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.filebased.FileBasedCache',
+}
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Cached users and profiles are invalidated by bumping version keys in
+    the default cache. With a cache private to each process, a worker keeps
+    serving a deactivated user or revoked role until AUTH_USER_TIMEOUT.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend in PROCESS_LOCAL_CACHES:
+        return [Error(
+            f"The default cache ({backend}) is not shared between worker processes.",
+            hint="Set REDIS_URL so authentication and profile invalidations reach every worker.",
+            id='user.E001',
+        )]
+    return []
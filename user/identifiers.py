@@ -0,0 +1,55 @@
+import re
+
+# Persian and Arabic-Indic digits, as typed on Persian keyboards
+DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "0123456789" * 2)
+PHONE_SEPARATORS = re.compile(r"[\s\-().]")
+PHONE_NUMBER = re.compile(r"\+?[0-9]+")
+
+
+def normalize_username(value):
+    value = (value or "").strip().lower()
+    return value or None
+
+
+def normalize_email(value):
+    value = (value or "").strip().lower()
+    return value or None
+
+
+def normalize_phone(value):
+    """
+    ``value`` as a local number with ASCII digits and no separators, so
+    "+98 912 000 0000", "00989120000000" and "۰۹۱۲۰۰۰۰۰۰۰" all become
+    "09120000000". None when ``value`` is not a phone number.
+    """
+    value = PHONE_SEPARATORS.sub("", (value or "").translate(DIGITS))
+    if not PHONE_NUMBER.fullmatch(value):
+        return None
+    value = value.lstrip("+")
+    if value.startswith("0098"):
+        value = "0" + value[4:]
+    elif value.startswith("98") and len(value) == 12:
+        value = "0" + value[2:]
+    elif value.startswith("9") and len(value) == 10:
+        value = "0" + value
+    return value
+
+
+def login_lookups(identifier):
+    """
+    ``(field, value)`` probes for a login identifier, most likely first.
+    The identifier's shape picks one canonical column; since usernames may
+    also contain "@" or only digits, the username column is the fallback.
+    """
+    username = normalize_username(identifier)
+    if username is None:
+        return []
+    lookups = []
+    if "@" in username:
+        lookups.append(("email_key", normalize_email(identifier)))
+    else:
+        phone = normalize_phone(identifier)
+        if phone:
+            lookups.append(("phone_key", phone))
+    lookups.append(("username_key", username))
+    return lookups
@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from rest_framework.test import APIRequestFactory
+
+from ad.management.commands.seed_marketplace import SEED_PASSWORD
+from user.utils import get_login_user
+from user.views import UserLoginAPIView
+
+User = get_user_model()
+
+# ASCII digits to Persian ones, as typed on Persian keyboards
+PERSIAN_DIGITS = str.maketrans("0123456789", "۰۱۲۳۴۵۶۷۸۹")
+
+
+def legacy_lookup(identifier):
+    """The three-way case-insensitive OR that login used before the key columns."""
+    return User.objects.filter(
+        Q(username__iexact=identifier) | Q(email__iexact=identifier) | Q(phone_number__iexact=identifier)
+    ).first()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare login identifier lookups through the canonical key columns with the old "
+        "case-insensitive OR scan, on a table of seeded users."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000, help="Seed users up to this many first.")
+        parser.add_argument("--lookups", type=int, default=200, help="Lookups per identifier kind.")
+        parser.add_argument("--logins", type=int, default=20, help="Full login requests, password check included.")
+        parser.add_argument("--chunk", type=int, default=100_000, help="Users seeded per transaction.")
+        parser.add_argument("--prefix", default="seed")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        rng = random.Random(options["seed"])
+        total = self.ensure_users(prefix, options["users"], options["chunk"])
+        self.stdout.write(f"users with prefix {prefix!r}: {total}")
+
+        # Seeded users are numbered, so identifiers come without a query;
+        # they are mangled the way people type them.
+        picks = [rng.randrange(total) for _ in range(max(options["lookups"], 1))]
+        kinds = {
+            "username": [f"{prefix}{i}".upper() for i in picks],
+            "email": [f"{prefix}{i}@Example.com" for i in picks],
+            "phone": [f"+98 912 {i:07d}".translate(PERSIAN_DIGITS) for i in picks],
+        }
+        for kind, identifiers in kinds.items():
+            self.report(f"{kind} keyed", self.time(get_login_user, identifiers))
+            # The OR scan never understood Persian digits or +98
+            legacy = identifiers if kind != "phone" else [f"0912{i:07d}" for i in picks]
+            self.report(f"{kind} legacy", self.time(legacy_lookup, legacy))
+
+        view = UserLoginAPIView.as_view()
+        factory = APIRequestFactory()
+
+        def login(identifier):
+            response = view(factory.post("/api/users/login/", {"identifier": identifier, "password": SEED_PASSWORD}))
+            return response.status_code == 200
+
+        self.report("login request", self.time(login, kinds["email"][:max(options["logins"], 1)]))
+
+    def ensure_users(self, prefix, target, chunk):
+        existing = User.objects.filter(username__startswith=prefix).count()
+        while existing < target:
+            count = min(chunk, target - existing)
+            call_command(
+                "seed_marketplace", users=count, support_users=0, ads=0, tickets=0,
+                prefix=prefix, stdout=self.stdout,
+            )
+            existing += count
+        return existing
+
+    def time(self, lookup, identifiers):
+        timings, found = [], 0
+        for identifier in identifiers:
+            start = time.perf_counter()
+            found += bool(lookup(identifier))
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, found
+
+    def report(self, label, result):
+        timings, found = result
+        timings = sorted(timings)
+        p95 = timings[max(int(len(timings) * 0.95) - 1, 0)]
+        self.stdout.write(
+            f"{label:<15} mean={statistics.mean(timings):.3f}ms "
+            f"p50={statistics.median(timings):.3f}ms p95={p95:.3f}ms found={found}/{len(timings)}"
+        )
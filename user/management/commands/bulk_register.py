@@ -0,0 +1,78 @@
+import csv
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from user.models import User
+from user.services import build_user, get_customer_role_id, onboard_users
+
+FIELDS = ["username", "email", "phone_number", "first_name", "last_name"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Register customers from a CSV file (columns: username, and optionally email, phone_number, "
+        "first_name, last_name, password) with bulk inserts for users, profiles and role links."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file with a header row; '-' reads stdin.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--threads", type=int, default=4, help="Threads hashing passwords.")
+        parser.add_argument("--password", help="Password for rows without one; otherwise they get an unusable one.")
+
+    def handle(self, *args, **options):
+        rows = self.read_rows(options["path"])
+        get_customer_role_id()
+        batch_size = max(options["batch_size"], 1)
+        created = skipped = 0
+
+        with ThreadPoolExecutor(max_workers=max(options["threads"], 1)) as executor:
+            for start in range(0, len(rows), batch_size):
+                # hashlib releases the GIL, so hashing scales with threads.
+                users = list(executor.map(
+                    lambda row: build_user(row.get("password") or options["password"], **self.fields(row)),
+                    rows[start:start + batch_size],
+                ))
+                users, dropped = self.drop_taken(users)
+                with transaction.atomic():
+                    users = User.objects.bulk_create(users)
+                    onboard_users(users)
+                created += len(users)
+                skipped += dropped
+
+        self.stdout.write(self.style.SUCCESS(f"Registered {created} users, skipped {skipped} rows with a blank or taken identifier."))
+
+    def read_rows(self, path):
+        try:
+            handle = open(path, newline="", encoding="utf-8") if path != "-" else sys.stdin
+        except OSError as exc:
+            raise CommandError(exc)
+        with handle:
+            reader = csv.DictReader(handle)
+            if "username" not in (reader.fieldnames or []):
+                raise CommandError("The CSV needs a username column.")
+            return list(reader)
+
+    def fields(self, row):
+        return {field: (row.get(field) or "").strip() for field in FIELDS}
+
+    def drop_taken(self, users):
+        """Users with a username whose canonical identifiers are free, in the table and in this batch."""
+        keys = {key: set() for key, _ in User.LOGIN_KEYS.values()}
+        for key in keys:
+            values = [getattr(user, key) for user in users if getattr(user, key)]
+            keys[key] = set(User.objects.filter(**{f"{key}__in": values}).values_list(key, flat=True))
+
+        kept = []
+        for user in users:
+            values = {key: getattr(user, key) for key in keys}
+            if not user.username or any(value and value in keys[key] for key, value in values.items()):
+                continue
+            for key, value in values.items():
+                if value:
+                    keys[key].add(value)
+            kept.append(user)
+        return kept, len(users) - len(kept)
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 11:17
+
+from django.db import migrations, models
+
+from user.identifiers import normalize_email, normalize_phone, normalize_username
+
+
+def fill_login_keys(apps, schema_editor):
+    User = apps.get_model('user', 'User')
+    taken = {'username_key': set(), 'email_key': set(), 'phone_key': set()}
+    # The oldest account keeps an identifier shared by several; the others
+    # can still log in with their username.
+    for user in User.objects.only('id', 'username', 'email', 'phone_number').order_by('id').iterator():
+        keys = {
+            'username_key': normalize_username(user.username),
+            'email_key': normalize_email(user.email),
+            'phone_key': normalize_phone(user.phone_number),
+        }
+        for field, value in keys.items():
+            if value in taken[field]:
+                keys[field] = None
+            else:
+                taken[field].add(value)
+        User.objects.filter(pk=user.pk).update(**keys)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0008_remove_profile_ads_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_key',
+            field=models.CharField(editable=False, max_length=254, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='phone_key',
+            field=models.CharField(editable=False, max_length=20, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='username_key',
+            field=models.CharField(editable=False, max_length=150, null=True, unique=True),
+        ),
+        migrations.RunPython(fill_login_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-18 11:57
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_counts(apps, schema_editor):
+    Profile = apps.get_model('user', 'Profile')
+    Comment = apps.get_model('comment', 'Comment')
+
+    written = Comment.objects.filter(user_id=OuterRef('user_id')).order_by().values('user_id').annotate(count=Count('id'))
+    Profile.objects.update(comment_count=Coalesce(Subquery(written.values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ad', '0020_ad_ad_creator_date_idx'),
+        ('comment', '0008_comment_comment_performer_created_idx'),
+        ('user', '0009_user_login_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات'),
+        ),
+        migrations.RunPython(fill_comment_counts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='profile',
+            index=models.Index(fields=['-average_rating', '-comment_count', '-id'], name='profile_reputation_idx'),
+        ),
+    ]
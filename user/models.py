@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from comment.models import Comment
+from .identifiers import normalize_email, normalize_phone, normalize_username
 
 
 class Role(models.Model):
@@ -29,6 +30,18 @@ class User(AbstractUser):
         verbose_name='نقش‌ها',
     )
     phone_number = models.CharField(max_length=20, null=False)
+    # Canonical forms of the login identifiers (see user.identifiers), each
+    # behind a unique index so login probes exactly one of them.
+    username_key = models.CharField(max_length=150, unique=True, null=True, editable=False)
+    email_key = models.CharField(max_length=254, unique=True, null=True, editable=False)
+    phone_key = models.CharField(max_length=20, unique=True, null=True, editable=False)
+
+    LOGIN_KEYS = {
+        'username': ('username_key', normalize_username),
+        'email': ('email_key', normalize_email),
+        'phone_number': ('phone_key', normalize_phone),
+    }
+
     class Meta:
         verbose_name = 'کاربر'
         verbose_name_plural = 'کاربران'
@@ -36,12 +49,56 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        user._login_sources = user.get_login_sources()
+        return user
+
+    def get_login_sources(self):
+        # Deferred fields are left out: they cannot have been changed.
+        loaded = self.__dict__
+        return {source: loaded[source] for source in self.LOGIN_KEYS if source in loaded}
+
+    def set_login_keys(self, sources=None):
+        for source, (key, normalize) in self.LOGIN_KEYS.items():
+            if sources is None or source in sources:
+                setattr(self, key, normalize(getattr(self, source)))
+
+    def save(self, *args, **kwargs):
+        # Only keys whose source changed are recomputed: accounts migrated
+        # in 0009 may have a key left NULL because another account already
+        # held that identifier, and must stay saveable.
+        saved = getattr(self, '_login_sources', None)
+        if self._state.adding or saved is None:
+            changed = set(self.LOGIN_KEYS)
+        else:
+            changed = {
+                source for source, value in self.get_login_sources().items() if saved.get(source, value) != value
+            }
+        self.set_login_keys(changed)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                key for source, (key, _) in self.LOGIN_KEYS.items() if source in update_fields and source in changed
+            }
+        super().save(*args, **kwargs)
+        self._login_sources = self.get_login_sources()
+
 
 class Profile(models.Model):
     user = models.OneToOneField('user.User', on_delete=models.CASCADE, related_name='profile')
     average_rating = models.FloatField(default=0.0, verbose_name='میانگین امتیاز')
+    # Comments written by the user, maintained by comment.services
+    comment_count = models.PositiveIntegerField(default=0, verbose_name='تعداد نظرات')
     ads = models.ManyToManyField('ad.Ad', blank=True, related_name='profiles', verbose_name='آگهی‌ها')
     comments = models.ManyToManyField(Comment, blank=True, related_name='profiles', verbose_name='نظرات')
 
+    class Meta:
+        indexes = [
+            # The customer reputation filter's order and range; see user.pagination
+            models.Index(fields=['-average_rating', '-comment_count', '-id'], name='profile_reputation_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
@@ -0,0 +1,21 @@
+from ad.pagination import KeysetPagination
+
+
+class CustomerAdsPagination(KeysetPagination):
+    ordering = ("-date_added", "-id")
+    page_size = 10
+
+
+class CustomerCommentsPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 10
+
+
+class PerformerReviewsPagination(KeysetPagination):
+    ordering = ("-created_at", "-id")
+    page_size = 10
+
+
+class CustomerReputationPagination(KeysetPagination):
+    # Matches Profile's profile_reputation_idx
+    ordering = ("-average_rating", "-comment_count", "-id")
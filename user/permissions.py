@@ -1,15 +1,16 @@
 from rest_framework import permissions
-from .models import User
+from .models import User, Role
+from .utils import has_role
 from ad.models import Ad
 
 class IsAdminUser(permissions.BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and request.user.is_authenticated and request.user.roles.filter(name='admin').exists())
+        return bool(request.user and request.user.is_authenticated and has_role(request.user, Role.Names.ADMIN))
     
 
 class IsPerformer(permissions.BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and request.user.is_authenticated and request.user.roles.filter(name='performer').exists())
+        return bool(request.user and request.user.is_authenticated and has_role(request.user, Role.Names.PERFORMER))
 
     
 class IsAdOwner(permissions.BasePermission):
@@ -26,11 +27,11 @@ class IsAdPerformer(permissions.BasePermission):
 
 class IsSupportUser(permissions.BasePermission):
     def has_permission(self, request, view):
-        return bool(request.user and request.user.is_authenticated and request.user.roles.filter(name='support').exists())
+        return bool(request.user and request.user.is_authenticated and has_role(request.user, Role.Names.SUPPORT))
     
 class IsCustomer(permissions.BasePermission):
     def has_permission(self, request, view):
-        result = bool(request.user and request.user.is_authenticated and request.user.roles.filter(name='customer').exists())
+        result = bool(request.user and request.user.is_authenticated and has_role(request.user, Role.Names.CUSTOMER))
         return result
     
     
@@ -1,9 +1,16 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.urls import reverse
 from rest_framework import serializers
-from django.db.models import Q
 from rest_framework_simplejwt.tokens import RefreshToken
+from ad.serializer import AdReadSerializer
+from ad.utils import select_for_serializer
+from comment.serializer import CommentListSerializer
+from .identifiers import normalize_email, normalize_phone, normalize_username
 from .models import Profile
+from .pagination import CustomerAdsPagination, CustomerCommentsPagination, PerformerReviewsPagination
+from .services import register_user
+from .utils import customer_ads, customer_comments, get_login_user, performer_reviews
 
 
 User = get_user_model()
@@ -20,11 +27,15 @@ class UserReadSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'roles', 'first_name', 'last_name', 'phone_number']
 
 class CustomerCardSerializer(serializers.ModelSerializer):
-    avg_rating = serializers.FloatField(read_only=True)
+    id = serializers.IntegerField(source="user_id", read_only=True)
+    username = serializers.CharField(source="user.username", read_only=True)
+    avg_rating = serializers.FloatField(source="average_rating", read_only=True)
+    # Comments the customer wrote. Before Profile.comment_count this counted
+    # the Profile.comments relation, which nothing fills, so it was always 0.
     comment_count = serializers.IntegerField(read_only=True)
 
     class Meta:
-        model = User
+        model = Profile
         fields = [
             "id",
             "username",
@@ -32,7 +43,36 @@ class CustomerCardSerializer(serializers.ModelSerializer):
             "comment_count",
         ]
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class LoginKeyValidationMixin:
+    """
+    Rejects a username, email or phone number whose canonical form (see
+    User.LOGIN_KEYS) already belongs to another user.
+    """
+
+    def check_login_key(self, key, value, message):
+        if not value:
+            return value
+        others = User.objects.filter(**{key: value})
+        if self.instance is not None:
+            others = others.exclude(pk=self.instance.pk)
+        if others.exists():
+            raise serializers.ValidationError(message)
+        return value
+
+    def validate_username(self, value):
+        self.check_login_key("username_key", normalize_username(value), "A user with that username already exists.")
+        return value
+
+    def validate_email(self, value):
+        self.check_login_key("email_key", normalize_email(value), "A user with that email already exists.")
+        return value
+
+    def validate_phone_number(self, value):
+        self.check_login_key("phone_key", normalize_phone(value), "A user with that phone number already exists.")
+        return value
+
+
+class UserCreateSerializer(LoginKeyValidationMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True)
 
     class Meta:
@@ -44,10 +84,11 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return value
 
     def create(self, validated_data):
-        return User.objects.create_user(**validated_data)
+        user, self.token = register_user(**validated_data)
+        return user
 
 
-class UserUpdateDeleteSerializer(serializers.ModelSerializer):
+class UserUpdateDeleteSerializer(LoginKeyValidationMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ['username', 'email', 'first_name', 'last_name', 'phone_number']
@@ -60,11 +101,7 @@ class LoginSerializer(serializers.Serializer):
         identifier = attrs.get("identifier", "").strip()
         password = attrs.get("password", "")
 
-        user = User.objects.filter(
-            Q(username__iexact=identifier) |
-            Q(email__iexact=identifier) |
-            Q(phone_number__iexact=identifier)
-        ).first()
+        user = get_login_user(identifier)
 
         if user is None or not user.check_password(password):
             raise serializers.ValidationError({"detail": "Invalid credentials."})
@@ -81,30 +118,71 @@ class LoginSerializer(serializers.Serializer):
         }
 
 
-class PerformerProfileSerializer(serializers.ModelSerializer):
+class SectionsMixin:
+    def get_section(self, paginator, queryset, serializer_class, url_name, obj):
+        """First page of ``queryset``; ``next`` continues on ``url_name``."""
+        url = reverse(url_name, kwargs={"user_id": obj.user_id})
+        queryset = select_for_serializer(queryset, serializer_class)
+        page = paginator.first_page(queryset, self.context["request"], url)
+        return {
+            "next": paginator.get_next_link(),
+            "results": serializer_class(page, many=True, context=self.context).data,
+        }
+
+
+class PerformerProfileSerializer(SectionsMixin, serializers.ModelSerializer):
+    """
+    Rating and counters as annotated by PerformerProfileAPIView, plus the
+    first page of the newest reviews.
+    """
+    user_id = serializers.IntegerField(read_only=True)
+    username = serializers.CharField(source='user.username', read_only=True)
+    first_name = serializers.CharField(source='user.first_name', read_only=True)
+    last_name = serializers.CharField(source='user.last_name', read_only=True)
+    # Comments received; Profile.comment_count counts those written
+    comment_count = serializers.IntegerField(source='rating_count', read_only=True)
     completed_ads = serializers.IntegerField(read_only=True)
+    reviews = serializers.SerializerMethodField()
+
     class Meta:
         model = Profile
-        fields = ['id', 'average_rating', 'completed_ads', 'comments']
-        read_only_fields = ['average_rating', 'completed_ads', 'comments']
-
-class CustomerProfileSerializer(serializers.ModelSerializer):
+        fields = [
+            'id', 'user_id', 'username', 'first_name', 'last_name',
+            'average_rating', 'comment_count', 'completed_ads', 'reviews',
+        ]
+        read_only_fields = ['average_rating']
+
+    def get_reviews(self, obj):
+        return self.get_section(
+            PerformerReviewsPagination(), performer_reviews(obj.user_id), CommentListSerializer,
+            "performer-profile-reviews", obj,
+        )
+
+class CustomerProfileSerializer(SectionsMixin, serializers.ModelSerializer):
+    """
+    Counts plus the first page of the customer's ads and comments, one query
+    each; ``next`` continues on the section's own endpoint. The counts are
+    annotated by CustomerProfileAPIView.
+    """
     name = serializers.CharField(source='user.username', read_only=True)
     last_name = serializers.CharField(source='user.last_name', read_only=True)
+    ads_count = serializers.IntegerField(read_only=True)
+    comments_count = serializers.IntegerField(read_only=True)
     ads = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
 
     class Meta:
         model = Profile
-        fields = ['name', 'last_name', 'ads', 'comments']
+        fields = ['name', 'last_name', 'ads_count', 'comments_count', 'ads', 'comments']
         read_only_fields = ['name', 'last_name']
 
     def get_ads(self, obj):
-        from ad.serializer import AdReadSerializer
-        ads = obj.user.ads_created.all()  # Assuming customer creates ads
-        return AdReadSerializer(ads, many=True, context=self.context).data
+        return self.get_section(
+            CustomerAdsPagination(), customer_ads(obj.user_id), AdReadSerializer, "customer-profile-ads", obj
+        )
 
     def get_comments(self, obj):
-        from comment.serializer import CommentListSerializer
-        comments = obj.user.comments_written.all()
-        return CommentListSerializer(comments, many=True, context=self.context).data
\ No newline at end of file
+        return self.get_section(
+            CustomerCommentsPagination(), customer_comments(obj.user_id), CommentListSerializer,
+            "customer-profile-comments", obj,
+        )
\ No newline at end of file
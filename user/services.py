@@ -0,0 +1,71 @@
+from django.db import connection, transaction
+from rest_framework.authtoken.models import Token
+
+from .models import Profile, Role, User
+from .utils import clear_role_cache
+
+_customer_role_id = None
+
+
+def get_customer_role_id():
+    """
+    Id of the customer role, created on first use. It is remembered once
+    read outside a transaction, i.e. once the row is known to be committed.
+    """
+    global _customer_role_id
+    if _customer_role_id is not None:
+        return _customer_role_id
+    role_id = Role.objects.get_or_create(name=Role.Names.CUSTOMER)[0].id
+    if not connection.in_atomic_block:
+        _customer_role_id = role_id
+    return role_id
+
+
+def clear_customer_role_id(**kwargs):
+    global _customer_role_id
+    _customer_role_id = None
+
+
+def onboard_users(users, batch_size=None):
+    """
+    Profiles and the customer role for newly created ``users``, as two bulk
+    inserts. The role links bypass m2m_changed; new users have nothing
+    cached to invalidate.
+    """
+    role_id = get_customer_role_id()
+    Profile.objects.bulk_create([Profile(user=user) for user in users], batch_size=batch_size)
+    User.roles.through.objects.bulk_create(
+        [User.roles.through(user_id=user.id, role_id=role_id) for user in users],
+        batch_size=batch_size,
+    )
+    for user in users:
+        clear_role_cache(user)
+
+
+def build_user(password=None, **fields):
+    """
+    An unsaved user with normalized fields and a hashed (or unusable)
+    password. Hash before opening a transaction: it is the slow part.
+    """
+    fields["username"] = User.normalize_username(fields["username"])
+    fields["email"] = User.objects.normalize_email(fields.get("email") or "")
+    user = User(**fields)
+    if password:
+        user.set_password(password)
+    else:
+        user.set_unusable_password()
+    user.set_login_keys()
+    return user
+
+
+def register_user(password, **fields):
+    """
+    Create a customer with its profile, role link and API token in one
+    transaction; the post_save signal onboards the user.
+    """
+    user = build_user(password, **fields)
+    get_customer_role_id()
+    with transaction.atomic():
+        user.save()
+        token = Token.objects.create(user=user)
+    return user, token
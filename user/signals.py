@@ -1,21 +1,45 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
 
-from .models import Profile, Role
+from .cache import invalidate_auth_users, invalidate_performer_profiles
+from .models import Role
+from .services import clear_customer_role_id, onboard_users
+from .utils import clear_role_cache
 
 User = get_user_model()
 
 
 @receiver(post_save, sender=User)
-def create_profile_and_default_role(sender, instance, created, **kwargs):
-    if not created:
-        return
-    print("Profile making")
-    print(instance)
-    Profile.objects.create(user=instance)
-    print(Profile.objects.filter(user=instance))
+def create_profile_and_default_role(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        onboard_users([instance])
 
 
-    role, _ = Role.objects.get_or_create(name=Role.Names.CUSTOMER)
-    instance.roles.add(role)
+# A flushed or deleted role table invalidates the remembered customer role id.
+post_migrate.connect(clear_customer_role_id)
+post_delete.connect(clear_customer_role_id, sender=Role)
+
+
+@receiver(m2m_changed, sender=User.roles.through)
+def reset_memoized_roles(sender, instance, action, pk_set, **kwargs):
+    if isinstance(instance, User):
+        clear_role_cache(instance)
+        if action.startswith("post_"):
+            invalidate_cached_users([instance.pk])
+    elif action == "pre_clear":
+        # role.users.clear(): the affected users are only known beforehand
+        invalidate_cached_users(list(instance.users.values_list("pk", flat=True)))
+    elif action in ("post_add", "post_remove"):
+        invalidate_cached_users(pk_set)
+
+
+def invalidate_cached_users(user_ids):
+    invalidate_auth_users(user_ids)
+    invalidate_performer_profiles(user_ids)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_auth_user(sender, instance, **kwargs):
+    invalidate_cached_users([instance.pk])
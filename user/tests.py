@@ -1,3 +1,450 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.checks import run_checks
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ad.models import Ad, AdRequest, Category
+from comment.models import Comment
+from tickets.models import Ticket
+from user import services
+from user.checks import check_shared_cache
+from user.models import Profile, Role
+from user.identifiers import normalize_phone
+from user.utils import get_login_user, get_role_names, is_performer, is_support
+
+
+User = get_user_model()
+
+
+class RoleMemoizationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.performer_role, _ = Role.objects.get_or_create(name=Role.Names.PERFORMER)
+        self.support_role, _ = Role.objects.get_or_create(name=Role.Names.SUPPORT)
+
+        self.creator = User.objects.create_user(username="creator", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(self.performer_role)
+        self.support = User.objects.create_user(username="support", password="pass12345")
+        self.support.roles.add(self.support_role)
+
+        self.category = Category.objects.create(name="cat")
+        self.ad = Ad.objects.create(
+            title="Test Ad", description="desc", category=self.category, creator=self.creator
+        )
+        self.ticket = Ticket.objects.create(title="help", user=self.support, ad=self.ad)
+
+    def role_queries(self, user, method, url, data=None):
+        # Fresh instance per call, like authentication gives every request
+        user = User.objects.get(pk=user.pk)
+        self.client.force_authenticate(user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            res = getattr(self.client, method)(url, data, format="json")
+        self.assertLess(res.status_code, 500, url)
+        return sum("user_user_roles" in query["sql"] for query in ctx.captured_queries)
+
+    def test_helpers_share_one_role_query(self):
+        user = User.objects.get(pk=self.performer.pk)
+        with self.assertNumQueries(1):
+            self.assertTrue(is_performer(user))
+            self.assertFalse(is_support(user))
+            self.assertIn(Role.Names.CUSTOMER, get_role_names(user))
+
+    def test_role_change_resets_memoized_roles(self):
+        user = User.objects.get(pk=self.creator.pk)
+        self.assertFalse(is_performer(user))
+
+        user.roles.add(self.performer_role)
+        self.assertTrue(is_performer(user))
+
+    def test_ad_and_ticket_endpoints_query_roles_at_most_once(self):
+        endpoints = [
+            (self.creator, "get", "/api/ads/"),
+            (self.creator, "post", "/api/ads/", {"title": "t", "description": "d", "category": self.category.id}),
+            (self.performer, "get", "/api/ads/open/"),
+            (self.performer, "get", "/api/ads/search/?q=Test"),
+            (self.creator, "get", f"/api/ads/{self.ad.id}/"),
+            (self.performer, "get", f"/api/ads/{self.ad.id}/requests/"),
+            (self.performer, "post", f"/api/ads/{self.ad.id}/requests/", {}),
+            (self.performer, "get", "/api/ads/requests/"),
+            (self.support, "get", "/api/tickets/"),
+            (self.support, "get", f"/api/tickets/{self.ticket.id}/"),
+            (self.support, "get", "/api/tickets/support/"),
+            (self.support, "post", f"/api/tickets/{self.ticket.id}/reply/", {"body": "on it"}),
+        ]
+        for user, method, url, *data in endpoints:
+            with self.subTest(method=method, url=url):
+                self.assertLessEqual(self.role_queries(user, method, url, *data), 1)
+
+    def test_support_reply_marks_ticket_pending(self):
+        self.client.force_authenticate(user=self.support)
+        res = self.client.post(f"/api/tickets/{self.ticket.id}/reply/", {"body": "on it"}, format="json")
+
+        self.assertEqual(res.status_code, 201)
+        self.ticket.refresh_from_db()
+        self.assertEqual(self.ticket.status, Ticket.Status.PENDING)
+
+
+class LoginIdentifierTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            username="Bob", email="Bob@Example.com", phone_number="0912 000 0001", password="pass12345"
+        )
+
+    def test_identifiers_are_canonicalized(self):
+        self.assertEqual(
+            (self.user.username_key, self.user.email_key, self.user.phone_key),
+            ("bob", "bob@example.com", "09120000001"),
+        )
+        for raw in ["+989120000001", "00989120000001", "۰۹۱۲-۰۰۰-۰۰۰۱", "9120000001"]:
+            self.assertEqual(normalize_phone(raw), "09120000001", raw)
+        self.assertIsNone(normalize_phone("bob"))
+
+        self.user.email = "new@example.com"
+        self.user.save(update_fields=["email"])
+        self.assertTrue(User.objects.filter(email_key="new@example.com").exists())
+
+    def test_legacy_duplicate_identifier_stays_saveable(self):
+        # As left by migration 0009: the newer account lost the shared email key.
+        legacy = User.objects.create_user(username="bobby", phone_number="0912 000 0002", password="pass12345")
+        User.objects.filter(pk=legacy.pk).update(email="bob@example.com", email_key=None)
+        legacy = User.objects.get(pk=legacy.pk)
+        legacy.first_name = "Bobby"
+        legacy.save()
+        legacy.last_login = timezone.now()
+        legacy.save(update_fields=["last_login"])
+        self.assertIsNone(User.objects.get(pk=legacy.pk).email_key)
+
+        legacy.email = "bobby@example.com"
+        legacy.save()
+        self.assertEqual(User.objects.get(pk=legacy.pk).email_key, "bobby@example.com")
+
+    def test_login_probes_one_key_per_identifier(self):
+        for identifier in ["BOB", "bob@EXAMPLE.com", "+98 ۹۱۲ ۰۰۰ ۰۰۰۱"]:
+            with self.subTest(identifier=identifier):
+                with self.assertNumQueries(1):
+                    self.assertEqual(get_login_user(identifier), self.user)
+                res = self.client.post("/api/users/login/", {"identifier": identifier, "password": "pass12345"})
+                self.assertEqual(res.status_code, 200)
+
+        # Usernames may look like phone numbers; the username key is the fallback.
+        digits = User.objects.create_user(username="09351234567", password="pass12345")
+        self.assertEqual(get_login_user("09351234567"), digits)
+        # Both keys probed in one query; the phone key still wins.
+        User.objects.create_user(username="09120000001", password="pass12345")
+        with self.assertNumQueries(1):
+            self.assertEqual(get_login_user("09120000001"), self.user)
+        self.assertIsNone(get_login_user("nobody"))
+
+    def test_register_rejects_taken_canonical_identifiers(self):
+        data = {"username": "alice", "email": "alice@example.com", "password": "A-strong-pass-123"}
+        for field, value in [("username", "BOB"), ("email", "BOB@example.COM"), ("phone_number", "+989120000001")]:
+            with self.subTest(field=field):
+                res = self.client.post("/api/users/register/", {**data, field: value})
+                self.assertEqual(res.status_code, 400)
+                self.assertIn(field, res.data)
+
+        res = self.client.post("/api/users/register/", {**data, "phone_number": "09120000002"})
+        self.assertEqual(res.status_code, 201)
+
+
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="cached", password="pass12345")
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def auth_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        return res.status_code, sum(
+            'FROM "user_user" ' in query["sql"] or 'JOIN "user_user_roles"' in query["sql"]
+            for query in ctx.captured_queries
+        )
+
+    def test_warm_requests_authenticate_without_queries(self):
+        self.assertEqual(self.auth_queries("/api/tickets/"), (200, 2))
+        self.assertEqual(self.auth_queries("/api/tickets/"), (200, 0))
+        self.assertEqual(self.auth_queries("/api/tickets/support/"), (403, 0))
+
+    def test_role_and_active_changes_invalidate_the_cached_user(self):
+        self.assertEqual(self.auth_queries("/api/tickets/support/")[0], 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Role.objects.get_or_create(name=Role.Names.SUPPORT)[0].users.add(self.user)
+        self.assertEqual(self.auth_queries("/api/tickets/support/")[0], 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save(update_fields=["is_active"])
+        self.assertEqual(self.auth_queries("/api/tickets/")[0], 401)
+
+    def test_deploy_check_requires_a_shared_cache(self):
+        local = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+        shared = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://cache"}}
+        with override_settings(CACHES=local):
+            self.assertEqual([error.id for error in check_shared_cache(None)], ["user.E001"])
+            self.assertIn("user.E001", [error.id for error in run_checks(include_deployment_checks=True)])
+        with override_settings(CACHES=shared):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class RegistrationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.customer_role = Role.objects.get_or_create(name=Role.Names.CUSTOMER)[0]
+
+    def test_register_inserts_user_profile_role_and_token_once(self):
+        data = {
+            "username": "newbie", "email": "newbie@example.com", "phone_number": "09121234567",
+            "password": "A-strong-pass-123",
+        }
+        with patch.object(services, "_customer_role_id", self.customer_role.id), \
+                CaptureQueriesContext(connection) as ctx:
+            res = self.client.post("/api/users/register/", data)
+
+        self.assertEqual(res.status_code, 201)
+        inserts = [query["sql"].split('"')[1] for query in ctx.captured_queries if query["sql"].startswith("INSERT")]
+        self.assertEqual(inserts, ["user_user", "user_profile", "user_user_roles", "authtoken_token"])
+        self.assertFalse(any('WHERE "user_role"."name" =' in query["sql"] for query in ctx.captured_queries))
+
+        user = User.objects.get(username="newbie")
+        self.assertEqual(res.data["token"], user.auth_token.key)
+        self.assertEqual(res.data["user"]["roles"], [Role.Names.CUSTOMER])
+        self.assertTrue(Profile.objects.filter(user=user).exists())
+        self.assertTrue(user.check_password("A-strong-pass-123"))
+
+    def test_bulk_register_skips_blank_and_taken_identifiers(self):
+        User.objects.create_user(username="taken", email="taken@example.com", password="pass12345")
+        rows = (
+            "username,email,phone_number,password\n"
+            "amir,amir@example.com,۰۹۱۲۱۱۱۱۱۱۱,\n"
+            "sara,SARA@example.com,,own-pass-123\n"
+            "other,Taken@Example.com,,\n"
+            "Amir,,,\n"
+            ",blank@example.com,,\n"
+        )
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8") as handle:
+            handle.write(rows)
+        self.addCleanup(os.remove, handle.name)
+
+        out = StringIO()
+        call_command("bulk_register", handle.name, password="shared-pass-123", threads=2, stdout=out)
+
+        self.assertIn("Registered 2 users, skipped 3", out.getvalue())
+        amir, sara = User.objects.filter(username__in=["amir", "sara"]).order_by("username")
+        self.assertEqual(amir.phone_key, "09121111111")
+        self.assertTrue(amir.check_password("shared-pass-123"))
+        self.assertTrue(sara.check_password("own-pass-123"))
+        for user in (amir, sara):
+            self.assertTrue(Profile.objects.filter(user=user).exists())
+            self.assertEqual(get_role_names(user), {Role.Names.CUSTOMER})
+
+
+class CustomerProfileTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.category = Category.objects.create(name="cat")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+
+    def customer_with(self, name, ad_count):
+        customer = User.objects.create_user(username=name, password="pass12345")
+        for i in range(ad_count):
+            ad = Ad.objects.create(
+                title=f"ad {i}", description="d", category=self.category, creator=customer, performer=self.performer
+            )
+            Comment.objects.create(content="ok", rating=4, ad=ad, user=customer, performer=self.performer)
+        return customer
+
+    def get_profile(self, customer):
+        self.client.force_authenticate(user=customer)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(f"/api/users/profile/customer/{customer.id}/")
+        self.assertEqual(res.status_code, 200)
+        return res, len(ctx.captured_queries)
+
+    def test_profile_has_counts_first_pages_and_constant_queries(self):
+        light, light_queries = self.get_profile(self.customer_with("light", 2))
+        heavy, heavy_queries = self.get_profile(self.customer_with("heavy", 25))
+
+        self.assertEqual(light_queries, heavy_queries)
+        self.assertEqual((light.data["ads_count"], light.data["comments_count"]), (2, 2))
+        self.assertIsNone(light.data["ads"]["next"])
+        self.assertEqual((heavy.data["ads_count"], heavy.data["comments_count"]), (25, 25))
+        self.assertEqual(len(heavy.data["ads"]["results"]), 10)
+        self.assertEqual(heavy.data["ads"]["results"][0]["title"], "ad 24")
+        self.assertEqual(heavy.data["comments"]["results"][0]["ad_title"], "ad 24")
+
+    def test_sections_continue_from_the_profile_cursor(self):
+        customer = self.customer_with("heavy", 25)
+        res, _ = self.get_profile(customer)
+
+        titles = [ad["title"] for ad in res.data["ads"]["results"]]
+        url = res.data["ads"]["next"]
+        self.assertIn(f"/api/users/profile/customer/{customer.id}/ads/?cursor=", url)
+        while url:
+            page = self.client.get(url)
+            self.assertEqual(page.status_code, 200)
+            titles += [ad["title"] for ad in page.data["results"]]
+            url = page.data["next"]
+        self.assertEqual(titles, [f"ad {i}" for i in reversed(range(25))])
+
+        page = self.client.get(res.data["comments"]["next"])
+        self.assertEqual([row["ad_title"] for row in page.data["results"]], [f"ad {i}" for i in range(14, 4, -1)])
+
+    def test_sections_are_only_the_requesting_customers_own(self):
+        other = self.customer_with("other", 1)
+        self.get_profile(self.customer_with("me", 1))
+        for section in ["ads", "comments"]:
+            with self.subTest(section=section):
+                res = self.client.get(f"/api/users/profile/customer/{other.id}/{section}/")
+                self.assertEqual(res.status_code, 404)
+
+
+class PerformerProfileTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.customer = User.objects.create_user(username="customer", password="pass12345")
+        self.performer = User.objects.create_user(username="performer", password="pass12345")
+        self.performer.roles.add(Role.objects.get_or_create(name=Role.Names.PERFORMER)[0])
+        self.category = Category.objects.create(name="cat")
+        self.url = f"/api/users/profile/performer/{self.performer.id}/"
+        self.client.force_authenticate(user=self.customer)
+
+    def finish_ad(self, rating=None):
+        ad = Ad.objects.create(
+            title="t", description="d", category=self.category, creator=self.customer,
+            performer=self.performer, status=Ad.Status.DONE_REPORTED,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f"/api/ads/{ad.id}/confirm-done/").status_code, 200)
+        if rating is not None:
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(
+                    "/api/comments/", {"content": "ok", "rating": rating, "ad": ad.id, "performer": self.performer.id}
+                )
+            self.assertEqual(res.status_code, 201)
+        return ad
+
+    def test_profile_is_two_queries_then_cached_until_a_new_comment(self):
+        for rating in (5, 4, None):
+            self.finish_ad(rating)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            (res.data["username"], res.data["average_rating"], res.data["comment_count"], res.data["completed_ads"]),
+            ("performer", 4.5, 2, 3),
+        )
+        self.assertEqual([review["rating"] for review in res.data["reviews"]["results"]], [4, 5])
+        self.assertNotIn("comments", res.data)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).data, res.data)
+
+        self.finish_ad(1)
+        res = self.client.get(self.url)
+        self.assertEqual((res.data["comment_count"], res.data["completed_ads"]), (3, 4))
+        self.assertEqual(res.data["reviews"]["results"][0]["rating"], 1)
+
+    def test_reviews_continue_on_their_own_endpoint(self):
+        ads = [Ad.objects.create(title=f"ad {i}", description="d", category=self.category, creator=self.customer)
+               for i in range(12)]
+        for ad in ads:
+            Comment.objects.create(content="ok", rating=3, ad=ad, user=self.customer, performer=self.performer)
+
+        res = self.client.get(self.url)
+        self.assertEqual(len(res.data["reviews"]["results"]), 10)
+        page = self.client.get(res.data["reviews"]["next"])
+        self.assertEqual([row["ad_title"] for row in page.data["results"]], ["ad 1", "ad 0"])
+        self.assertIsNone(page.data["next"])
+
+    def test_cached_links_keep_the_callers_scheme(self):
+        for i in range(11):
+            ad = Ad.objects.create(title=f"ad {i}", description="d", category=self.category, creator=self.customer)
+            Comment.objects.create(content="ok", rating=3, ad=ad, user=self.customer, performer=self.performer)
+
+        plain = self.client.get(self.url)
+        secure = self.client.get(self.url, secure=True)
+        self.assertTrue(plain.data["reviews"]["next"].startswith("http://"))
+        self.assertTrue(secure.data["reviews"]["next"].startswith("https://"))
+
+    def test_non_performers_and_missing_users(self):
+        self.assertEqual(self.client.get(f"/api/users/profile/performer/{self.customer.id}/").status_code, 403)
+        self.assertEqual(self.client.get("/api/users/profile/performer/999999/").status_code, 404)
+
+
+class CustomerFilterTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.viewer = User.objects.create_user(username="viewer", password="pass12345")
+        performer_role = Role.objects.get_or_create(name=Role.Names.PERFORMER)[0]
+
+        def customer(name, rating, comments, performer=False):
+            user = User.objects.create_user(username=name, password="pass12345")
+            Profile.objects.filter(user=user).update(average_rating=rating, comment_count=comments)
+            if performer:
+                user.roles.set([performer_role])
+            return user
+
+        customer("top", 4.8, 3)
+        customer("chatty", 4.8, 9)
+        customer("quiet", 4.9, 0)
+        customer("low", 2.0, 5)
+        customer("worker", 5.0, 9, performer=True)
+
+    def test_filters_and_orders_by_the_denormalized_columns(self):
+        self.client.force_authenticate(user=self.viewer)
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/users/filter/3/1/")
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([row["username"] for row in res.data["results"]], ["chatty", "top"])
+        self.assertEqual(res.data["results"][0], {
+            "id": User.objects.get(username="chatty").id, "username": "chatty", "avg_rating": 4.8, "comment_count": 9,
+        })
+
+    def test_pages_continue_by_cursor(self):
+        self.client.force_authenticate(user=self.viewer)
+        res = self.client.get("/api/users/filter/0/0/", {"page_size": 2})
+        names = [row["username"] for row in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            names += [row["username"] for row in res.data["results"]]
+        self.assertEqual(names, ["quiet", "chatty", "top", "low", "viewer"])
+
+    def test_comment_count_is_comments_written(self):
+        # Not the Profile.comments relation, and not comments received.
+        performer = User.objects.get(username="worker")
+        writer = User.objects.get(username="low")
+        ad = Ad.objects.create(
+            title="t", description="d", category=Category.objects.create(name="cat"), creator=writer,
+            performer=performer, status=Ad.Status.DONE,
+        )
+        self.client.force_authenticate(user=writer)
+        res = self.client.post("/api/comments/", {"content": "ok", "rating": 5, "ad": ad.id, "performer": performer.id})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(Profile.objects.get(user=writer).comment_count, 6)
+        self.assertEqual(Profile.objects.get(user=performer).comment_count, 9)
+
+        Profile.objects.get(user=writer).comments.clear()
+        res = self.client.get("/api/users/filter/0/6/")
+        self.assertEqual([(row["username"], row["comment_count"]) for row in res.data["results"]], [
+            ("chatty", 9), ("low", 6),
+        ])
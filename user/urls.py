@@ -6,7 +6,10 @@ from .views import (
     UserListAPIView,
     UserRetrieveDestroyAPIView,
     PerformerProfileAPIView,
+    PerformerReviewListAPIView,
     CustomerProfileAPIView,
+    CustomerAdListAPIView,
+    CustomerCommentListAPIView,
     CustomerFilterAPIView
 )
 
@@ -15,7 +18,18 @@ urlpatterns = [
     path("users/login/", UserLoginAPIView.as_view(), name="user-login"),
     path("users/me/", UserMeAPIView.as_view(), name="user-me"),
     path("users/profile/performer/<int:user_id>/", PerformerProfileAPIView.as_view(), name="user-profile"),
+    path(
+        "users/profile/performer/<int:user_id>/reviews/",
+        PerformerReviewListAPIView.as_view(),
+        name="performer-profile-reviews",
+    ),
     path("users/profile/customer/<int:user_id>/", CustomerProfileAPIView.as_view(), name="customer-profile"),
+    path("users/profile/customer/<int:user_id>/ads/", CustomerAdListAPIView.as_view(), name="customer-profile-ads"),
+    path(
+        "users/profile/customer/<int:user_id>/comments/",
+        CustomerCommentListAPIView.as_view(),
+        name="customer-profile-comments",
+    ),
     path("users/", UserListAPIView.as_view(), name="user-list"),
     path("users/<int:pk>/", UserRetrieveDestroyAPIView.as_view(), name="user-detail"),
     path(
@@ -1,13 +1,82 @@
-from .models import Role
+
+from django.db.models import Func, IntegerField, Q, Subquery
+
+from ad.models import Ad
+from comment.models import Comment
+
+from .identifiers import login_lookups
+from .models import Role, User
+
+
+def get_role_names(user):
+    """
+    Role names of ``user``, loaded with one query and memoized on the user
+    object so every check in the same request reuses it.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    role_names = getattr(user, "_role_names", None)
+    if role_names is None:
+        role_names = frozenset(user.roles.values_list("name", flat=True))
+        user._role_names = role_names
+    return role_names
+
+
+def clear_role_cache(user):
+    user.__dict__.pop("_role_names", None)
+
+
+def has_role(user, name):
+    return name in get_role_names(user)
+
+
 def is_support(user):
     return user.is_authenticated and (
-        user.is_superuser or user.roles.filter(name=Role.Names.SUPPORT).exists()
+        user.is_superuser or has_role(user, Role.Names.SUPPORT)
 )
 
 def is_performer(user):
     return user.is_authenticated and (
-        user.is_superuser or user.roles.filter(name=Role.Names.PERFORMER).exists()
+        user.is_superuser or has_role(user, Role.Names.PERFORMER)
 )
 
   
 
+
+def count_rows(queryset):
+    """``SELECT COUNT(*)`` over ``queryset`` as a correlated subquery."""
+    return Subquery(
+        queryset.order_by().annotate(count=Func("pk", function="COUNT", output_field=IntegerField())).values("count")
+    )
+
+
+def customer_ads(user_id):
+    return Ad.objects.filter(creator_id=user_id)
+
+
+def customer_comments(user_id):
+    return Comment.objects.filter(user_id=user_id)
+
+
+def performer_reviews(user_id):
+    return Comment.objects.filter(performer_id=user_id)
+
+
+def get_login_user(identifier):
+    """
+    The user a username, email or phone number belongs to, found through
+    the canonical key columns in one query: an OR of unique-index probes,
+    matching at most one row per probe. The most likely probe wins.
+    """
+    lookups = login_lookups(identifier)
+    if not lookups:
+        return None
+    condition = Q()
+    for field, value in lookups:
+        condition |= Q(**{field: value})
+    users = list(User.objects.filter(condition)[:len(lookups)])
+    for field, value in lookups:
+        for user in users:
+            if getattr(user, field) == value:
+                return user
+    return None
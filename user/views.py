@@ -8,18 +8,26 @@ from django.shortcuts import get_object_or_404
 from django.db.models import Avg, Count
 from .serializer import UserReadSerializer, UserCreateSerializer, UserUpdateDeleteSerializer, LoginSerializer, PerformerProfileSerializer, CustomerProfileSerializer, CustomerCardSerializer
 from .models import Profile, Role
+from .cache import PERFORMER_PROFILE_TIMEOUT, performer_profile_key
+from .pagination import (
+    CustomerAdsPagination, CustomerCommentsPagination, CustomerReputationPagination, PerformerReviewsPagination,
+)
 from ad.models import Ad
+from ad.serializer import AdReadSerializer
+from ad.utils import select_for_serializer
+from comment.models import Comment
+from comment.serializer import CommentListSerializer
 from django.db import models
-from .utils import is_performer
-from rest_framework.exceptions import PermissionDenied, ValidationError
+from .utils import count_rows, customer_ads, customer_comments, performer_reviews
+from django.core.cache import cache
+from django.db.models.functions import Coalesce
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 
 
 
 User = get_user_model()
 
 
-from rest_framework.authtoken.models import Token
-
 class UserRegisterAPIView(CreateAPIView):
     queryset = User.objects.all()
     serializer_class = UserCreateSerializer
@@ -30,10 +38,8 @@ class UserRegisterAPIView(CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
 
-        token = Token.objects.create(user=user)
-
         return Response(
-            {"token": token.key, "user": UserReadSerializer(user).data},
+            {"token": serializer.token.key, "user": UserReadSerializer(user).data},
             status=status.HTTP_201_CREATED
         )
 
@@ -106,63 +112,111 @@ class PerformerProfileAPIView(RetrieveAPIView):
     lookup_url_kwarg = "user_id"
 
     def get_queryset(self):
-        return Profile.objects.select_related("user")
+        # The rating and completed-ads counters are maintained by the comment
+        # and confirm-done writes, so they are joined by primary key.
+        performer_role = User.roles.through.objects.filter(
+            user_id=models.OuterRef("user_id"), role__name=Role.Names.PERFORMER
+        )
+        return Profile.objects.select_related("user").annotate(
+            has_performer_role=models.Exists(performer_role),
+            rating_count=Coalesce(models.F("user__rating__rating_count"), 0),
+            completed_ads=Coalesce(models.F("user__performer_stats__done_count"), 0),
+        )
 
     def get_object(self):
-        user_id = self.kwargs[self.lookup_url_kwarg]
-        target_user = get_object_or_404(User, id=user_id)
-        if not is_performer(target_user):
+        profile = self.get_queryset().filter(user_id=self.kwargs[self.lookup_url_kwarg]).first()
+        if profile is None:
+            raise NotFound("Profile not found")
+        if not (profile.has_performer_role or profile.user.is_superuser):
             raise PermissionDenied("کاربر خواسته شده پیمانکار نیست.")
-        profile = get_object_or_404(self.get_queryset(), user_id=self.kwargs[self.lookup_url_kwarg])
-        profile = profile.annotate(
-            completed_ads=models.Count(
-                'user__ads_performed',
-                filter=models.Q(user__ads_performed__status=Ad.Status.DONE),
-                distinct=True
-            )
-        ).first()
+        return profile
+
+    def retrieve(self, request, *args, **kwargs):
+        # The key is fixed before the database is read, so an entry is never
+        # older than its version; see user.cache.invalidate_performer_profiles.
+        key = performer_profile_key(self.kwargs[self.lookup_url_kwarg], request)
+        data = cache.get(key)
+        if data is None:
+            data = self.get_serializer(self.get_object()).data
+            cache.set(key, data, PERFORMER_PROFILE_TIMEOUT)
+        return Response(data)
+
+
+class PerformerReviewListAPIView(ListAPIView):
+    """The performer's reviews after the profile's first page."""
+    serializer_class = CommentListSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = PerformerReviewsPagination
+
+    def get_queryset(self):
+        return select_for_serializer(performer_reviews(self.kwargs["user_id"]), self.serializer_class)
 
-        if profile is None:
-            from django.http import Http404
-            raise Http404("Profile not found")
 
-        return profile
-    
 class CustomerProfileAPIView(RetrieveAPIView):
     serializer_class = CustomerProfileSerializer
     permission_classes = [IsAuthenticated, IsCustomer]
 
     def get_object(self):
+        # The profile and both section counts in one query
         user = self.request.user
-        profile = get_object_or_404(Profile, user=user)
+        profile = get_object_or_404(
+            Profile.objects.select_related("user").annotate(
+                ads_count=count_rows(Ad.objects.filter(creator_id=models.OuterRef("user_id"))),
+                comments_count=count_rows(Comment.objects.filter(user_id=models.OuterRef("user_id"))),
+            ),
+            user=user,
+        )
         return profile
 
 
+class CustomerAdListAPIView(ListAPIView):
+    """The customer's ads after the profile's first page."""
+    serializer_class = AdReadSerializer
+    permission_classes = [IsAuthenticated, IsCustomer]
+    pagination_class = CustomerAdsPagination
+
+    def get_queryset(self):
+        # Like the profile, only the requesting customer's own
+        if self.kwargs["user_id"] != self.request.user.id:
+            raise NotFound("Profile not found")
+        return select_for_serializer(customer_ads(self.request.user.id), self.serializer_class)
+
+
+class CustomerCommentListAPIView(ListAPIView):
+    """The customer's comments after the profile's first page."""
+    serializer_class = CommentListSerializer
+    permission_classes = [IsAuthenticated, IsCustomer]
+    pagination_class = CustomerCommentsPagination
+
+    def get_queryset(self):
+        if self.kwargs["user_id"] != self.request.user.id:
+            raise NotFound("Profile not found")
+        return select_for_serializer(customer_comments(self.request.user.id), self.serializer_class)
+
+
 class CustomerFilterAPIView(ListAPIView):
+    """
+    Customers rated at least ``base_rating`` with at least ``base_comments``
+    comments, best first. The filter and order read the profile's
+    denormalized columns, so each page is a range scan of
+    profile_reputation_idx that stops once the page is full.
+    """
     permission_classes = [IsAuthenticated]
     serializer_class = CustomerCardSerializer
+    pagination_class = CustomerReputationPagination
 
     def get_queryset(self):
-        customer_role = Role.objects.get(name=Role.Names.CUSTOMER)
-
-        base_rating = self.kwargs["base_rating"]
-        base_comments = self.kwargs["base_comments"]
-
-        qs = (
-            User.objects
-            .filter(roles=customer_role)
-            .select_related("profile")
-            .annotate(
-                avg_rating=models.F("profile__average_rating"),
-                comment_count=Count("profile__comments", distinct=True),
-            )
+        customer_role = User.roles.through.objects.filter(
+            user_id=models.OuterRef("user_id"), role__name=Role.Names.CUSTOMER
+        )
+        return (
+            Profile.objects
             .filter(
-                avg_rating__gte=base_rating,
-                comment_count__gte=base_comments,
+                models.Exists(customer_role),
+                average_rating__gte=self.kwargs["base_rating"],
+                comment_count__gte=self.kwargs["base_comments"],
             )
-            # fixed ordering — backend controlled
-            .order_by("-avg_rating", "-comment_count")
+            .select_related("user")
+            .only("id", "user_id", "average_rating", "comment_count", "user__username")
         )
 
-        return qs
-